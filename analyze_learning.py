@@ -10,6 +10,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from brain.learning import analyze_failure_patterns
 from brain.stats import print_summary
+from bot.profiling import add_profile_arguments, profiler_from_args, maybe_profile
+from config.logs import setup_logging
 import argparse
 
 def main():
@@ -17,18 +19,63 @@ def main():
     parser.add_argument('--full', action='store_true', help='Ejecutar análisis completo con visualizaciones')
     parser.add_argument('--optimize', action='store_true', help='Solo optimizar parámetros')
     parser.add_argument('--stats', action='store_true', help='Solo mostrar estadísticas')
+    parser.add_argument('--rebuild-stats', action='store_true', help='Recalcular los agregados de rendimiento desde la base de datos')
+    parser.add_argument('--online', action='store_true', help='Mostrar las estadísticas online (sin recorrer la tabla)')
+    parser.add_argument('--counterfactual', action='store_true', help='Evaluar una rejilla de umbrales sobre los trades registrados')
+    parser.add_argument('--min-trades', type=int, default=20, help='Mínimo de trades por celda en --counterfactual')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    setup_logging()
     
     print("🚀 Iniciando análisis de aprendizaje...")
     
-    if args.stats:
+    with maybe_profile(profiler_from_args(args), "analyze_learning"):
+        return run_analysis(args)
+
+def run_analysis(args):
+    """Ejecuta la acción de análisis seleccionada por los argumentos"""
+    if args.rebuild_stats:
+        from brain.stats import rebuild_aggregates
+        from brain.learning import TradingAnalyzer, CLI_STATE_FILE, CLI_SERIES_FILE
+        from brain.online_stats import OnlineStats
+        rows = rebuild_aggregates()
+        print(f"✅ Agregados recalculados ({rows} filas)")
+        closed = OnlineStats().rebuild()
+        print(f"✅ Estadísticas online recalculadas ({closed} trades cerrados)")
+        analyzer = TradingAnalyzer(CLI_STATE_FILE, CLI_SERIES_FILE)
+        try:
+            analyzer.reset_state()
+            analyzer.refresh()
+        finally:
+            analyzer.close()
+        print_summary()
+    elif args.online:
+        from brain.online_stats import OnlineStats
+        stats = OnlineStats.open()
+        print("\n📐 Estadísticas online:")
+        for key, value in stats.summary().items():
+            print(f"   • {key}: {value}")
+        recommendations = stats.recommendations()
+        if recommendations:
+            print("\n💡 Recomendaciones:")
+            for i, rec in enumerate(recommendations, 1):
+                print(f"   {i}. {rec}")
+    elif args.counterfactual:
+        from brain.counterfactual import counterfactual_report
+        best = counterfactual_report(min_trades=args.min_trades)
+        if best.empty:
+            print("⚠️ No hay trades cerrados suficientes para evaluar la rejilla")
+        else:
+            print("\n🧪 Mejores combinaciones de umbrales (contrafactual):")
+            print(best.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    elif args.stats:
         # Solo mostrar estadísticas rápidas
         print_summary()
     elif args.optimize:
         # Solo optimización
-        from brain.learning import TradingAnalyzer
-        analyzer = TradingAnalyzer()
+        from brain.learning import TradingAnalyzer, CLI_STATE_FILE, CLI_SERIES_FILE
+        analyzer = TradingAnalyzer(CLI_STATE_FILE, CLI_SERIES_FILE)
         try:
             optimizations = analyzer.optimize_parameters()
             print("\n⚙️ Optimizaciones sugeridas:")
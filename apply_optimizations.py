@@ -7,6 +7,19 @@ import json
 import os
 import sys
 
+LEGACY_HISTORY_FILE = 'optimization_history.json'
+
+def _import_legacy_history(history):
+    """Importa una sola vez el antiguo optimization_history.json al historial"""
+    if not os.path.exists(LEGACY_HISTORY_FILE) or history.count("optimization"):
+        return 0
+    with open(LEGACY_HISTORY_FILE, 'r') as f:
+        legacy = json.load(f)
+    for entry in legacy:
+        history.record_optimization(entry, ts=entry.get('applied_at'))
+    print(f"📥 Importadas {len(legacy)} optimizaciones de '{LEGACY_HISTORY_FILE}'")
+    return len(legacy)
+
 def apply_optimizations():
     """Aplica las optimizaciones guardadas en optimized_params.json"""
     
@@ -35,22 +48,18 @@ def apply_optimizations():
             print(f"  • Mejor hora: {optimizations['time'].get('best_hour', 'No cambiar')}:00 UTC")
             print(f"  • Peor hora: {optimizations['time'].get('worst_hour', 'No cambiar')}:00 UTC")
         
-        # Guardar historial de optimizaciones
-        history_file = 'optimization_history.json'
-        history = []
-        
-        if os.path.exists(history_file):
-            with open(history_file, 'r') as f:
-                history = json.load(f)
-        
+        # Guardar historial de optimizaciones (append-only, una fila por aplicación)
         from datetime import datetime
-        optimizations['applied_at'] = datetime.utcnow().isoformat()
-        history.append(optimizations)
+        from config.history import ParamHistory, HISTORY_DB
+        from config.optimizer import optimizer
+        history = ParamHistory()
+        _import_legacy_history(history)
         
-        with open(history_file, 'w') as f:
-            json.dump(history, f, indent=2)
+        optimizations['applied_at'] = datetime.utcnow().isoformat()
+        history.record_optimization(optimizations, mode=optimizer.current_mode)
+        history.close()
         
-        print("✅ Optimizaciones registradas en 'optimization_history.json'")
+        print(f"✅ Optimizaciones registradas en '{HISTORY_DB}'")
         print("📝 Nota: Para aplicar cambios automáticamente, edita los archivos de configuración")
         
         return True
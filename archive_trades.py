@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Mueve los trades cerrados antiguos de la base de datos a Parquet (archivo en frío).
+Ejecutar periódicamente, por ejemplo una vez al día.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+from database.models import init_db
+from database.archive import archive_closed_trades, ARCHIVE_DIR
+
+def main():
+    parser = argparse.ArgumentParser(description='Archiva trades cerrados antiguos en Parquet')
+    parser.add_argument('--days', type=int, default=30, help='Archivar trades cerrados hace más de N días (default: 30)')
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help=f'Carpeta del archivo (default: {ARCHIVE_DIR})')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Trades por lote')
+    args = parser.parse_args()
+
+    init_db()
+    total = archive_closed_trades(days=args.days, archive_dir=args.dir, batch_size=args.batch_size)
+    print(f"✅ {total} trades movidos a '{args.dir}'")
+
+if __name__ == "__main__":
+    main()
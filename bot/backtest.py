@@ -10,6 +10,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from exchange.bingx_client import fetch_ohlcv
 from strategy.indicators import calculate_indicators
 from strategy.daytrading import generate_signal
+from brain.risk import initial_levels, simulate_paths, EXIT_NONE, BE_TRIGGER_FRACTION
+from bot.profiling import add_profile_arguments, profiler_from_args, maybe_profile
 
 def run_backtest(symbol="BTC/USDT:USDT", timeframe="5m", limit=1440, atr_mult=2.5, risk_reward=1.5, trailing=True, use_be=True):
     """
@@ -47,6 +49,9 @@ def run_backtest(symbol="BTC/USDT:USDT", timeframe="5m", limit=1440, atr_mult=2.
     pnl_maximo = 0.0
     
     history = []
+    high = df['high'].to_numpy(dtype=float)
+    low = df['low'].to_numpy(dtype=float)
+    close = df['close'].to_numpy(dtype=float)
 
     i = 200
     while i < len(df) - 1:
@@ -70,70 +75,37 @@ def run_backtest(symbol="BTC/USDT:USDT", timeframe="5m", limit=1440, atr_mult=2.
             
             sl_dist = atr * atr_mult
             tp_dist = sl_dist * risk_reward
-            be_trigger = tp_dist * 0.5 # Activar Break Even al 50% del camino al TP
+            be_trigger = tp_dist * BE_TRIGGER_FRACTION # Activar Break Even al 50% del camino al TP
             
-            # Inicializar niveles
-            if trend_signal == 'LONG':
-                stop_loss = entry_price - sl_dist
-                take_profit = entry_price + tp_dist
-            else:
-                stop_loss = entry_price + sl_dist
-                take_profit = entry_price - tp_dist
+            # Inicializar niveles y recorrer las velas siguientes con el motor de riesgo
+            # (Break Even y Trailing Stop, priorizando BE sobre el trailing inicial)
+            stop_loss, take_profit = initial_levels(entry_price, atr, trend_signal, atr_mult, atr_mult * risk_reward)
+            reason, exit_index, exit_price, _, be_reached = simulate_paths(
+                entry_price, stop_loss, take_profit, trend_signal,
+                high[i + 1:], low[i + 1:], close[i + 1:],
+                trail_dist=sl_dist if trailing else None,
+                be_trigger=be_trigger if use_be else None,
+            )
             
-            trade_closed = False
-            be_activated = False
-            
-            for j in range(i + 1, len(df)):
-                future_row = df.iloc[j]
-                
-                # --- Lógica de Break Even ---
-                if use_be and not be_activated:
-                    if trend_signal == 'LONG' and (future_row['high'] - entry_price) >= be_trigger:
-                        stop_loss = entry_price # Mover SL a precio de entrada
-                        be_activated = True
-                    elif trend_signal == 'SHORT' and (entry_price - future_row['low']) >= be_trigger:
-                        stop_loss = entry_price
-                        be_activated = True
-
-                # --- Lógica de Trailing Stop ---
-                if trailing and not be_activated: # Priorizamos BE sobre Trailing inicial
-                    if trend_signal == 'LONG':
-                        new_sl = future_row['close'] - sl_dist
-                        if new_sl > stop_loss: stop_loss = new_sl
-                    else:
-                        new_sl = future_row['close'] + sl_dist
-                        if new_sl < stop_loss: stop_loss = new_sl
-
-                # Verificación de Salida
+            trade_closed = reason[0] != EXIT_NONE
+            if trade_closed:
                 if trend_signal == 'LONG':
-                    if future_row['low'] <= stop_loss:
-                        trade_pnl = ((stop_loss - entry_price) / entry_price) * 100
-                        trade_closed = True
-                    elif future_row['high'] >= take_profit:
-                        trade_pnl = ((take_profit - entry_price) / entry_price) * 100
-                        trade_closed = True
+                    trade_pnl = ((exit_price[0] - entry_price) / entry_price) * 100
                 else: # SHORT
-                    if future_row['high'] >= stop_loss:
-                        trade_pnl = ((entry_price - stop_loss) / entry_price) * 100
-                        trade_closed = True
-                    elif future_row['low'] <= take_profit:
-                        trade_pnl = ((entry_price - take_profit) / entry_price) * 100
-                        trade_closed = True
+                    trade_pnl = ((entry_price - exit_price[0]) / entry_price) * 100
                 
-                if trade_closed:
-                    trade_pnl -= 0.04 # Comisiones
-                    pnl_acumulado += trade_pnl
-                    if trade_pnl > 0: ganadores += 1
-                    else: perdedores += 1
-                    
-                    history.append({
-                        'fecha': datetime.fromtimestamp(current_row['timestamp']/1000),
-                        'pnl': trade_pnl,
-                        'balance': pnl_acumulado,
-                        'be': be_activated
-                    })
-                    i = j
-                    break
+                trade_pnl -= 0.04 # Comisiones
+                pnl_acumulado += trade_pnl
+                if trade_pnl > 0: ganadores += 1
+                else: perdedores += 1
+                
+                history.append({
+                    'fecha': datetime.fromtimestamp(current_row['timestamp']/1000),
+                    'pnl': trade_pnl,
+                    'balance': pnl_acumulado,
+                    'be': bool(be_reached[0])
+                })
+                i = i + 1 + int(exit_index[0])
             
             if not trade_closed: i = len(df)
         else:
@@ -152,9 +124,12 @@ def run_backtest(symbol="BTC/USDT:USDT", timeframe="5m", limit=1440, atr_mult=2.
         "history": history
     }
 
-def optimize():
+def optimize(profiler=None):
     """
     Prueba diferentes configuraciones incluyendo filtros de ADX y Break Even.
+
+    Args:
+        profiler (Profiler): Si se indica, perfila cada backtest del barrido.
     """
     print("🚀 Iniciando Motor de Optimización Pro...")
     results = []
@@ -162,7 +137,8 @@ def optimize():
     # Rango de parámetros refinados tras el último test
     for mult in [2.0, 2.5, 3.0]:
         for rr in [1.2, 1.5, 2.0]:
-            res = run_backtest(atr_mult=mult, risk_reward=rr, limit=1440)
+            with maybe_profile(profiler, f"backtest-atr{mult}-rr{rr}"):
+                res = run_backtest(atr_mult=mult, risk_reward=rr, limit=1440)
             if res:
                 results.append({
                     "ATR_Mult": mult,
@@ -193,4 +169,7 @@ def optimize():
         print("="*45)
 
 if __name__ == "__main__":
-    optimize()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Barrido de backtests ATR/RR')
+    add_profile_arguments(parser)
+    optimize(profiler_from_args(parser.parse_args()))
\ No newline at end of file
@@ -0,0 +1,275 @@
+# bot/coordinator.py
+"""
+Runner multi-símbolo: reparte los símbolos entre procesos (shards) y los
+coordina desde el proceso principal.
+
+Un solo proceso no llega a cientos de símbolos por ciclo de 60 s: indicadores,
+señal y registro compiten por el GIL. Cada shard es un proceso `spawn` que
+ejecuta el ciclo del runner solo para sus símbolos (bot/runner.py,
+`shard_main`), con su propio libro de posiciones filtrado a ellos, así que el
+rendimiento crece con los núcleos hasta que manda el exchange o la base de datos.
+
+El coordinador se encarga de:
+    - Límite de peticiones compartido: token bucket en memoria compartida
+      (SharedRateLimiter) que todos los shards consultan antes de pedir velas.
+    - Salud: cada shard marca un latido por símbolo procesado. Un proceso
+      muerto o sin latido en `heartbeat_timeout` se reinicia con espera
+      exponencial; las posiciones viven en la base de datos y el shard nuevo
+      las recupera al reconciliar.
+    - Vista agregada: posiciones, paper trading y métricas de todos los shards
+      (`status`, fichero JSON de estado y series con la etiqueta shard="i").
+    - Estadísticas online: cada informe trae los cierres del shard desde el
+      anterior (OnlineStats.drain) y se suman al estado del coordinador. Los
+      cierres de un shard que muere antes de informar se recuperan con
+      `analyze_learning.py --rebuild-stats`.
+"""
+import json
+import multiprocessing
+import os
+import time
+
+from bot.metrics import metrics
+from config.logs import get_logger
+
+logger = get_logger("Coordinator")
+
+REQUESTS_PER_SECOND = 10.0  # Límite global de peticiones al exchange (todos los shards)
+BURST = 20  # Peticiones que pueden salir de golpe tras un rato sin pedir nada
+LOCK_TIMEOUT = 1.0  # El lock del limitador se retiene microsegundos: más que esto es un shard muerto
+HEARTBEAT_TIMEOUT = 180.0  # Segundos sin latido antes de dar un shard por colgado (3 velas de 1m)
+RESTART_BACKOFF = 1.0  # Espera inicial antes de relanzar un shard caído (se duplica)
+MAX_RESTART_BACKOFF = 60.0
+STABLE_SECONDS = 300.0  # Un shard vivo este tiempo vuelve a la espera mínima
+STOP_TIMEOUT = 10.0  # Segundos para que un shard vuelque sus buffers al pararlo
+STATUS_FILE = "logs/coordinator.json"
+
+def shard_symbols(symbols, shards):
+    """Reparto estable round-robin (sin duplicados): el shard i recibe symbols[i::shards]"""
+    symbols = list(dict.fromkeys(symbols))
+    shards = max(1, min(int(shards), len(symbols)))
+    return [symbols[i::shards] for i in range(shards)]
+
+class SharedRateLimiter:
+    """
+    Token bucket compartido entre procesos (memoria compartida + lock).
+    Se crea en el coordinador y se pasa a los shards al lanzarlos.
+
+    Cada `acquire` reserva su turno bajo el lock y duerme fuera de él, así que
+    las esperas se reparten en orden de llegada sin sondeos. Un shard matado
+    con el lock tomado no bloquea a los demás: `acquire` espera como mucho
+    LOCK_TIMEOUT y el coordinador lo libera con `repair` tras matar un shard.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST, context=None):
+        context = context or multiprocessing.get_context("spawn")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._lock = context.Lock()
+        self._tokens = context.RawValue("d", self.burst)
+        self._updated = context.RawValue("d", time.monotonic())
+
+    def acquire(self, tokens=1.0):
+        """Bloquea hasta que toca el turno de `tokens` peticiones. Retorna los segundos esperados"""
+        if not self._lock.acquire(timeout=LOCK_TIMEOUT):
+            # Lock huérfano: sin reserva, se espera el turno de una petición sin ráfaga
+            logger.warning("⚠️ Límite de peticiones bloqueado; se continúa sin reserva",
+                           extra={"event": "rate_limiter_stuck"})
+            wait = tokens / self.rate
+            time.sleep(wait)
+            return wait
+        try:
+            now = time.monotonic()
+            available = min(self.burst, self._tokens.value + (now - self._updated.value) * self.rate)
+            self._tokens.value = available - tokens
+            self._updated.value = now
+            wait = max(0.0, (tokens - available) / self.rate)
+        finally:
+            self._lock.release()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def repair(self):
+        """Libera el lock si sigue tomado tras LOCK_TIMEOUT (su dueño murió). Retorna True si lo liberó"""
+        if self._lock.acquire(timeout=LOCK_TIMEOUT):
+            self._lock.release()
+            return False
+        self._lock.release()  # Un Lock de multiprocessing lo puede liberar cualquier proceso
+        return True
+
+class Coordinator:
+    """
+    Lanza, vigila y agrega los shards del runner.
+
+    Args:
+        symbols (list): Símbolos a operar.
+        target (callable): Función del shard, importable desde un proceso spawn:
+            target(shard, symbols, limiter, heartbeats, conn, stop_event).
+            Envía sus informes por `conn` y recibe por ahí los comandos (command, payload).
+        shards (int): Número de procesos (por defecto, uno por núcleo).
+        rate (float) / burst (int): Límite global de peticiones al exchange.
+        heartbeat_timeout (float): Segundos sin latido antes de reiniciar un shard.
+        stats (OnlineStats): Estado al que se suman los cierres que informa cada shard.
+    """
+
+    def __init__(self, symbols, target, shards=None, rate=REQUESTS_PER_SECOND, burst=BURST,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT, stats=None):
+        self.context = multiprocessing.get_context("spawn")
+        self.target = target
+        self.assignments = shard_symbols(symbols, shards or os.cpu_count() or 1)
+        n = len(self.assignments)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.stats = stats
+        self.limiter = SharedRateLimiter(rate, burst, self.context)
+        self.heartbeats = self.context.RawArray("d", n)  # Cada shard solo escribe su casilla
+        self.stop_event = self.context.Event()
+        self.processes = [None] * n
+        self.reports = {}  # shard -> último informe recibido
+        self.restarts = [0] * n
+        self._conns = [None] * n  # Un Pipe por proceso: un shard matado no corrompe los demás
+        self._started = [0.0] * n
+        self._backoff = [RESTART_BACKOFF] * n
+        self._next_start = [0.0] * n
+
+    def _spawn(self, shard):
+        conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=self.target,
+            args=(shard, self.assignments[shard], self.limiter, self.heartbeats, child_conn, self.stop_event),
+            name=f"shard-{shard}",
+            daemon=True,
+        )
+        self.heartbeats[shard] = time.time()  # El arranque cuenta como latido
+        process.start()
+        child_conn.close()
+        self.processes[shard] = process
+        self._conns[shard] = conn
+        self._started[shard] = time.time()
+        logger.info(f"🧩 Shard {shard} (pid {process.pid}): {len(self.assignments[shard])} símbolos",
+                    extra={"event": "shard_started", "shard": shard, "pid": process.pid,
+                           "symbols": len(self.assignments[shard])})
+
+    def start(self):
+        for shard in range(len(self.assignments)):
+            self._spawn(shard)
+        return self
+
+    def _reap(self, shard):
+        """Espera a un shard ya avisado con SIGTERM (vuelca sus buffers y sale) o lo mata"""
+        process = self.processes[shard]
+        process.join(STOP_TIMEOUT)
+        if process.is_alive():
+            process.kill()
+            process.join()
+            if self.limiter.repair():
+                logger.warning(f"🔓 Shard {shard} murió con el límite de peticiones bloqueado; liberado",
+                               extra={"event": "rate_limiter_repaired", "shard": shard})
+        self._conns[shard].close()
+        self.processes[shard] = None
+        self._conns[shard] = None
+
+    def check(self):
+        """Reinicia los shards muertos o colgados (y relanza los que cumplieron su espera)"""
+        now = time.time()
+        for shard, process in enumerate(self.processes):
+            if process is None:
+                if now >= self._next_start[shard]:
+                    self._spawn(shard)
+                continue
+
+            if process.is_alive():
+                age = now - self.heartbeats[shard]
+                if age <= self.heartbeat_timeout:
+                    if now - self._started[shard] >= STABLE_SECONDS:
+                        self._backoff[shard] = RESTART_BACKOFF
+                    continue
+                reason = f"sin latido desde hace {age:.0f}s"
+            else:
+                reason = f"terminó con código {process.exitcode}"
+
+            process.terminate()
+            self._reap(shard)
+            self.restarts[shard] += 1
+            self._next_start[shard] = now + self._backoff[shard]
+            metrics.inc("trader_shard_restarts_total", shard=str(shard))
+            logger.error(f"💀 Shard {shard} caído ({reason}); reinicio en {self._backoff[shard]:.0f}s",
+                         extra={"event": "shard_down", "shard": shard, "reason": reason,
+                                "restarts": self.restarts[shard]})
+            self._backoff[shard] = min(self._backoff[shard] * 2, MAX_RESTART_BACKOFF)
+
+    def collect(self):
+        """Recoge los informes pendientes de los shards. Retorna cuántos llegaron"""
+        received = closed = 0
+        for shard, conn in enumerate(self._conns):
+            if conn is None:
+                continue
+            try:
+                while conn.poll():
+                    report = conn.recv()
+                    self.reports[shard] = report
+                    metrics.import_state(report["metrics"], shard=str(shard))
+                    if self.stats is not None and report.get("stats"):
+                        self.stats.merge(report["stats"])
+                        closed += report["stats"]["closed"]
+                    received += 1
+            except (EOFError, OSError):
+                pass  # El proceso murió: lo detecta check()
+        if closed:
+            self.stats.save()
+        return received
+
+    def broadcast(self, command, payload=None):
+        """Envía un comando (p. ej. "params", "entries", "reconcile") a todos los shards vivos"""
+        for conn in self._conns:
+            if conn is None:
+                continue
+            try:
+                conn.send((command, payload))
+            except (BrokenPipeError, OSError):
+                pass
+
+    def status(self):
+        """Vista agregada: salud por shard, posiciones, paper trading y totales de contadores"""
+        now = time.time()
+        shards, positions, paper, totals = [], [], [], {}
+        for shard, process in enumerate(self.processes):
+            report = self.reports.get(shard, {})
+            shards.append({
+                "shard": shard,
+                "pid": process.pid if process is not None else None,
+                "alive": process is not None and process.is_alive(),
+                "symbols": len(self.assignments[shard]),
+                "heartbeat_age": now - self.heartbeats[shard],
+                "restarts": self.restarts[shard],
+                "cycles": report.get("cycles", 0),
+                "skipped_bars": report.get("skipped_bars", 0),
+                "latency": report.get("latency", {}),
+            })
+            positions.extend(report.get("positions", []))
+            paper.extend(dict(row, shard=shard) for row in report.get("paper", []))
+            for name, series in report.get("metrics", {}).get("counters", {}).items():
+                totals[name] = totals.get(name, 0) + sum(series.values())
+        return {"timestamp": now, "symbols": sum(len(a) for a in self.assignments), "shards": shards,
+                "positions": positions, "paper": paper, "totals": totals}
+
+    def write_status(self, path=STATUS_FILE):
+        """Vuelca `status()` a un JSON (escritura atómica). Retorna el estado escrito"""
+        status = self.status()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(status, f, indent=2, default=float)
+        os.replace(tmp_path, path)
+        return status
+
+    def wait(self, timeout):
+        """Duerme hasta `timeout` segundos; retorna True si se pidió la parada"""
+        return self.stop_event.wait(timeout)
+
+    def stop(self):
+        self.stop_event.set()
+        running = [shard for shard, process in enumerate(self.processes) if process is not None]
+        for shard in running:
+            self.processes[shard].terminate()
+        for shard in running:
+            self._reap(shard)
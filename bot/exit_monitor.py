@@ -0,0 +1,287 @@
+# bot/exit_monitor.py
+"""
+Monitor de salidas en vivo, intrabar.
+
+Evalúa Stop Loss, Take Profit, break-even y trailing stop de todas las
+posiciones abiertas del libro a medida que llegan precios, con el motor de
+riesgo vectorizado (brain/risk.py): una llamada por tick o vela para todo el
+libro, con los mismos niveles que el backtest.
+
+Fuentes de precio:
+    on_price  -> tick suelto (flujo de trades por websocket o ticker sondeado
+                 en un hilo propio, ver `start`); cierra al precio del tick.
+    on_bar    -> máximo/mínimo/cierre de una vela (respaldo en cada ciclo del
+                 runner: ninguna mecha que toque un nivel se pierde); cierra
+                 al nivel tocado.
+    replay    -> fichero de ticks grabado (CSV o Parquet), para pruebas.
+
+Diferencias con el backtest, que asume el orden intrabar más favorable:
+    - Cada precio se compara primero con el stop vigente y solo después
+      mueve break-even/trailing (`update_first=False`). Una vela se compara
+      con el stop con el que empezó, no con uno subido por sus ticks o por
+      su propio máximo.
+    - El break-even se activa con cualquier tick; el trailing solo sigue a
+      los cierres de vela, como en el backtest.
+
+El estado dinámico (stop desplazado, break-even activo) vive en memoria por
+id de posición y sobrevive a las recargas y reconciliaciones del libro.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from brain.risk import (ATR_MULTIPLIER_SL, ATR_MULTIPLIER_TP, BE_TRIGGER_FRACTION, EXIT_SL,
+                        initial_levels, evaluate_exits, side_sign)
+from bot.metrics import metrics
+from config.logs import get_logger
+
+logger = get_logger("ExitMonitor")
+
+TICK_SOURCES = ("trades", "ticker")
+TICK_INTERVAL = 1.0  # Segundos entre sondeos del ticker
+RETRY_SECONDS = 5.0  # Espera antes de reabrir una fuente de ticks caída
+
+def read_ticks(path):
+    """
+    Ticks de un fichero CSV o Parquet con columnas timestamp (ms), price y,
+    opcionalmente, symbol. Genera (timestamp, símbolo o None, precio).
+    """
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    symbols = df["symbol"] if "symbol" in df.columns else [None] * len(df)
+    for ts, symbol, price in zip(df["timestamp"], symbols, df["price"]):
+        yield int(ts), symbol, float(price)
+
+def ticker_ticks(symbol, stop_event, interval=TICK_INTERVAL, exchange=None):
+    """
+    Sondea el ticker del exchange cada `interval` segundos: genera (timestamp, precio).
+    Sin `exchange` crea un cliente propio: el de get_bingx() lo usa el hilo
+    principal y un cliente ccxt síncrono no es seguro entre hilos.
+    """
+    if exchange is None:
+        import ccxt
+        from exchange.bingx_client import _exchange_config
+        exchange = ccxt.bingx(_exchange_config())
+    while not stop_event.is_set():
+        ticker = exchange.fetch_ticker(symbol)
+        if ticker.get("last") is not None:
+            yield ticker.get("timestamp") or int(time.time() * 1000), float(ticker["last"])
+        stop_event.wait(interval)
+
+def trade_ticks(symbol, stop_event, timeout=5.0):
+    """Flujo de trades por websocket (ccxt.pro): genera (timestamp, precio) por cada trade"""
+    import ccxt.pro as ccxtpro
+
+    exchange = ccxtpro.bingx({"options": {"defaultType": "swap"}})
+    loop = asyncio.new_event_loop()
+    try:
+        while not stop_event.is_set():
+            try:
+                trades = loop.run_until_complete(asyncio.wait_for(exchange.watch_trades(symbol), timeout))
+            except asyncio.TimeoutError:
+                continue
+            for trade in trades:
+                yield trade["timestamp"], float(trade["price"])
+    finally:
+        loop.run_until_complete(exchange.close())
+        loop.close()
+
+class ExitMonitor:
+    """
+    Salidas por niveles de riesgo del libro de posiciones.
+
+    Args:
+        book (PositionBook): Libro de posiciones abiertas.
+        trailing (bool): Trailing stop a `sl_mult` ATR del precio.
+        break_even (bool): Stop a la entrada al recorrer `be_fraction` del camino al TP.
+        closer (callable): (posición, precio, motivo) -> PnL o None. Por defecto book.close.
+        listeners (list): Funciones (símbolo, precio, timestamp) que reciben cada tick
+            de las fuentes en vivo (p. ej. el motor de paper trading).
+    """
+
+    def __init__(self, book, trailing=True, break_even=True, sl_mult=ATR_MULTIPLIER_SL,
+                 tp_mult=ATR_MULTIPLIER_TP, be_fraction=BE_TRIGGER_FRACTION, closer=None, listeners=()):
+        self.book = book
+        self.trailing = trailing
+        self.break_even = break_even
+        self.sl_mult = sl_mult
+        self.tp_mult = tp_mult
+        self.be_fraction = be_fraction
+        self.closer = closer or book.close
+        self.listeners = list(listeners)
+        self.lock = threading.RLock()  # Serializa los cierres (ticks, velas y runner)
+        self._version = None
+        self._positions = []
+        self._state = {}  # id -> (stop, break-even activo, stop al empezar la vela)
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def _sync(self):
+        """Reconstruye los arrays si el libro cambió desde la última evaluación"""
+        if self._version == self.book.version:
+            return
+        positions = self.book.open_positions()
+        sides = [p.side for p in positions]
+        entry = np.array([p.entry_price for p in positions], dtype=float)
+        atr = np.array([p.atr or np.nan for p in positions], dtype=float)
+        stop, target = initial_levels(entry, atr, sides, self.sl_mult, self.tp_mult)
+        stored_stop = np.array([np.nan if p.stop_loss is None else p.stop_loss for p in positions], dtype=float)
+        stored_target = np.array([np.nan if p.take_profit is None else p.take_profit for p in positions], dtype=float)
+
+        self._positions = positions
+        self._symbols = np.array([p.symbol for p in positions], dtype=object)
+        self._sign = side_sign(sides)
+        self._entry = entry
+        self._initial_stops = np.where(np.isnan(stored_stop), stop, stored_stop)
+        self._targets = np.where(np.isnan(stored_target), target, stored_target)
+        self._trail = atr * self.sl_mult
+        self._be_trigger = np.abs(self._targets - entry) * self.be_fraction
+
+        state = [self._state.get(p.id) for p in positions]
+        self._stops = np.array([s[0] if s else i for s, i in zip(state, self._initial_stops)], dtype=float)
+        self._be = np.array([bool(s[1]) if s else False for s in state], dtype=bool)
+        self._bar_stops = np.array([s[2] if s else i for s, i in zip(state, self._initial_stops)], dtype=float)
+        self._state = {}  # Solo las posiciones que siguen abiertas
+        self._remember(range(len(positions)))
+        self._version = self.book.version
+
+    def _remember(self, index):
+        for i in index:
+            self._state[self._positions[i].id] = (self._stops[i], self._be[i], self._bar_stops[i])
+
+    def _reason(self, i, code, stop):
+        """Motivo de la salida según el stop que tocó el precio"""
+        if code != EXIT_SL:
+            return "TAKE PROFIT (ATR)"
+        if stop == self._initial_stops[i]:
+            return "STOP LOSS (ATR)"
+        return "BREAK EVEN" if stop == self._entry[i] else "TRAILING STOP"
+
+    def _evaluate(self, symbol, high, low, close, tick_price=None, ts=None):
+        bar = tick_price is None
+        with self.lock:
+            self._sync()
+            if not self._positions:
+                return []
+            index = np.arange(len(self._positions)) if symbol is None else np.flatnonzero(self._symbols == symbol)
+            if not len(index):
+                return []
+
+            # Una vela se compara con el stop con el que empezó; un tick, con el vigente
+            n = len(index)
+            sign = self._sign[index]
+            reason, level_price, stop, be = evaluate_exits(
+                self._entry[index], (self._bar_stops if bar else self._stops)[index], self._targets[index], sign,
+                np.full(n, high), np.full(n, low), np.full(n, close),
+                trail_dist=self._trail[index] if self.trailing and bar else None,
+                be_trigger=self._be_trigger[index] if self.break_even else None,
+                be_active=self._be[index],
+                update_first=False,
+            )
+            # Los stops solo se mueven a favor (en LONG hacia arriba, en SHORT hacia abajo)
+            open_ = reason == 0
+            moved = np.fmax(self._stops[index] * sign, stop * sign) * sign
+            self._stops[index] = np.where(open_, moved, self._stops[index])
+            self._be[index] = np.where(open_, self._be[index] | be, self._be[index])
+            if bar:
+                self._bar_stops[index] = self._stops[index]
+            self._remember(index)
+
+            exits = []
+            for k in np.flatnonzero(reason):
+                i = index[k]
+                position = self._positions[i]
+                price = float(level_price[k]) if tick_price is None else float(tick_price)
+                label = self._reason(i, reason[k], stop[k])
+                pnl = self.closer(position, price, label)
+                self._version = None  # El libro cambió (o hay que reintentar el cierre)
+                if pnl is None:
+                    continue
+                metrics.inc("trader_trades_closed_total", side=position.side)
+                logger.info(
+                    f"✅ Trade {position.id} cerrado ({label}). PnL: {pnl:.4f}%",
+                    extra={"event": "trade_closed", "symbol": position.symbol, "side": position.side,
+                           "trade_id": position.id, "reason": label, "pnl": pnl, "price": price},
+                )
+                exits.append({"trade_id": position.id, "symbol": position.symbol, "side": position.side,
+                              "reason": label, "price": price, "pnl": pnl, "timestamp": ts})
+            return exits
+
+    def on_price(self, symbol, price, ts=None):
+        """Evalúa un tick de `symbol` (None = todas las posiciones). Retorna las salidas ejecutadas"""
+        return self._evaluate(symbol, price, price, price, tick_price=price, ts=ts)
+
+    def on_bar(self, symbol, high, low, close, ts=None):
+        """Evalúa una vela completa de `symbol`. Retorna las salidas ejecutadas"""
+        return self._evaluate(symbol, high, low, close, ts=ts)
+
+    def levels(self, position_id):
+        """(stop, objetivo, break-even activo) vigentes de una posición, o None"""
+        with self.lock:
+            self._sync()
+            for i, position in enumerate(self._positions):
+                if position.id == position_id:
+                    return float(self._stops[i]), float(self._targets[i]), bool(self._be[i])
+        return None
+
+    def replay(self, path, symbol=None, timeframe=60):
+        """
+        Reproduce un fichero de ticks en orden, como en vivo: cada tick pasa por
+        on_price y, al cerrarse cada vela de `timeframe` segundos (y al final
+        del fichero), la vela formada con sus ticks pasa por on_bar.
+        Retorna todas las salidas.
+        """
+        exits = []
+        bars = {}  # símbolo -> [inicio, máximo, mínimo, cierre, timestamp]
+        frame_ms = timeframe * 1000
+        for ts, tick_symbol, price in read_ticks(path):
+            tick_symbol = tick_symbol or symbol
+            start = ts // frame_ms * frame_ms
+            bar = bars.get(tick_symbol)
+            if bar is not None and bar[0] != start:
+                exits.extend(self.on_bar(tick_symbol, *bar[1:]))
+                bar = None
+            if bar is None:
+                bars[tick_symbol] = [start, price, price, price, ts]
+            else:
+                bar[1:] = [max(bar[1], price), min(bar[2], price), price, ts]
+            exits.extend(self.on_price(tick_symbol, price, ts=ts))
+        for tick_symbol, bar in bars.items():
+            exits.extend(self.on_bar(tick_symbol, *bar[1:]))
+        return exits
+
+    def _run(self, symbol, source, interval):
+        while not self._stopped.is_set():
+            try:
+                ticks = trade_ticks(symbol, self._stopped) if source == "trades" \
+                    else ticker_ticks(symbol, self._stopped, interval)
+                for ts, price in ticks:
+                    for listener in self.listeners:
+                        listener(symbol, price, ts)
+                    self.on_price(symbol, price, ts=ts)
+                    if ts:
+                        metrics.observe("trader_tick_lag_seconds", max(time.time() - ts / 1000, 0.0))
+            except Exception as e:
+                metrics.inc("trader_errors_total", stage="exit_monitor")
+                logger.warning(f"⚠️ Fuente de ticks '{source}' caída: {e}",
+                               extra={"event": "tick_source_error", "symbol": symbol, "source": source})
+                self._stopped.wait(RETRY_SECONDS)
+
+    def start(self, symbol, source="ticker", interval=TICK_INTERVAL):
+        """Consume ticks de `symbol` en un hilo daemon ("trades" = websocket, "ticker" = sondeo)"""
+        if source not in TICK_SOURCES:
+            raise ValueError(f"Fuente de ticks desconocida: {source} (opciones: {', '.join(TICK_SOURCES)})")
+        self._stopped.clear()
+        thread = threading.Thread(target=self._run, args=(symbol, source, interval),
+                                  name=f"exit-monitor-{symbol}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
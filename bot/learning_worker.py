@@ -0,0 +1,145 @@
+# bot/learning_worker.py
+"""
+Análisis y optimización horarios en un hilo aparte.
+
+El runner solo llama a `request()` (no bloquea) y, entre ciclos, a `poll()`
+para recoger el último snapshot de parámetros propuesto, que aplica con
+`optimizer.apply_snapshot`, y a `poll_entries()` para los ajustes por
+(símbolo, régimen), que aplica con `optimizer.apply_entries`. El análisis es mayormente SQL, que libera el GIL,
+así que un hilo basta para que los ciclos nunca esperen al análisis.
+"""
+import queue
+import threading
+
+from bot.metrics import metrics
+from config.logs import get_logger
+
+logger = get_logger("LearningWorker")
+
+class LearningWorker:
+    """
+    Hilo daemon que ejecuta el análisis + optimizer.propose bajo demanda.
+
+    Args:
+        optimizer (StrategyOptimizer): Optimizador del que se proponen snapshots.
+        stats (OnlineStats): Si tiene trades, el análisis se lee de aquí en O(1)
+                             en lugar de consultar la base de datos.
+    """
+
+    def __init__(self, optimizer, stats=None):
+        self.optimizer = optimizer
+        self.stats = stats
+        self._requested = threading.Event()
+        self._stop = threading.Event()
+        self._results = queue.Queue(maxsize=1)  # Solo interesa el snapshot más reciente
+        self._entries = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="learning-worker", daemon=True)
+        self.busy = False
+        self.runs = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._requested.set()
+        self._thread.join(timeout)
+
+    def request(self):
+        """Pide un análisis; si ya hay uno en curso se fusiona con él"""
+        if self.busy or self._requested.is_set():
+            logger.info("⏳ Análisis anterior aún en curso; se repetirá al terminar", extra={"event": "learning_busy"})
+        self._requested.set()
+
+    def poll(self):
+        """Devuelve el último snapshot propuesto (o None) sin bloquear"""
+        try:
+            return self._results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def poll_entries(self):
+        """Devuelve las últimas entradas (símbolo, régimen) propuestas (o None) sin bloquear"""
+        try:
+            return self._entries.get_nowait()
+        except queue.Empty:
+            return None
+
+    @staticmethod
+    def _publish(results, value):
+        # Descarta un resultado previo sin recoger: el nuevo lo sustituye
+        try:
+            results.get_nowait()
+        except queue.Empty:
+            pass
+        results.put_nowait(value)
+
+    def _run(self):
+        while True:
+            self._requested.wait()
+            if self._stop.is_set():
+                return
+            self._requested.clear()
+            self.busy = True
+            try:
+                with metrics.span("learning_analysis"):
+                    snapshot = self.analyze()
+                    entries = self.analyze_groups()
+                if snapshot is not None:
+                    self._publish(self._results, snapshot)
+                if entries:
+                    self._publish(self._entries, entries)
+            except Exception as e:
+                logger.warning(f"⚠️ Error en optimización: {e}", extra={"event": "optimization_error"})
+            finally:
+                self.busy = False
+                self.runs += 1
+
+    def analyze(self):
+        """Analiza el rendimiento y propone parámetros (se ejecuta en el hilo del worker)"""
+        if self.stats is not None and self.stats.closed:
+            total, win_rate, avg_pnl = self.stats.optimizer_inputs()
+            for recommendation in self.stats.recommendations():
+                logger.info(f"💡 {recommendation}", extra={"event": "recommendation"})
+        else:
+            from brain.learning import TradingAnalyzer
+
+            analyzer = TradingAnalyzer()
+            try:
+                results = analyzer.analyze_performance()
+            finally:
+                analyzer.close()
+
+            summary = results.get("summary") if isinstance(results, dict) else None
+            if not summary:
+                return None
+            total = summary.get("closed_trades", 0)
+            if total <= 0:
+                return None
+            win_rate = summary.get("win_rate", 0)
+            avg_pnl = summary.get("total_pnl", 0) / total
+
+        logger.info(
+            f"🧠 Análisis completado: {total} trades cerrados | Win Rate {win_rate:.2f}% | PnL medio {avg_pnl:.4f}%",
+            extra={"event": "learning_done", "closed_trades": total, "win_rate": win_rate, "avg_pnl": avg_pnl},
+        )
+        return self.optimizer.propose(total, win_rate, avg_pnl)
+
+    def analyze_groups(self):
+        """Propone ajustes por (símbolo, régimen) con el rendimiento de cada grupo"""
+        from brain.learning import TradingAnalyzer
+
+        analyzer = TradingAnalyzer()
+        try:
+            groups = analyzer.performance_by_group()
+        finally:
+            analyzer.close()
+
+        entries = self.optimizer.propose_entries(groups)
+        if entries:
+            logger.info(
+                f"🧭 Ajustes propuestos para {len(entries)} combinaciones símbolo/régimen",
+                extra={"event": "entries_proposed", "entries": [f"{s}|{r}" for s, r in entries]},
+            )
+        return entries
@@ -0,0 +1,208 @@
+# bot/metrics.py
+"""
+Métricas ligeras del runner: contadores e histogramas de latencia por etapa.
+
+Se exponen en formato de texto de Prometheus por un endpoint HTTP local
+(`Metrics.serve`) y/o se vuelcan como snapshots JSON en un fichero rotativo
+(`Metrics.write_snapshot`). Registrar un valor cuesta unos microsegundos
+(perf_counter + un bisect), muy por debajo del 1% de un ciclo.
+"""
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de los buckets de latencia (segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Último: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Cuantil aproximado (límite superior del bucket que lo contiene)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return float("inf")
+
+class Metrics:
+    """Registro de contadores e histogramas con etiquetas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}     # name -> {labels: value}
+        self.histograms = {}   # name -> {labels: Histogram}
+        self.started = time.time()
+        self._server = None
+        self._file_logger = None
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage, name="trader_stage_seconds"):
+        """Mide la duración de un bloque y cuenta los errores que lo atraviesan"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("trader_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, stage=stage)
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    running = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        running += n
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {running}")
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        lines.append(f"trader_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Resumen compacto (para el fichero de métricas o la consola)"""
+        with self._lock:
+            data = {"timestamp": time.time(), "counters": {}, "latency": {}}
+            for name, series in self.counters.items():
+                for key, value in series.items():
+                    data["counters"][name + _format_labels(key)] = value
+            for name, series in self.histograms.items():
+                for key, h in series.items():
+                    data["latency"][name + _format_labels(key)] = {
+                        "count": h.count,
+                        "avg": h.sum / h.count if h.count else None,
+                        "p50": h.quantile(0.50),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+        return data
+
+    def export_state(self):
+        """Estado completo y serializable (para enviarlo a otro proceso)"""
+        with self._lock:
+            return {
+                "counters": {name: dict(series) for name, series in self.counters.items()},
+                "histograms": {
+                    name: {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in series.items()}
+                    for name, series in self.histograms.items()
+                },
+            }
+
+    def import_state(self, state, **labels):
+        """
+        Sustituye las series de otro registro (export_state) añadiéndoles
+        `labels`, p. ej. shard="0". Los valores son acumulados: volver a
+        importar el mismo origen reemplaza sus series, no las suma.
+        """
+        extra = tuple(labels.items())
+        with self._lock:
+            for name, series in state["counters"].items():
+                target = self.counters.setdefault(name, {})
+                for key, value in series.items():
+                    target[_label_key(dict(key + extra))] = value
+            for name, series in state["histograms"].items():
+                target = self.histograms.setdefault(name, {})
+                for key, (buckets, counts, total, count) in series.items():
+                    h = Histogram(buckets)
+                    h.counts, h.sum, h.count = list(counts), total, count
+                    target[_label_key(dict(key + extra))] = h
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Arranca el endpoint /metrics en un hilo daemon"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Sin log por petición
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def write_snapshot(self, path="logs/metrics.jsonl", max_bytes=5_000_000, backups=3):
+        """Añade un snapshot JSON al fichero de métricas (rotado por tamaño)"""
+        if self._file_logger is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._file_logger = logging.getLogger("TraderMetrics")
+            self._file_logger.propagate = False
+            self._file_logger.setLevel(logging.INFO)
+            self._file_logger.addHandler(handler)
+        self._file_logger.info(json.dumps(self.snapshot()))
+
+def instrument_engine(engine, registry=None):
+    """Cuenta cada viaje de ida y vuelta a la base de datos del engine dado"""
+    from sqlalchemy import event
+
+    registry = registry or metrics
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_roundtrip(conn, cursor, statement, parameters, context, executemany):
+        registry.inc("trader_db_roundtrips_total")
+
+# Registro global del proceso
+metrics = Metrics()
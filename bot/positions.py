@@ -0,0 +1,247 @@
+# bot/positions.py
+from datetime import datetime
+from brain.memory import log_trade, alog_trade, aclose_trade, mark_closed, get_session
+from database.models import Trade, Decision
+from config.logs import get_logger
+
+logger = get_logger("PositionBook")
+
+class Position:
+    """Copia en memoria de un trade abierto"""
+
+    __slots__ = ("id", "symbol", "side", "entry_price", "atr", "stop_loss", "take_profit", "trade_time",
+                 "rsi", "mode", "low_volume")
+
+    def __init__(self, id, symbol, side, entry_price, atr, stop_loss=None, take_profit=None, trade_time=None,
+                 rsi=None, mode=None, low_volume=False):
+        self.id = id
+        self.symbol = symbol
+        self.side = side
+        self.entry_price = entry_price
+        self.atr = atr
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trade_time = trade_time
+        # Contexto de entrada para las estadísticas online (no forma parte de key())
+        self.rsi = rsi
+        self.mode = mode
+        self.low_volume = low_volume
+
+    @classmethod
+    def from_trade(cls, trade, vol_mean=None, mode=None):
+        """Position de un trade de la base de datos; `vol_mean` y `mode` de su decisión de apertura"""
+        return cls(
+            id=trade.id,
+            symbol=trade.symbol,
+            side=trade.side,
+            entry_price=trade.entry_price,
+            atr=trade.atr,
+            stop_loss=trade.stop_loss,
+            take_profit=trade.take_profit,
+            trade_time=trade.trade_time,
+            rsi=trade.rsi,
+            mode=mode,
+            # Misma regla que OnlineStats.rebuild
+            low_volume=vol_mean is not None and trade.volume is not None and trade.volume < vol_mean * 1.05,
+        )
+
+    def key(self):
+        """Campos que deben coincidir con la base de datos"""
+        return (self.symbol, self.side, self.entry_price, self.atr, self.stop_loss, self.take_profit)
+
+class PositionBook:
+    """
+    Libro de posiciones abiertas en memoria.
+    Se carga una sola vez al arrancar; las comprobaciones de cada ciclo
+    (SL/TP, cambio de señal, posición del mismo lado) no tocan la base de
+    datos. Solo se escribe (write-through) cuando una posición se abre o cierra.
+    """
+
+    def __init__(self, stats=None, symbols=None, persistence=None):
+        self.positions = {}  # id -> Position
+        self.loaded = False
+        self.version = 0  # Cambia con cada apertura, cierre o recarga (caché del monitor de salidas)
+        self.stats = stats  # OnlineStats que se actualiza en cada cierre (opcional)
+        self.symbols = symbols  # Solo estos símbolos (shard del runner); None = todos
+        self.persistence = persistence  # AsyncPersistence: aperturas/cierres por el motor asíncrono (opcional)
+
+    def _query_open(self):
+        """Lee de la base de datos los trades abiertos"""
+        session = get_session()
+        try:
+            query = session.query(Trade, Decision.vol_mean, Decision.mode).outerjoin(
+                Decision, Decision.trade_id == Trade.id
+            ).filter(
+                Trade.side.in_(['LONG', 'SHORT']),
+                Trade.exit_price == None
+            )
+            if self.symbols is not None:
+                query = query.filter(Trade.symbol.in_(list(self.symbols)))
+            return {t.id: Position.from_trade(t, vol_mean, mode) for t, vol_mean, mode in query.all()}
+        finally:
+            session.close()
+
+    def load(self):
+        """Carga (o recarga) todas las posiciones abiertas desde la base de datos"""
+        self.positions = self._query_open()
+        self.loaded = True
+        self.version += 1
+        return len(self.positions)
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def open_positions(self, symbol=None):
+        """Lista de posiciones abiertas (opcionalmente de un solo símbolo)"""
+        self.ensure_loaded()
+        # list() copia los valores de una vez: el monitor de salidas cierra desde otro hilo
+        return [p for p in list(self.positions.values()) if symbol is None or p.symbol == symbol]
+
+    def get_open(self, symbol, side):
+        """Primera posición abierta para el símbolo y lado dados, o None"""
+        for position in self.open_positions(symbol):
+            if position.side == side:
+                return position
+        return None
+
+    def open(self, symbol, side, entry_price, rsi, ema50, ema200, atr, volume, stop_loss=None, take_profit=None,
+             vol_mean=None, mode=None):
+        """
+        Registra una nueva posición en la base de datos y en el libro.
+        `vol_mean` y `mode` solo alimentan las estadísticas online.
+        Retorna la Position creada, o None si no se pudo guardar.
+        """
+        self.ensure_loaded()
+        fields = dict(
+            symbol=symbol,
+            side=side,
+            entry_price=entry_price,
+            exit_price=None,
+            pnl=0.0,
+            rsi=rsi,
+            ema50=ema50,
+            ema200=ema200,
+            atr=atr,
+            volume=volume,
+            exit_reason=None,
+            stop_loss=stop_loss,
+            take_profit=take_profit,
+        )
+        if self.persistence is not None:
+            trade_id = self.persistence.call(alog_trade(**fields)).result()
+        else:
+            trade_id = log_trade(**fields)
+        if trade_id is None:
+            return None
+
+        position = Position(
+            id=trade_id,
+            symbol=symbol,
+            side=side,
+            entry_price=float(entry_price),
+            atr=float(atr),
+            stop_loss=float(stop_loss) if stop_loss is not None else None,
+            take_profit=float(take_profit) if take_profit is not None else None,
+            trade_time=datetime.utcnow(),
+            rsi=float(rsi) if rsi is not None else None,
+            mode=mode,
+            low_volume=vol_mean is not None and float(volume) < float(vol_mean) * 1.05,
+        )
+        self.positions[trade_id] = position
+        self.version += 1
+        return position
+
+    def close(self, position, exit_price, reason):
+        """
+        Cierra la posición en la base de datos y la retira del libro.
+        Retorna el PnL porcentual, o None si la escritura falló.
+        Si otro proceso ya la había cerrado, solo se retira del libro.
+        """
+        exit_price = float(exit_price)
+        if position.side == 'LONG':
+            pnl = ((exit_price - position.entry_price) / position.entry_price) * 100
+        else:
+            pnl = ((position.entry_price - exit_price) / position.entry_price) * 100
+
+        try:
+            updated = self._write_close(position, exit_price, pnl, reason)
+        except Exception as e:
+            logger.error(f"❌ Error al cerrar trade {position.id}: {e}",
+                         extra={"event": "close_error", "symbol": position.symbol, "trade_id": position.id})
+            return None
+
+        self.forget(position.id)
+        if not updated:
+            logger.warning(f"⚠️ Trade {position.id} ya estaba cerrado en la base de datos.",
+                           extra={"event": "already_closed", "symbol": position.symbol, "trade_id": position.id})
+            return None
+
+        if self.stats is not None:
+            try:
+                self.stats.record_close(
+                    position.side, pnl,
+                    rsi=position.rsi,
+                    atr=position.atr,
+                    hour=position.trade_time.hour if position.trade_time else None,
+                    mode=position.mode,
+                    low_volume=position.low_volume,
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudieron actualizar las estadísticas online: {e}",
+                               extra={"event": "online_stats_error", "trade_id": position.id})
+        return pnl
+
+    def _write_close(self, position, exit_price, pnl, reason):
+        """Escribe el cierre (motor síncrono o asíncrono). Retorna si el trade seguía abierto"""
+        args = (position.id, position.symbol, position.side, exit_price, pnl, reason)
+        if self.persistence is not None:
+            return self.persistence.call(aclose_trade(*args)).result()
+        session = get_session()
+        try:
+            updated = mark_closed(session, *args)
+            session.commit()
+            return updated
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def forget(self, position_id):
+        """Retira una posición del libro sin tocar la base de datos"""
+        if self.positions.pop(position_id, None) is not None:
+            self.version += 1
+
+    def reconcile(self):
+        """
+        Compara el libro con la base de datos y adopta el estado de la base
+        de datos, que es la fuente de verdad. Retorna las diferencias encontradas.
+        """
+        db_positions = self._query_open()
+        mem_ids = set(self.positions)
+        db_ids = set(db_positions)
+
+        diff = {
+            "missing": sorted(db_ids - mem_ids),   # abiertos en BD, no en memoria
+            "stale": sorted(mem_ids - db_ids),     # en memoria pero ya cerrados en BD
+            "changed": sorted(
+                i for i in mem_ids & db_ids
+                if self.positions[i].key() != db_positions[i].key()
+            ),
+        }
+
+        # Sin cambios: se conserva la copia en memoria (lleva el modo de apertura)
+        for i in (mem_ids & db_ids).difference(diff["changed"]):
+            db_positions[i] = self.positions[i]
+        self.positions = db_positions
+        self.loaded = True
+        self.version += 1
+
+        if any(diff.values()):
+            logger.info(
+                f"🔁 Reconciliación: {len(diff['missing'])} añadidas, "
+                f"{len(diff['stale'])} retiradas, {len(diff['changed'])} actualizadas",
+                extra={"event": "reconcile", **{k: len(v) for k, v in diff.items()}},
+            )
+        return diff
@@ -0,0 +1,145 @@
+# bot/profiling.py
+"""
+Perfilado integrado para el runner, el backtest y el análisis.
+
+Dos modos:
+- "cprofile": perfil determinista de cProfile, guardado como `.pstats`
+  (abrir con `python -m pstats`, snakeviz, etc.).
+- "sample": muestreo del stack del hilo perfilado con `sys._current_frames()`
+  cada `interval` segundos, guardado como stacks colapsados (`.collapsed`,
+  una línea "frame;frame;frame N") listos para flamegraph.pl o speedscope.
+
+Con `every=N` solo se perfila una de cada N llamadas, de modo que el modo
+"sample" con un N alto puede dejarse activo en producción.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from config.logs import get_logger
+
+logger = get_logger("Profiler")
+
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ("cprofile", "sample")
+
+class StackSampler:
+    """Hilo que muestrea periódicamente el stack de otro hilo"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class Profiler:
+    """
+    Perfilador por bloque (`with profiler.profile("cycle"):`).
+
+    Args:
+        mode (str): "cprofile" o "sample".
+        every (int): Perfilar solo una de cada N llamadas.
+        output_dir (str): Directorio de salida de los perfiles.
+        interval (float): Periodo de muestreo en segundos (modo "sample").
+    """
+
+    def __init__(self, mode="cprofile", every=1, output_dir=PROFILE_DIR, interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfilado desconocido: {mode}")
+        self.mode = mode
+        self.every = max(1, int(every))
+        self.output_dir = output_dir
+        self.interval = interval
+        self.calls = 0
+        self.written = []
+
+    def _path(self, label):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        ext = "pstats" if self.mode == "cprofile" else "collapsed"
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+        return os.path.join(self.output_dir, f"{safe}-{stamp}-{self.calls}.{ext}")
+
+    @contextmanager
+    def profile(self, label):
+        """Perfila el bloque si le toca según `every`; si no, no añade coste"""
+        self.calls += 1
+        if (self.calls - 1) % self.every:
+            yield
+            return
+
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                path = self._path(label)
+                profiler.dump_stats(path)
+                self.written.append(path)
+        else:
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                path = self._path(label)
+                sampler.write(path)
+                self.written.append(path)
+        logger.info(f"🔬 Perfil guardado en {path}", extra={"event": "profile_saved", "path": path})
+
+def add_profile_arguments(parser):
+    """Añade las opciones --profile* comunes a un ArgumentParser"""
+    parser.add_argument('--profile', action='store_true', help='Perfilar la ejecución (pstats o stacks colapsados)')
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='cprofile',
+                        help='cprofile (.pstats) o sample (.collapsed para flame graphs)')
+    parser.add_argument('--profile-every', type=int, default=1, metavar='N',
+                        help='Perfilar solo uno de cada N ciclos/barridos')
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help='Directorio de salida de los perfiles')
+    return parser
+
+def profiler_from_args(args):
+    """Crea un Profiler a partir de los argumentos, o None si no se pidió --profile"""
+    if not args.profile:
+        return None
+    return Profiler(mode=args.profile_mode, every=args.profile_every, output_dir=args.profile_dir)
+
+@contextmanager
+def maybe_profile(profiler, label):
+    """`profiler.profile(label)` si hay perfilador; si no, bloque vacío"""
+    if profiler is None:
+        yield
+    else:
+        with profiler.profile(label):
+            yield
@@ -1,220 +1,636 @@
 from config.optimizer import optimizer
 from datetime import datetime
+import argparse
+import os
 import time
+import signal as os_signal
 import pandas as pd
 
-from exchange.bingx_client import fetch_ohlcv
+from exchange.bingx_client import fetch_ohlcv, get_async_bingx
+from exchange.execution import ExecutionService
+from exchange.mock_exchange import MockExchange
+from exchange.paper import PaperEngine
 from strategy.indicators import calculate_indicators
-from strategy.daytrading import generate_signal, is_liquid_hour
-from brain.memory import log_trade, get_session
+from strategy.daytrading import generate_signal, is_liquid_hour, current_regime
+from brain.memory import log_decision, alog_decision, AsyncPersistence
+from brain.risk import initial_levels
 from brain.stats import print_summary
-from database.models import Trade, init_db
+from database.models import init_db
+from bot.positions import PositionBook
+from bot.scheduler import CandleScheduler
+from bot.exit_monitor import ExitMonitor
+from bot.learning_worker import LearningWorker
+from bot.coordinator import Coordinator
+from brain.online_stats import OnlineStats
+from database.features import FeatureStore
+from database.candles import CandleArchive
+from bot.metrics import metrics, instrument_engine
+from bot.profiling import add_profile_arguments, profiler_from_args, maybe_profile
+from config.logs import get_logger, setup_logging
+
+logger = get_logger("TraderBot")
 
 # Configuración global
 SYMBOL = "BTC/USDT:USDT"
+SIMBOLOS = [SYMBOL]  # Modo multi-símbolo (--shards): se reparten entre procesos
 INTERVALO_SEGUNDOS = 60  # Frecuencia de análisis (1 minuto)
+RETRASO_CIERRE_SEGUNDOS = 2.0  # Margen tras el cierre de vela para que el exchange la publique
+POLITICA_VELAS_PERDIDAS = "skip"  # "skip" (solo la última) o "catchup" (procesar todas)
+
+# Salidas intrabar: SL/TP con break-even y trailing stop (mismas reglas que el backtest)
+TRAILING_STOP = True
+BREAK_EVEN = True
+FUENTE_TICKS = None  # "trades" (websocket, ccxt.pro), "ticker" (sondeo) o None (solo máx/mín de cada vela)
+INTERVALO_TICKS = 1.0  # Segundos entre sondeos del ticker
+
+# Envío de órdenes (asíncrono, no bloquea el ciclo)
+EJECUCION = None  # None (solo registro en base de datos), "mock" (exchange local) o "live" (órdenes reales en BingX)
+TAMANO_ORDEN = 0.001  # Cantidad por orden (BTC)
+
+# Persistencia por el motor asíncrono (asyncpg/aiosqlite, database/db.py) en un event loop
+# propio: decisiones sin esperar a la base de datos y aperturas/cierres por su pool
+PERSISTENCIA_ASYNC = False
+
+# Paper trading: réplica de las operaciones del bot con llenados realistas
+# (siguiente precio, deslizamiento y comisiones) en lugar de "al último cierre"
+PAPER_TRADING = False
+CUENTA_PAPER = "bot"
+
+# Métricas de latencia por etapa (None desactiva cada salida)
+METRICS_PORT = 9108  # Endpoint Prometheus en http://127.0.0.1:9108/metrics
+METRICS_FILE = "logs/metrics.jsonl"  # Snapshot JSON por lote de velas (rotativo)
+RESUMEN_CADA_CICLOS = 15  # Frecuencia del resumen de rendimiento en consola
+
+# Planificador alineado al cierre de vela de 1m
+scheduler = CandleScheduler(
+    timeframe_seconds=INTERVALO_SEGUNDOS,
+    delay_seconds=RETRASO_CIERRE_SEGUNDOS,
+    missed_policy=POLITICA_VELAS_PERDIDAS,
+)
+
+# Libro de posiciones abiertas en memoria (se carga al primer uso o en main)
+book = PositionBook()
+
+# Límite de peticiones compartido entre shards (lo fija shard_main; None = solo el de ccxt)
+rate_limiter = None
+
+# Servicio de ejecución de órdenes (se arranca en main si EJECUCION está activo)
+execution = None
+
+# Loop de persistencia asíncrona (se arranca en main/shard_main si PERSISTENCIA_ASYNC)
+persistence = None
+
+# Motor de paper trading (admite más cuentas/estrategias en paralelo)
+paper = PaperEngine() if PAPER_TRADING else None
 
-# Parámetros de Gestión de Riesgo (Fase 1 del Roadmap)
-ATR_MULTIPLIER_SL = 1.5  # Stop Loss a 1.5 veces el ATR
-ATR_MULTIPLIER_TP = 3.0  # Take Profit a 3 veces el ATR (Ratio 1:2)
+def close_position(position, price, reason):
+    """Cierra en el libro (y en la base de datos) y, si hay ejecución, envía la orden de salida"""
+    pnl = book.close(position, price, reason)
+    if pnl is not None and execution is not None:
+        execution.close_position(position.id, position.symbol, position.side)
+    if pnl is not None and paper is not None:
+        paper.close_position(CUENTA_PAPER, position.symbol)
+    return pnl
 
-def close_pending_trades(current_price, current_signal):
+# Monitor de salidas del libro (ticks en su propio hilo + respaldo por vela en cada ciclo)
+exit_monitor = ExitMonitor(book, trailing=TRAILING_STOP, break_even=BREAK_EVEN, closer=close_position,
+                           listeners=[paper.update] if paper is not None else [])
+
+# Características de cada decisión (indicadores + contexto), volcadas por lotes a Parquet
+feature_store = FeatureStore()
+
+# Velas cerradas para etiquetar decisiones a posteriori (brain/labeler.py)
+candle_archive = CandleArchive()
+
+# Reconciliación libro <-> base de datos solicitada bajo demanda (SIGUSR1)
+_reconcile_requested = False
+
+def request_reconcile(*_):
+    """Marca el libro para reconciliarse con la base de datos al inicio del próximo ciclo"""
+    global _reconcile_requested
+    _reconcile_requested = True
+
+def close_pending_trades(current_price, current_signal, bar=None, symbol=SYMBOL):
     """
-    Busca trades abiertos y evalúa si deben cerrarse por:
-    1. Alcance de niveles de Stop Loss o Take Profit (Gestión de Riesgo).
+    Revisa las posiciones abiertas del libro en memoria y evalúa si deben cerrarse por:
+    1. Niveles de riesgo tocados durante la vela (SL/TP, break-even, trailing), con
+       su máximo/mínimo: el monitor de salidas no pierde las mechas entre ticks.
     2. Cambio de señal (si la señal actual es diferente a la del trade abierto).
+    Solo se escribe en la base de datos cuando una posición se cierra.
+
+    Args:
+        bar (tuple): (máximo, mínimo, cierre) de la vela. Si es None se usa el precio actual.
+        symbol (str): Solo se revisan las posiciones de este símbolo.
     """
-    session = get_session()
     try:
-        # Buscamos trades LONG o SHORT que aún no tienen precio de salida registrado
-        pending_trades = session.query(Trade).filter(
-            Trade.side.in_(['LONG', 'SHORT']),
-            Trade.exit_price == None
-        ).all()
+        if bar is not None:
+            exit_monitor.on_bar(symbol, *bar)
+        else:
+            exit_monitor.on_price(symbol, current_price)
 
-        if not pending_trades:
-            return
-
-        for trade in pending_trades:
-            should_close = False
-            reason = ""
-
-            # 1. Cierre por cambio de señal (si la señal actual es opuesta o NO_TRADE)
-            if current_signal != trade.side:
-                should_close = True
+        # Bajo el lock del monitor para no competir con los cierres por ticks
+        with exit_monitor.lock:
+            for trade in book.open_positions(symbol):
+                # Cierre por cambio de señal (si la señal actual es opuesta o NO_TRADE)
+                if current_signal == trade.side:
+                    continue
                 reason = "CAMBIO DE SEÑAL"
-
-            # 2. Cierre por gestión de riesgo (SL/TP) solo si no se cerró por cambio de señal
-            if not should_close and trade.atr:
-                current_atr = trade.atr
-                if trade.side == 'LONG':
-                    sl_level = trade.entry_price - (current_atr * ATR_MULTIPLIER_SL)
-                    tp_level = trade.entry_price + (current_atr * ATR_MULTIPLIER_TP)
-                    if current_price <= sl_level:
-                        should_close = True
-                        reason = "STOP LOSS (ATR)"
-                    elif current_price >= tp_level:
-                        should_close = True
-                        reason = "TAKE PROFIT (ATR)"
-                
-                elif trade.side == 'SHORT':
-                    sl_level = trade.entry_price + (current_atr * ATR_MULTIPLIER_SL)
-                    tp_level = trade.entry_price - (current_atr * ATR_MULTIPLIER_TP)
-                    if current_price >= sl_level:
-                        should_close = True
-                        reason = "STOP LOSS (ATR)"
-                    elif current_price <= tp_level:
-                        should_close = True
-                        reason = "TAKE PROFIT (ATR)"
-
-            # Si se debe cerrar, actualizamos la base de datos
-            if should_close:
-                trade.exit_price = float(current_price)
-                trade.exit_reason = reason
-                
-                # Cálculo de PnL Porcentual
-                if trade.side == 'LONG':
-                    trade.pnl = ((trade.exit_price - trade.entry_price) / trade.entry_price) * 100
-                elif trade.side == 'SHORT':
-                    trade.pnl = ((trade.entry_price - trade.exit_price) / trade.entry_price) * 100
-                
-                print(f"✅ Trade {trade.id} cerrado ({reason}). PnL: {trade.pnl:.4f}%")
-
-        session.commit()
+                pnl = close_position(trade, current_price, reason)
+                if pnl is not None:
+                    metrics.inc("trader_trades_closed_total", side=trade.side)
+                    logger.info(
+                        f"✅ Trade {trade.id} cerrado ({reason}). PnL: {pnl:.4f}%",
+                        extra={"event": "trade_closed", "symbol": trade.symbol, "side": trade.side,
+                               "trade_id": trade.id, "reason": reason, "pnl": pnl},
+                    )
         
     except Exception as e:
-        session.rollback()
-        print(f"❌ Error al procesar cierres: {e}")
-    finally:
-        session.close()
+        metrics.inc("trader_errors_total", stage="close_pending_trades")
+        logger.error(f"❌ Error al procesar cierres: {e}", extra={"event": "close_error"})
 
-def run_bot_cycle():
+def run_bot_cycle(bar_close=None, symbol=SYMBOL):
     """
-    Ciclo operativo: Datos -> Cierre -> Análisis -> Registro
+    Ciclo operativo: Datos -> Cierre -> Análisis -> Registro -> Decisión
+
+    Args:
+        bar_close (float): Cierre de vela (epoch, segundos) que se está procesando.
+                           Si se indica, solo se usan velas ya cerradas hasta ese
+                           instante y se registra la latencia cierre -> decisión.
+                           Si es None, se usa la última vela recibida (en formación).
+        symbol (str): Mercado del ciclo.
     """
     now = datetime.utcnow()
+    metrics.inc("trader_cycles_total")
     
     try:
         # 1. Obtención de datos reales de BingX
-        ohlcv = fetch_ohlcv(symbol=SYMBOL, timeframe="1m", limit=100, use_sandbox=False)
+        if rate_limiter is not None:
+            with metrics.span("rate_limit"):
+                rate_limiter.acquire()
+        with metrics.span("fetch_ohlcv"):
+            ohlcv = fetch_ohlcv(symbol=symbol, timeframe="1m", limit=100, use_sandbox=False)
+        if ohlcv and bar_close is not None:
+            # El timestamp de cada vela es su apertura: cerrada si apertura + 1m <= cierre
+            close_ms = bar_close * 1000
+            ohlcv = [c for c in ohlcv if c[0] + INTERVALO_SEGUNDOS * 1000 <= close_ms]
         if not ohlcv:
-            print("⚠️ Datos no disponibles.")
+            logger.warning("⚠️ Datos no disponibles.", extra={"event": "no_data", "symbol": symbol})
             return
+        # Solo velas cerradas: sin bar_close la última sigue en formación
+        candle_archive.append(symbol, ohlcv if bar_close is not None else ohlcv[:-1])
         
-        df = calculate_indicators(ohlcv)
+        with metrics.span("calculate_indicators"):
+            df = calculate_indicators(ohlcv)
         last = df.iloc[-1]
         current_price = last["close"]
+        if execution is not None:
+            execution.mark_price(symbol, current_price)
+        if paper is not None:
+            # Llena las órdenes paper pendientes (las del ciclo anterior si no hay ticks)
+            paper.update(symbol, float(current_price))
     except Exception as e:
-        print(f"⚠️ Error de red/indicadores: {e}")
+        logger.warning(f"⚠️ Error de red/indicadores: {e}", extra={"event": "fetch_error", "symbol": symbol})
         return
 
     # 2. Análisis de estrategia actual
-    signal = generate_signal(df)
-    mode = "ACTIVO" if is_liquid_hour(now.hour) else "MONITOREO"
+    with metrics.span("generate_signal"):
+        signal = generate_signal(df, symbol)
+    metrics.inc("trader_signals_total", signal=signal)
+    mode = "ACTIVO" if is_liquid_hour(now.hour, symbol) else "MONITOREO"
+    latency = scheduler.record_decision(bar_close) if bar_close is not None else None
     
-    print(
-        f"[{now.strftime('%H:%M:%S')}] BTC: {current_price:.2f} | "
+    logger.info(
+        f"[{now.strftime('%H:%M:%S')}] {symbol.split('/')[0]}: {current_price:.2f} | "
         f"Señal: {signal} | Modo: {mode} | ATR: {last['atr']:.2f}"
+        + (f" | Latencia: {latency:.2f}s" if latency is not None else ""),
+        extra={"event": "cycle", "symbol": symbol, "price": float(current_price), "signal": signal,
+               "mode": mode, "atr": float(last["atr"]), "latency": latency},
     )
 
     # 3. Gestión de salidas del ciclo previo (SL/TP o cambio de señal)
-    close_pending_trades(current_price, signal)
+    with metrics.span("close_pending_trades"):
+        close_pending_trades(current_price, signal, bar=(last["high"], last["low"], current_price), symbol=symbol)
 
     # 4. Solo abrimos nuevo trade si no hay uno abierto del mismo lado
+    trade_id = None
     if signal in ['LONG', 'SHORT']:
-        session = get_session()
         try:
-            open_trade = session.query(Trade).filter(
-                Trade.side == signal,
-                Trade.exit_price == None
-            ).first()
+            open_trade = book.get_open(symbol, signal)
             
             if not open_trade:
                 # Calculamos SL y TP basados en ATR
                 atr_value = last['atr']
-                if signal == 'LONG':
-                    stop_loss = current_price - (atr_value * ATR_MULTIPLIER_SL)
-                    take_profit = current_price + (atr_value * ATR_MULTIPLIER_TP)
-                else:  # SHORT
-                    stop_loss = current_price + (atr_value * ATR_MULTIPLIER_SL)
-                    take_profit = current_price - (atr_value * ATR_MULTIPLIER_TP)
+                stop_loss, take_profit = initial_levels(current_price, atr_value, signal)
                 
-                log_trade(
-                    symbol=SYMBOL,
-                    side=signal,
-                    entry_price=current_price,
-                    exit_price=None,
-                    pnl=0.0,
-                    rsi=last["rsi"],
-                    ema50=last["ema50"],
-                    ema200=last["ema200"],
-                    atr=atr_value,
-                    volume=last["volume"],
-                    exit_reason=None,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit,
-                )
-                print(f"📈 Nueva entrada: {signal} a {current_price:.2f}")
-                print(f"   SL: {stop_loss:.2f}, TP: {take_profit:.2f}")
+                with metrics.span("open_trade"):
+                    position = book.open(
+                        symbol=symbol,
+                        side=signal,
+                        entry_price=current_price,
+                        rsi=last["rsi"],
+                        ema50=last["ema50"],
+                        ema200=last["ema200"],
+                        atr=atr_value,
+                        volume=last["volume"],
+                        stop_loss=stop_loss,
+                        take_profit=take_profit,
+                        vol_mean=last["vol_mean"],
+                        mode=mode,
+                    )
+                if position:
+                    metrics.inc("trader_trades_opened_total", side=signal)
+                    trade_id = position.id
+                    if execution is not None:
+                        execution.open_position(trade_id, symbol, signal, TAMANO_ORDEN,
+                                                stop_loss=stop_loss, take_profit=take_profit)
+                    if paper is not None:
+                        paper.submit(CUENTA_PAPER, symbol, signal, TAMANO_ORDEN)
+                    logger.info(
+                        f"📈 Nueva entrada: {signal} a {current_price:.2f} | SL: {stop_loss:.2f}, TP: {take_profit:.2f}",
+                        extra={"event": "trade_opened", "symbol": symbol, "side": signal, "trade_id": trade_id,
+                               "price": float(current_price), "stop_loss": float(stop_loss),
+                               "take_profit": float(take_profit)},
+                    )
         except Exception as e:
-            print(f"⚠️ Error al verificar trades abiertos: {e}")
-        finally:
-            session.close()
-
-def main():
-    print("==================================================")
-    print("🤖 TRADER BOTIA - MODO APRENDIZAJE ACTIVADO")
-    print("==================================================")
+            logger.warning(f"⚠️ Error al verificar trades abiertos: {e}", extra={"event": "open_error", "symbol": symbol})
+
+    # 5. Registro append-only de la decisión del ciclo (incluye NO_TRADE)
+    decision = dict(
+        symbol=symbol,
+        side=signal,
+        price=current_price,
+        rsi=last["rsi"],
+        ema50=last["ema50"],
+        ema200=last["ema200"],
+        atr=last["atr"],
+        volume=last["volume"],
+        vol_mean=last["vol_mean"],
+        mode=mode,
+        trade_id=trade_id,
+        regime=current_regime(df),
+    )
+    if persistence is not None:
+        # Sin esperar a la base de datos: las características se guardan cuando la decisión tiene id
+        future = persistence.call(alog_decision(**decision))
+        future.add_done_callback(lambda f: feature_store.record(f.result(), symbol, signal, mode, df))
+    else:
+        with metrics.span("log_decision"):
+            decision_id = log_decision(**decision)
+
+        with metrics.span("feature_store"):
+            feature_store.record(decision_id, symbol, signal, mode, df)
+
+def on_order_fill(order, quantity, price):
+    """
+    Llenados de órdenes (hilo de ejecución). Un SL/TP reduce-only que se
+    completa en el exchange cierra el trade en el libro a su precio medio, y
+    close_position cancela la protección que queda.
+    """
+    ExecutionService.log_fill(order, quantity, price)
+    if order.purpose not in ("sl", "tp") or order.remaining > 1e-12:
+        return
+    reason = "STOP LOSS (ATR)" if order.purpose == "sl" else "TAKE PROFIT (ATR)"
+    with exit_monitor.lock:
+        position = book.positions.get(order.trade_id)
+        if position is None:
+            return  # Ya cerrado en local (monitor de salidas o cambio de señal)
+        pnl = close_position(position, order.average, reason)
+    if pnl is not None:
+        metrics.inc("trader_trades_closed_total", side=position.side)
+        logger.info(
+            f"✅ Trade {position.id} cerrado en el exchange ({reason}). PnL: {pnl:.4f}%",
+            extra={"event": "trade_closed", "symbol": position.symbol, "side": position.side,
+                   "trade_id": position.id, "reason": reason, "pnl": pnl, "price": order.average},
+        )
+
+def start_execution():
+    """Arranca el servicio de órdenes (reales o simuladas) en un event loop propio"""
+    global execution
+    factory = get_async_bingx if EJECUCION == "live" else MockExchange
+    execution = ExecutionService(factory, on_fill=on_order_fill).start()
+    logger.info(f"🧾 Ejecución de órdenes activa ({EJECUCION}), {TAMANO_ORDEN} por orden")
+
+def start_persistence():
+    """Arranca el loop de persistencia asíncrona y le pasa las escrituras del libro"""
+    global persistence
+    persistence = AsyncPersistence().start()
+    book.persistence = persistence
+    logger.info("💾 Persistencia asíncrona activa (decisiones, aperturas y cierres)")
+
+def stop_persistence():
+    """Espera a las escrituras pendientes y cierra el pool asíncrono"""
+    global persistence
+    if persistence is not None:
+        persistence.stop()
+        book.persistence = persistence = None
+
+def main(profiler=None):
+    """
+    Bucle principal del bot.
+
+    Args:
+        profiler (Profiler): Si se indica, perfila los ciclos según su `every`.
+    """
+    global _reconcile_requested
+    setup_logging()
+
+    logger.info("==================================================")
+    logger.info("🤖 TRADER BOTIA - MODO APRENDIZAJE ACTIVADO")
+    logger.info("==================================================")
     
     # Mostrar parámetros actuales
     params = optimizer.get_strategy_params()
-    print(f"🔧 Modo: {params['mode']}")
-    print(f"📊 Parámetros: RSI LONG>{params['rsi_long']}, SHORT<{params['rsi_short']}")
-    print(f"   Volumen: x{params['volume_multiplier']}, ATR: {params['atr_min_percentile']}-{params['atr_max_percentile']}")
-    print("="*50 + "\n")
+    logger.info(f"🔧 Modo: {params['mode']}")
+    logger.info(f"📊 Parámetros: RSI LONG>{params['rsi_long']}, SHORT<{params['rsi_short']}")
+    logger.info(f"   Volumen: x{params['volume_multiplier']}, ATR: {params['atr_min_percentile']}-{params['atr_max_percentile']}")
+    logger.info("="*50)
     
     try:
         init_db()
-        print("✅ Base de datos conectada.")
+        logger.info("✅ Base de datos conectada.")
+        from database.db import engine
+        instrument_engine(engine)
+        book.reconcile()
+        logger.info(f"📒 Posiciones abiertas en memoria: {len(book.positions)}")
+        book.stats = OnlineStats.open()
+        logger.info(f"📐 Estadísticas online: {book.stats.closed} trades cerrados")
+        optimizer.record_baseline()
     except Exception as e:
-        print(f"❌ Error DB: {e}")
+        logger.error(f"❌ Error DB: {e}")
         return
 
+    # `kill -USR1 <pid>` fuerza una reconciliación del libro de posiciones
+    if hasattr(os_signal, "SIGUSR1"):
+        os_signal.signal(os_signal.SIGUSR1, request_reconcile)
+
+    if METRICS_PORT:
+        try:
+            metrics.serve(METRICS_PORT)
+            logger.info(f"📡 Métricas en http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo abrir el endpoint de métricas: {e}")
+
+    if PERSISTENCIA_ASYNC:
+        start_persistence()
+
+    # Análisis/optimización horarios fuera del bucle de trading
+    worker = LearningWorker(optimizer, stats=book.stats).start()
+
+    # Órdenes reales o simuladas en un event loop propio
+    if EJECUCION:
+        start_execution()
+
+    # Salidas por ticks entre cierres de vela
+    if FUENTE_TICKS:
+        exit_monitor.start(SYMBOL, FUENTE_TICKS, INTERVALO_TICKS)
+        logger.info(f"🎯 Monitor de salidas activo (fuente: {FUENTE_TICKS})")
+
     # Contador de ciclos para optimización periódica
     cycle_count = 0
+    skipped_reported = 0
     
     try:
         while True:
-            run_bot_cycle()
+            # Esperar al cierre de la próxima vela (sin deriva acumulada)
+            bars = scheduler.wait_next()
+            if len(bars) > 1 or scheduler.skipped_bars > skipped_reported:
+                logger.warning(
+                    f"⏭️ Velas pendientes: {len(bars)} | Omitidas en total: {scheduler.skipped_bars}",
+                    extra={"event": "bars_behind", "pending": len(bars), "skipped": scheduler.skipped_bars},
+                )
+                skipped_reported = scheduler.skipped_bars
+
+            if _reconcile_requested:
+                _reconcile_requested = False
+                book.reconcile()
+
+            # Aplicar parámetros nuevos solo entre ciclos, de una vez
+            snapshot = worker.poll()
+            if snapshot is not None and optimizer.apply_snapshot(snapshot):
+                logger.info(f"⚙️ Parámetros actualizados: {snapshot}", extra={"event": "params_applied", "params": snapshot})
+            changed = optimizer.apply_entries(worker.poll_entries())
+            if changed:
+                logger.info(f"⚙️ Entradas actualizadas: {changed}", extra={"event": "entries_applied", "entries": [f"{s}|{r}" for s, r in changed]})
+
+            for bar_close in bars:
+                with metrics.span("cycle", name="trader_cycle_seconds"), maybe_profile(profiler, "cycle"):
+                    run_bot_cycle(bar_close)
+                
+                # Cada 60 ciclos (1 hora), pedir análisis y optimización al worker
+                cycle_count += 1
+                if cycle_count % 60 == 0:
+                    logger.info("🔄 Ejecutando análisis de optimización...", extra={"event": "hourly_analysis"})
+                    book.reconcile()
+                    stats = scheduler.latency_stats()
+                    if stats:
+                        logger.info(
+                            f"⏱️ Latencia cierre->decisión: p50 {stats['p50']:.2f}s | "
+                            f"p95 {stats['p95']:.2f}s | máx {stats['max']:.2f}s",
+                            extra={"event": "latency_stats", **stats},
+                        )
+                    worker.request()
             
-            # Cada 60 ciclos (1 hora), ejecutar análisis y optimización
-            cycle_count += 1
-            if cycle_count % 60 == 0:
-                print("\n🔄 Ejecutando análisis de optimización...")
+            # Resumen solo cuando el lote cruza un múltiplo de RESUMEN_CADA_CICLOS
+            if cycle_count % RESUMEN_CADA_CICLOS < len(bars):
+                with metrics.span("print_summary"):
+                    print_summary()
+                    if paper is not None:
+                        for row in paper.summary().itertuples():
+                            logger.info(
+                                f"📝 Paper '{row.account}': equity {row.equity:.4f} | "
+                                f"realizado {row.realized:.4f} | comisiones {row.fees:.4f}",
+                                extra={"event": "paper_summary", "account": row.account,
+                                       "equity": float(row.equity), "fees": float(row.fees)},
+                            )
+
+            if METRICS_FILE:
                 try:
-                    from brain.learning import TradingAnalyzer
-                    analyzer = TradingAnalyzer()
-                    results = analyzer.analyze_performance()
-                    analyzer.close()
-                    
-                    if "summary" in results:
-                        total = results["summary"].get("closed_trades", 0)
-                        win_rate = results["summary"].get("win_rate", 0)
-                        total_pnl = results["summary"].get("total_pnl", 0)
-                        
-                        if total > 0:
-                            avg_pnl = total_pnl / total
-                            optimizer.analyze_and_optimize(total, win_rate, avg_pnl)
-                except Exception as e:
-                    print(f"⚠️ Error en optimización: {e}")
-            
-            print_summary()
-            time.sleep(INTERVALO_SEGUNDOS)
+                    metrics.write_snapshot(METRICS_FILE)
+                except OSError as e:
+                    logger.warning(f"⚠️ No se pudo escribir {METRICS_FILE}: {e}", extra={"event": "metrics_error"})
             
     except KeyboardInterrupt:
-        print("\n🛑 Apagado por el usuario.")
+        logger.info("🛑 Apagado por el usuario.", extra={"event": "shutdown"})
+    except Exception as e:
+        logger.critical(f"💥 Error crítico: {e}", extra={"event": "fatal"}, exc_info=True)
+    finally:
+        exit_monitor.stop()
+        if execution is not None:
+            execution.stop()
+        worker.stop()
+        stop_persistence()
+        feature_store.flush()
+        candle_archive.flush()
+
+def _terminate(*_):
+    """SIGTERM en un shard: sale por el `finally` (vuelca buffers) sin repetirse"""
+    os_signal.signal(os_signal.SIGTERM, os_signal.SIG_IGN)
+    raise SystemExit(0)
+
+def shard_report(cycles):
+    """Informe de un shard para el coordinador: salud, posiciones, paper y métricas"""
+    return {
+        "pid": os.getpid(),
+        "cycles": cycles,
+        "skipped_bars": scheduler.skipped_bars,
+        "latency": scheduler.latency_stats(),
+        "positions": [
+            {"id": p.id, "symbol": p.symbol, "side": p.side, "entry_price": p.entry_price,
+             "stop_loss": p.stop_loss, "take_profit": p.take_profit}
+            for p in book.open_positions()
+        ],
+        "paper": paper.summary().to_dict("records") if paper is not None else [],
+        "metrics": metrics.export_state(),
+        "stats": book.stats.drain() if book.stats is not None and book.stats.closed else None,
+    }
+
+def shard_main(shard, symbols, limiter, heartbeats, conn, stop_event):
+    """
+    Proceso de un shard del modo multi-símbolo (lo lanza bot/coordinator.py).
+
+    En cada cierre de vela ejecuta el ciclo de sus `symbols`, con el libro
+    filtrado a esos símbolos y el límite de peticiones compartido. Marca un
+    latido por símbolo y, tras cada lote de velas, envía su informe al
+    coordinador, de quien recibe los parámetros nuevos. Sin ticks intrabar
+    (las salidas se evalúan con el máximo/mínimo de cada vela), sin endpoint
+    de métricas y sin análisis horario: eso queda en el coordinador.
+    """
+    global rate_limiter
+    setup_logging()
+    rate_limiter = limiter
+    os_signal.signal(os_signal.SIGINT, os_signal.SIG_IGN)  # Ctrl+C lo gestiona el coordinador
+    os_signal.signal(os_signal.SIGTERM, _terminate)
+
+    init_db()
+    from database.db import engine
+    instrument_engine(engine)
+    book.symbols = set(symbols)
+    book.stats = OnlineStats(path=None)  # Solo los cierres del shard; el coordinador los suma
+    book.reconcile()
+    logger.info(f"🧩 Shard {shard}: {len(symbols)} símbolos | Posiciones abiertas: {len(book.positions)}",
+                extra={"event": "shard_ready", "shard": shard, "symbols": len(symbols)})
+    if PERSISTENCIA_ASYNC:
+        start_persistence()
+    if EJECUCION:
+        start_execution()
+
+    cycle_count = 0
+    try:
+        while not stop_event.is_set():
+            heartbeats[shard] = time.time()
+            bars = scheduler.wait_next()
+
+            # Comandos del coordinador, solo entre ciclos
+            while conn.poll():
+                command, payload = conn.recv()
+                if command == "params":
+                    optimizer.apply_snapshot(payload, persist=False)
+                elif command == "entries":
+                    optimizer.apply_entries(payload, persist=False)
+                elif command == "reconcile":
+                    book.reconcile()
+
+            for bar_close in bars:
+                for symbol in symbols:
+                    with metrics.span("cycle", name="trader_cycle_seconds"):
+                        run_bot_cycle(bar_close, symbol)
+                    heartbeats[shard] = time.time()
+                cycle_count += 1
+                if cycle_count % 60 == 0:
+                    book.reconcile()
+            conn.send(shard_report(cycle_count))
+    finally:
+        if execution is not None:
+            execution.stop()
+        stop_persistence()
+        feature_store.flush()
+        candle_archive.flush()
+
+def run_sharded(symbols, shards=None):
+    """
+    Modo multi-símbolo: reparte `symbols` entre procesos (bot/coordinator.py).
+    Este proceso queda como coordinador: reinicia shards caídos, agrega
+    posiciones y métricas, y ejecuta el análisis horario para todos.
+    """
+    setup_logging()
+    logger.info("==================================================")
+    logger.info(f"🤖 TRADER BOTIA - MULTI-SÍMBOLO ({len(symbols)} símbolos)")
+    logger.info("==================================================")
+    try:
+        init_db()
+        stats = OnlineStats.open()
+        logger.info(f"📐 Estadísticas online: {stats.closed} trades cerrados")
+        optimizer.record_baseline()
     except Exception as e:
-        print(f"💥 Error crítico: {e}")
+        logger.error(f"❌ Error DB: {e}")
+        return
+
+    if METRICS_PORT:
+        try:
+            metrics.serve(METRICS_PORT)
+            logger.info(f"📡 Métricas agregadas en http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo abrir el endpoint de métricas: {e}")
+
+    worker = LearningWorker(optimizer, stats=stats).start()
+    coordinator = Coordinator(symbols, shard_main, shards=shards, stats=stats).start()
+    last_status = last_analysis = time.time()
+    status_count = 0
+
+    try:
+        while not coordinator.wait(1.0):
+            coordinator.check()
+            coordinator.collect()
+
+            # Un solo análisis para todos los shards; los parámetros se reenvían a cada uno
+            snapshot = worker.poll()
+            if snapshot is not None and optimizer.apply_snapshot(snapshot):
+                coordinator.broadcast("params", snapshot)
+                logger.info(f"⚙️ Parámetros actualizados: {snapshot}", extra={"event": "params_applied", "params": snapshot})
+            entries = worker.poll_entries()
+            changed = optimizer.apply_entries(entries)
+            if changed:
+                coordinator.broadcast("entries", {key: entries[key] for key in changed})
+                logger.info(f"⚙️ Entradas actualizadas: {changed}", extra={"event": "entries_applied", "entries": [f"{s}|{r}" for s, r in changed]})
+            now = time.time()
+            if now - last_analysis >= 60 * INTERVALO_SEGUNDOS:
+                last_analysis = now
+                worker.request()
+
+            # Vista agregada una vez por vela
+            if now - last_status < INTERVALO_SEGUNDOS:
+                continue
+            last_status = now
+            status_count += 1
+            status = coordinator.write_status()
+            alive = sum(s["alive"] for s in status["shards"])
+            logger.info(
+                f"🧩 Shards vivos: {alive}/{len(status['shards'])} | Posiciones abiertas: {len(status['positions'])} | "
+                f"Ciclos: {status['totals'].get('trader_cycles_total', 0)} | "
+                f"Reinicios: {sum(s['restarts'] for s in status['shards'])}",
+                extra={"event": "coordinator_status", "alive": alive, "positions": len(status["positions"])},
+            )
+            if status_count % RESUMEN_CADA_CICLOS == 0:
+                print_summary()
+            if METRICS_FILE:
+                try:
+                    metrics.write_snapshot(METRICS_FILE)
+                except OSError as e:
+                    logger.warning(f"⚠️ No se pudo escribir {METRICS_FILE}: {e}", extra={"event": "metrics_error"})
+    except KeyboardInterrupt:
+        logger.info("🛑 Apagado por el usuario.", extra={"event": "shutdown"})
+    finally:
+        coordinator.stop()
+        worker.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Trader BotIA en vivo (velas de 1m)')
+    add_profile_arguments(parser)
+    parser.add_argument('--symbols', help='Símbolos separados por comas (por defecto SIMBOLOS)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Procesos entre los que repartir los símbolos (por defecto, uno por núcleo)')
+    args = parser.parse_args()
+    if args.shards or args.symbols:
+        run_sharded(args.symbols.split(",") if args.symbols else SIMBOLOS, args.shards or None)
+    else:
+        main(profiler_from_args(args))
\ No newline at end of file
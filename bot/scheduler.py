@@ -0,0 +1,94 @@
+# bot/scheduler.py
+import math
+import time
+from collections import deque
+
+class CandleScheduler:
+    """
+    Planificador de ciclos alineado al cierre de vela.
+
+    Despierta `delay_seconds` después de cada cierre (p.ej. hh:mm:00 + 2s en
+    velas de 1m). Los tiempos de espera se calculan con reloj monotónico
+    anclado al reloj de pared, así que el trabajo de cada ciclo no acumula
+    deriva. Si un ciclo tarda más de una vela, las velas perdidas se tratan
+    de forma explícita según `missed_policy`:
+      - "skip": solo se procesa la vela más reciente y se cuentan las omitidas.
+      - "catchup": se procesan en orden (como máximo `max_catchup`).
+    """
+
+    RESYNC_EVERY = 60  # Velas entre re-anclajes del reloj de pared
+
+    def __init__(self, timeframe_seconds=60, delay_seconds=2.0, missed_policy="skip", max_catchup=5):
+        if missed_policy not in ("skip", "catchup"):
+            raise ValueError(f"missed_policy desconocida: {missed_policy}")
+        self.timeframe = timeframe_seconds
+        self.delay = delay_seconds
+        self.missed_policy = missed_policy
+        self.max_catchup = max_catchup
+
+        self.next_close = None       # Próximo cierre de vela pendiente (epoch, segundos)
+        self.skipped_bars = 0        # Velas omitidas en total
+        self.latencies = deque(maxlen=1000)  # Latencias cierre -> decisión (segundos)
+        self._bars_since_sync = 0
+        self._resync()
+
+    def _resync(self):
+        """Ancla el reloj monotónico al reloj de pared (corrige ajustes NTP)"""
+        self._wall_anchor = time.time()
+        self._mono_anchor = time.monotonic()
+        self._bars_since_sync = 0
+
+    def now(self):
+        """Hora de pared derivada del reloj monotónico (no salta hacia atrás)"""
+        return self._wall_anchor + (time.monotonic() - self._mono_anchor)
+
+    def wait_next(self):
+        """
+        Bloquea hasta el próximo cierre de vela + retraso.
+        Retorna la lista de cierres de vela (epoch) a procesar, en orden.
+        """
+        if self._bars_since_sync >= self.RESYNC_EVERY:
+            self._resync()
+
+        now = self.now()
+        if self.next_close is None:
+            # Primer cierre cuya hora de decisión no ha pasado: si arrancamos dentro
+            # del retraso de una vela recién cerrada, esa vela aún se procesa
+            self.next_close = math.floor((now - self.delay) / self.timeframe) * self.timeframe + self.timeframe
+
+        # Último cierre cuya hora de decisión ya pasó
+        due = math.floor((now - self.delay) / self.timeframe) * self.timeframe
+        if due >= self.next_close:
+            # Vamos tarde: hay una o más velas cerradas sin procesar
+            pending = int(round((due - self.next_close) / self.timeframe)) + 1
+            bars = [self.next_close + i * self.timeframe for i in range(pending)]
+            keep = 1 if self.missed_policy == "skip" else self.max_catchup
+            self.skipped_bars += max(0, len(bars) - keep)
+            bars = bars[-keep:]
+        else:
+            target = self._mono_anchor + (self.next_close + self.delay - self._wall_anchor)
+            while True:
+                remaining = target - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, 1.0))  # Tramos cortos: Ctrl+C sigue respondiendo
+            bars = [self.next_close]
+
+        self.next_close = bars[-1] + self.timeframe
+        self._bars_since_sync += len(bars)
+        return bars
+
+    def record_decision(self, bar_close):
+        """Registra la latencia entre el cierre de la vela y la decisión tomada"""
+        latency = self.now() - bar_close
+        self.latencies.append(latency)
+        return latency
+
+    def latency_stats(self):
+        """p50 / p95 / máximo de las últimas latencias cierre -> decisión"""
+        if not self.latencies:
+            return {}
+        values = sorted(self.latencies)
+        def pct(p):
+            return values[min(len(values) - 1, int(p * len(values)))]
+        return {"p50": pct(0.50), "p95": pct(0.95), "max": values[-1], "skipped_bars": self.skipped_bars}
@@ -0,0 +1,131 @@
+# brain/charts.py
+"""
+Gráficos del informe de aprendizaje, fuera del proceso que los pide.
+
+1. `prepare_chart_cache` resume la serie (exit_time, pnl) en un fichero
+   .npz pequeño: curva de equity diezmada con LTTB (Largest-Triangle-Three-
+   Buckets) e histograma del PnL. Es NumPy puro: milisegundos a 10⁶ trades.
+2. `render_charts` dibuja los PNG desde ese caché. Es lo único que importa
+   matplotlib, y lo hace dentro de la función.
+3. `render_in_background` lanza el dibujo en un proceso aparte, así que ni el
+   runner ni el informe pagan la importación de matplotlib ni el renderizado.
+"""
+import multiprocessing
+import os
+
+import numpy as np
+
+CHART_CACHE = "learning_charts.npz"
+EQUITY_CHART = "performance_evolution.png"
+DISTRIBUTION_CHART = "pnl_distribution.png"
+MAX_EQUITY_POINTS = 2000
+HISTOGRAM_BINS = 15
+
+def lttb(x, y, threshold):
+    """
+    Diezmado Largest-Triangle-Three-Buckets: conserva `threshold` puntos que
+    preservan la forma visual de la curva (picos y valles incluidos).
+    Retorna los índices elegidos.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        # Área del triángulo (a, candidato, media del bucket siguiente)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def prepare_chart_cache(series, path=CHART_CACHE, max_points=MAX_EQUITY_POINTS, bins=HISTOGRAM_BINS):
+    """
+    Resume la serie (dtype con campos "time" en ns y "pnl") en el caché de gráficos.
+    Retorna False si no hay datos suficientes para dibujar.
+    """
+    if len(series) < 3:
+        return False
+
+    times = series["time"]
+    equity = np.cumsum(series["pnl"])
+    keep = lttb(times, equity, max_points)
+    counts, edges = np.histogram(series["pnl"], bins=bins)
+
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        equity_time=times[keep],
+        equity=equity[keep],
+        hist_counts=counts,
+        hist_edges=edges,
+        n=len(series),
+    )
+    os.replace(tmp_path, path)
+    return True
+
+def render_charts(cache_path=CHART_CACHE, equity_path=EQUITY_CHART, distribution_path=DISTRIBUTION_CHART):
+    """Dibuja los PNG desde el caché (importa matplotlib solo aquí)"""
+    import matplotlib
+    matplotlib.use('Agg')  # Para servidores sin interfaz gráfica
+    import matplotlib.pyplot as plt
+
+    with np.load(cache_path) as cache:
+        times = cache["equity_time"].astype("datetime64[ns]")
+        equity = cache["equity"]
+        counts = cache["hist_counts"]
+        edges = cache["hist_edges"]
+        n = int(cache["n"])
+
+    # Gráfico 1: Evolución de PnL
+    plt.figure(figsize=(10, 6))
+    marker = 'o' if len(equity) <= 200 else None
+    plt.plot(times, equity, marker=marker, linewidth=2, markersize=4)
+    plt.axhline(y=0, color='r', linestyle='--', alpha=0.5)
+    plt.xlabel('Fecha')
+    plt.ylabel('PnL Acumulado (%)')
+    plt.title(f'Evolución del Rendimiento ({n} trades)')
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(equity_path, dpi=150)
+    plt.close()
+
+    # Gráfico 2: Distribución de PnL
+    if n >= 5:
+        plt.figure(figsize=(8, 6))
+        plt.stairs(counts, edges, fill=True, edgecolor='black', alpha=0.7)
+        plt.axvline(x=0, color='r', linestyle='--', linewidth=2)
+        plt.xlabel('PnL (%)')
+        plt.ylabel('Frecuencia')
+        plt.title('Distribución de Resultados')
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig(distribution_path, dpi=150)
+        plt.close()
+
+def render_in_background(cache_path=CHART_CACHE):
+    """
+    Lanza render_charts en un proceso aparte (spawn) y lo devuelve.
+    No es daemon: si el proceso padre termina antes, espera a que acabe el dibujo.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=render_charts, args=(cache_path,), name="chart-render"
+    )
+    process.start()
+    return process
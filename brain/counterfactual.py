@@ -0,0 +1,180 @@
+# brain/counterfactual.py
+"""
+Evaluación contrafactual de umbrales sobre los trades registrados.
+
+Para cada combinación de umbrales de una rejilla responde "¿qué trades
+habríamos abierto igualmente y cómo habrían terminado?", reportando número de
+trades, win rate y PnL por celda.
+
+Cada eje de la rejilla produce una matriz de máscaras (valores del eje x trades).
+La rejilla completa nunca se materializa: los ejes se reparten en dos grupos,
+se combinan por broadcasting en dos matrices (celdas_A x trades) y
+(celdas_B x trades) y los conteos/sumas salen de un producto matricial
+A @ B.T por bloques de trades. Una rejilla de 10⁴ celdas sobre 10⁵ trades
+son unos pocos productos de 100 x 10⁵ x 100.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from database.db import get_session
+from database.models import Trade, Decision
+from database.archive import load_archived_trades
+
+FEATURE_COLUMNS = ["side", "rsi", "atr", "volume", "vol_mean", "ema50", "ema200", "trade_time", "pnl"]
+
+# Rejilla por defecto (10 x 10 x 5 x 4 x 5 = 10⁴ celdas).
+# Cada eje: (característica, operador, lado al que aplica o None, valores)
+DEFAULT_GRID = {
+    "rsi_long": ("rsi", ">", "LONG", np.arange(45.0, 60.0, 1.5)),
+    "rsi_short": ("rsi", "<", "SHORT", np.arange(55.0, 40.0, -1.5)),
+    "volume_multiplier": ("vol_ratio", ">", None, np.array([1.0, 1.01, 1.05, 1.1, 1.2])),
+    "atr_min_percentile": ("atr_pct", ">=", None, np.array([0.0, 0.05, 0.10, 0.15])),
+    "atr_max_percentile": ("atr_pct", "<=", None, np.array([0.80, 0.85, 0.90, 0.95, 1.0])),
+}
+
+_OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+def load_trade_features(session=None, include_archive=True):
+    """
+    Trades cerrados (tabla viva + archivo en frío) con las características
+    que usan los filtros de la estrategia.
+
+    Columnas derivadas:
+        hour: hora UTC de entrada.
+        vol_ratio: volume / vol_mean de la decisión que abrió el trade.
+        atr_pct: percentil del ATR dentro del conjunto de trades (0-1).
+        trend: 1 si ema50 > ema200, si no 0.
+    """
+    own_session = session is None
+    session = session or get_session()
+    try:
+        rows = session.execute(
+            select(
+                Trade.id, Trade.side, Trade.rsi, Trade.atr, Trade.volume, Decision.vol_mean,
+                Trade.ema50, Trade.ema200, Trade.trade_time, Trade.pnl,
+            )
+            .outerjoin(Decision, Decision.trade_id == Trade.id)
+            .where(Trade.exit_price != None)
+        ).all()
+    finally:
+        if own_session:
+            session.close()
+
+    df = pd.DataFrame(rows, columns=["id"] + FEATURE_COLUMNS)
+    if include_archive:
+        archived = load_archived_trades(columns=["id"] + FEATURE_COLUMNS)
+        if not archived.empty:
+            df = pd.concat([archived, df], ignore_index=True).drop_duplicates("id", keep="last")
+
+    for column in FEATURE_COLUMNS:
+        if column not in ("side", "trade_time"):
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    df["pnl"] = df["pnl"].fillna(0.0)
+    df["hour"] = pd.to_datetime(df["trade_time"]).dt.hour
+    df["vol_ratio"] = df["volume"] / df["vol_mean"].where(df["vol_mean"] > 0)
+    df["atr_pct"] = df["atr"].rank(pct=True)
+    df["trend"] = (df["ema50"] > df["ema200"]).astype(int)
+    return df.reset_index(drop=True)
+
+def _axis_masks(features, spec):
+    """
+    Matriz bool (valores del eje x trades). Los trades de otro lado pasan
+    siempre, y un valor desconocido (NaN) no filtra.
+    """
+    feature, op, side, values = spec
+    column = features[feature].to_numpy(dtype=float)
+    values = np.asarray(values, dtype=float)
+    masks = _OPERATORS[op](column[None, :], values[:, None]) | np.isnan(column)[None, :]
+    if side is not None:
+        masks |= (features["side"].to_numpy() != side)[None, :]
+    return masks
+
+def _combine(masks):
+    """Producto cartesiano de máscaras por broadcasting: (prod(n_i) x trades)"""
+    combined = np.ones((1, masks[0].shape[1]), dtype=bool)
+    for mask in masks:
+        combined = (combined[:, None, :] & mask[None, :, :]).reshape(-1, mask.shape[1])
+    return combined
+
+def _split_point(sizes):
+    """Índice que reparte los ejes en dos grupos de tamaño lo más parecido posible"""
+    total = int(np.prod(sizes))
+    best, best_cost = 1, None
+    for k in range(1, len(sizes)):
+        left = int(np.prod(sizes[:k]))
+        cost = max(left, total // left)
+        if best_cost is None or cost < best_cost:
+            best, best_cost = k, cost
+    return best
+
+def evaluate_grid(features, grid=None, chunk_size=50000):
+    """
+    Evalúa todas las combinaciones de umbrales de `grid` sobre `features`.
+
+    Args:
+        features (DataFrame): Salida de load_trade_features (o equivalente).
+        grid (dict): Ejes {nombre: (característica, operador, lado, valores)}.
+        chunk_size (int): Trades por bloque (acota la memoria a celdas x bloque).
+
+    Returns:
+        DataFrame: Una fila por celda con los valores de cada eje y
+                   trades, wins, win_rate (%), pnl (suma) y avg_pnl.
+    """
+    grid = grid or DEFAULT_GRID
+    names = list(grid)
+    if not names:
+        raise ValueError("La rejilla necesita al menos un eje")
+    sizes = [len(grid[name][3]) for name in names]
+    split = _split_point(sizes)
+    left_size = int(np.prod(sizes[:split]))
+    right_size = int(np.prod(sizes[split:])) if split < len(names) else 1
+
+    counts = np.zeros((left_size, right_size))
+    wins = np.zeros((left_size, right_size))
+    pnl = np.zeros((left_size, right_size))
+
+    for start in range(0, len(features), chunk_size):
+        chunk = features.iloc[start:start + chunk_size]
+        masks = [_axis_masks(chunk, grid[name]) for name in names]
+        left = _combine(masks[:split]).astype(np.float64)
+        if split < len(names):
+            right = _combine(masks[split:]).astype(np.float64)
+        else:
+            right = np.ones((1, len(chunk)))
+
+        trade_pnl = chunk["pnl"].to_numpy(dtype=float)
+        counts += left @ right.T
+        wins += left @ (right * (trade_pnl > 0)).T
+        pnl += left @ (right * trade_pnl).T
+
+    index = pd.MultiIndex.from_product([grid[name][3] for name in names], names=names)
+    result = pd.DataFrame(
+        {
+            "trades": counts.ravel().round().astype(int),
+            "wins": wins.ravel().round().astype(int),
+            "pnl": pnl.ravel(),
+        },
+        index=index,
+    ).reset_index()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["win_rate"] = np.where(result["trades"] > 0, result["wins"] / result["trades"] * 100, 0.0)
+        result["avg_pnl"] = np.where(result["trades"] > 0, result["pnl"] / result["trades"], 0.0)
+    return result
+
+def best_cells(result, min_trades=20, by="pnl", top=10):
+    """Las `top` celdas con más `by` entre las que conservan al menos `min_trades`"""
+    eligible = result[result["trades"] >= min_trades]
+    return eligible.sort_values([by, "trades"], ascending=False).head(top)
+
+def counterfactual_report(grid=None, min_trades=20, top=10):
+    """Carga los trades, evalúa la rejilla y devuelve las mejores celdas"""
+    features = load_trade_features()
+    if features.empty:
+        return pd.DataFrame()
+    return best_cells(evaluate_grid(features, grid), min_trades=min_trades, top=top)
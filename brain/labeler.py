@@ -0,0 +1,176 @@
+# brain/labeler.py
+"""
+Etiquetado contrafactual de decisiones (incluidas las NO_TRADE).
+
+Para cada decisión registrada simula qué habría pasado si se hubiera abierto
+un LONG y un SHORT al precio de la decisión, con SL/TP a múltiplos del ATR
+(las mismas reglas que el runner), recorriendo las velas siguientes del
+archivo local (database/candles.py):
+
+    TP / SL   -> primer nivel tocado por el máximo/mínimo de una vela
+                 (si ambos caen en la misma vela se asume SL, conservador)
+    TIMEOUT   -> ninguno en `horizon` velas: salida al cierre de la última
+    PENDING   -> aún no hay velas suficientes; se reetiqueta más adelante
+
+El recorrido hacia delante es vectorizado: ventanas (decisiones x horizon) de
+máximos y mínimos con sliding_window_view, resueltas por el motor de riesgo
+(brain/risk.simulate_paths) en una sola llamada por bloque.
+Las etiquetas se guardan en Parquet con el id de la decisión como clave.
+"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select
+
+from database.db import get_session
+from database.models import Decision
+from database.candles import load_candles, CANDLES_DIR
+from brain.risk import ATR_MULTIPLIER_SL, ATR_MULTIPLIER_TP, EXIT_SL, EXIT_TP, initial_levels, simulate_paths
+
+LABELS_DIR = "labels/decisions"
+HORIZON_BARS = 240          # 4 horas de velas de 1m
+BAR_MS = 60_000
+OUTCOMES = ("TP", "SL", "TIMEOUT", "PENDING")
+
+def simulate_exits(entry, atr, start, high, low, close, side, sl_mult=ATR_MULTIPLIER_SL,
+                   tp_mult=ATR_MULTIPLIER_TP, horizon=HORIZON_BARS, chunk_size=20000):
+    """
+    Resultado de una entrada `side` por decisión, en bloque.
+
+    Args:
+        entry, atr (ndarray): Precio de entrada y ATR por decisión.
+        start (ndarray): Índice de la primera vela posterior a cada decisión.
+        high, low, close (ndarray): Serie de velas del símbolo.
+        side (str): "LONG" o "SHORT".
+
+    Returns:
+        tuple: (outcome, pnl %, barras hasta la salida) por decisión.
+    """
+    n = len(close)
+    sign = 1.0 if side == "LONG" else -1.0
+    sl, tp = initial_levels(entry, atr, side, sl_mult, tp_mult)
+
+    # Relleno con NaN para que las ventanas del final no se salgan de la serie
+    pad = np.full(horizon, np.nan)
+    high_windows = sliding_window_view(np.concatenate([high, pad]), horizon)
+    low_windows = sliding_window_view(np.concatenate([low, pad]), horizon)
+    start = np.minimum(start, n)
+    available = np.clip(n - start, 0, horizon)
+
+    reason = np.empty(len(entry), dtype=np.int64)
+    first_hit = np.empty(len(entry), dtype=np.int64)
+    exit_price = np.empty(len(entry))
+    for begin in range(0, len(entry), chunk_size):
+        part = slice(begin, begin + chunk_size)
+        reason[part], first_hit[part], exit_price[part], _, _ = simulate_paths(
+            entry[part], sl[part], tp[part], side, high_windows[start[part]], low_windows[start[part]]
+        )
+
+    is_sl = reason == EXIT_SL
+    is_tp = reason == EXIT_TP
+    is_timeout = ~is_sl & ~is_tp & (available == horizon) & np.isfinite(sl)
+    outcome = np.where(is_sl, "SL", np.where(is_tp, "TP", np.where(is_timeout, "TIMEOUT", "PENDING")))
+
+    last_close = close[np.clip(start + horizon - 1, 0, max(n - 1, 0))] if n else np.full(len(entry), np.nan)
+    exit_price = np.where(is_sl | is_tp, exit_price, np.where(is_timeout, last_close, np.nan))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl = sign * (exit_price - entry) / entry * 100
+    bars = np.where(is_sl | is_tp, first_hit + 1, np.where(is_timeout, horizon, -1))
+    return outcome, pnl, bars
+
+def label_frame(decisions, candles, horizon=HORIZON_BARS, sl_mult=ATR_MULTIPLIER_SL, tp_mult=ATR_MULTIPLIER_TP):
+    """
+    Etiqueta un DataFrame de decisiones de un símbolo (id, decision_time,
+    price, atr) contra sus velas (timestamp en ms de apertura, high, low, close).
+    """
+    timestamps = candles["timestamp"].to_numpy(dtype=np.int64)
+    decision_ms = pd.to_datetime(decisions["decision_time"]).astype("int64").to_numpy() // 1_000_000
+    # La decisión se toma al cierre de la vela de entrada (unos segundos antes de
+    # decision_time): se recorre desde la primera vela que abre en ese cierre o después
+    bar_close = decision_ms // BAR_MS * BAR_MS
+    start = np.searchsorted(timestamps, bar_close, side="left")
+
+    entry = decisions["price"].to_numpy(dtype=float)
+    atr = decisions["atr"].to_numpy(dtype=float)
+    high = candles["high"].to_numpy(dtype=float)
+    low = candles["low"].to_numpy(dtype=float)
+    close = candles["close"].to_numpy(dtype=float)
+
+    labels = pd.DataFrame({
+        "decision_id": decisions["id"].to_numpy(dtype=np.int64),
+        "symbol": decisions["symbol"].to_numpy(),
+        "side": decisions["side"].to_numpy(),
+        "horizon": horizon,
+        "sl_mult": sl_mult,
+        "tp_mult": tp_mult,
+    })
+    for side in ("LONG", "SHORT"):
+        outcome, pnl, bars = simulate_exits(entry, atr, start, high, low, close, side, sl_mult, tp_mult, horizon)
+        prefix = side.lower()
+        labels[f"{prefix}_outcome"] = outcome
+        labels[f"{prefix}_pnl"] = pnl
+        labels[f"{prefix}_bars"] = bars
+    labels["labeled_at"] = datetime.utcnow()
+    return labels
+
+def load_labels(base_dir=LABELS_DIR):
+    """Etiquetas guardadas (la más reciente por decisión)"""
+    if not os.path.isdir(base_dir):
+        return pd.DataFrame()
+    frames = [pd.read_parquet(os.path.join(base_dir, name))
+              for name in sorted(os.listdir(base_dir)) if name.endswith(".parquet")]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True).sort_values("labeled_at")
+    return df.drop_duplicates("decision_id", keep="last").sort_values("decision_id").reset_index(drop=True)
+
+def _save_labels(labels, base_dir):
+    os.makedirs(base_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    path = os.path.join(base_dir, f"part-{labels['decision_id'].min()}-{labels['decision_id'].max()}-{stamp}.parquet")
+    tmp_path = path + ".tmp"
+    labels.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+def label_decisions(days=None, horizon=HORIZON_BARS, sl_mult=ATR_MULTIPLIER_SL, tp_mult=ATR_MULTIPLIER_TP,
+                    relabel=False, candles_dir=CANDLES_DIR, labels_dir=LABELS_DIR, save=True):
+    """
+    Etiqueta las decisiones de los últimos `days` días (todas si es None).
+    Salvo `relabel`, solo procesa decisiones sin etiqueta final en ambos lados.
+    Retorna el DataFrame de etiquetas nuevas.
+    """
+    query = select(Decision.id, Decision.decision_time, Decision.symbol, Decision.side,
+                   Decision.price, Decision.atr).where(Decision.price != None, Decision.atr != None)
+    if days is not None:
+        query = query.where(Decision.decision_time >= datetime.utcnow() - timedelta(days=days))
+
+    session = get_session()
+    try:
+        decisions = pd.DataFrame(session.execute(query.order_by(Decision.id)).all(),
+                                 columns=["id", "decision_time", "symbol", "side", "price", "atr"])
+    finally:
+        session.close()
+
+    if not relabel and not decisions.empty:
+        existing = load_labels(labels_dir)
+        if not existing.empty:
+            final = existing[(existing["long_outcome"] != "PENDING") & (existing["short_outcome"] != "PENDING")]
+            decisions = decisions[~decisions["id"].isin(final["decision_id"])]
+    if decisions.empty:
+        return pd.DataFrame()
+
+    frames = []
+    for symbol, group in decisions.groupby("symbol"):
+        since = pd.to_datetime(group["decision_time"]).min().to_pydatetime()
+        until = pd.to_datetime(group["decision_time"]).max().to_pydatetime() + timedelta(minutes=horizon + 1)
+        candles = load_candles(symbol, since=since, until=until, base_dir=candles_dir)
+        frames.append(label_frame(group, candles, horizon, sl_mult, tp_mult))
+
+    labels = pd.concat(frames, ignore_index=True)
+    if save:
+        _save_labels(labels, labels_dir)
+    return labels
@@ -2,28 +2,267 @@
 import pandas as pd
 import numpy as np
 import json
+import math
 import os
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
-import matplotlib
-matplotlib.use('Agg')  # Para servidores sin interfaz gráfica
-import matplotlib.pyplot as plt
-from database.db import get_session
-from database.models import Trade
-import logging
+from sqlalchemy import create_engine, select, func, case, extract
+from database.db import get_session, engine
+from database.models import Trade, Decision
+from database.archive import load_archived_trades
+from brain.charts import prepare_chart_cache, render_in_background, EQUITY_CHART, DISTRIBUTION_CHART
+from config.logs import get_logger
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("LearningModule")
+logger = get_logger("LearningModule")
+
+# Estado incremental del análisis: agregados por grupo + marca de agua
+STATE_FILE = "learning_state.json"
+# Serie (exit_time, pnl) de trades cerrados, append-only, para los gráficos
+SERIES_FILE = "learning_series.bin"
+SERIES_DTYPE = np.dtype([("time", "<i8"), ("pnl", "<f8")])
+# Estado propio de los análisis por línea de comandos (analyze_learning.py): el
+# LearningWorker del runner reescribe STATE_FILE/SERIES_FILE desde otro proceso
+CLI_STATE_FILE = "learning_state.cli.json"
+CLI_SERIES_FILE = "learning_series.cli.bin"
+# Margen para no perder cierres cuyo commit llega después de su exit_time
+WATERMARK_LAG = timedelta(seconds=5)
+# Campos acumulados por grupo (lado, resultado, hora de entrada)
+_GROUP_FIELDS = ("n", "pnl", "rsi", "atr", "low_volume")
 
 class TradingAnalyzer:
-    def __init__(self):
+    """
+    Analiza el rendimiento de forma incremental: las agregaciones se hacen en
+    SQL y solo se leen los trades cerrados desde la última ejecución, que se
+    fusionan con el estado guardado en STATE_FILE.
+    """
+
+    def __init__(self, state_file=STATE_FILE, series_file=SERIES_FILE):
         self.session = get_session()
-        
+        self.state_file = state_file
+        self.series_file = series_file
+        self.state = self._load_state()
+
+    # ------------------------------------------------------------------
+    # Estado incremental
+    # ------------------------------------------------------------------
+    def _empty_state(self):
+        return {
+            "database": engine.url.render_as_string(hide_password=True),
+            "watermark": None,
+            "series_rows": 0,
+            "groups": {},
+        }
+
+    def _load_state(self):
+        """Carga el estado guardado; si es de otra base de datos, empieza de cero"""
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as f:
+                    state = json.load(f)
+                if state.get("database") == engine.url.render_as_string(hide_password=True):
+                    return state
+                logger.warning("Estado de análisis de otra base de datos, se reconstruye")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Estado de análisis ilegible ({e}), se reconstruye")
+        self._truncate_series(0)
+        return self._empty_state()
+
+    def _save_state(self):
+        """Escritura atómica del estado (archivo temporal + rename)"""
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_file)
+
+    def _truncate_series(self, rows):
+        """Descarta filas de la serie no confirmadas en el estado (p.ej. tras un corte)"""
+        if os.path.exists(self.series_file):
+            with open(self.series_file, 'r+b') as f:
+                f.truncate(rows * SERIES_DTYPE.itemsize)
+
+    def reset_state(self):
+        """Borra el estado incremental; el próximo análisis relee todo el histórico"""
+        self.state = self._empty_state()
+        self._truncate_series(0)
+        self._save_state()
+
+    def refresh(self):
+        """
+        Fusiona en el estado los trades cerrados desde la última marca de agua.
+        Retorna el número de trades nuevos procesados.
+        """
+        self._truncate_series(self.state["series_rows"])
+
+        cutoff = datetime.utcnow() - WATERMARK_LAG
+        filters = [Trade.exit_price != None, Trade.exit_time != None, Trade.exit_time <= cutoff]
+        if self.state["watermark"]:
+            filters.append(Trade.exit_time > datetime.fromisoformat(self.state["watermark"]))
+
+        outcome = case((Trade.pnl > 0, "win"), (Trade.pnl < 0, "loss"), else_="flat")
+        hour = extract("hour", Trade.trade_time)
+        low_volume = case((Trade.volume < Decision.vol_mean * 1.05, 1), else_=0)
+
+        rows = self.session.execute(
+            select(
+                Trade.side, outcome, hour,
+                func.count(),
+                func.coalesce(func.sum(Trade.pnl), 0.0),
+                func.coalesce(func.sum(Trade.rsi), 0.0),
+                func.coalesce(func.sum(Trade.atr), 0.0),
+                func.coalesce(func.sum(low_volume), 0),
+            )
+            .outerjoin(Decision, Decision.trade_id == Trade.id)
+            .where(*filters)
+            .group_by(Trade.side, outcome, hour)
+        ).all()
+
+        series = []
+        if rows:
+            series = self.session.execute(
+                select(Trade.exit_time, Trade.pnl).where(*filters).order_by(Trade.exit_time)
+            ).all()
+        live_ids = [i for (i,) in self.session.execute(select(Trade.id).where(*filters))] if rows else []
+
+        # Trades archivados en frío dentro de la ventana (solo si el análisis
+        # lleva más tiempo sin ejecutarse que la retención de la tabla viva)
+        since = datetime.fromisoformat(self.state["watermark"]) if self.state["watermark"] else None
+        archived_rows, archived_series = self._archived_groups(since, cutoff, live_ids)
+        rows = list(rows) + archived_rows
+        series = list(series) + archived_series
+
+        new_trades = 0
+        groups = self.state["groups"]
+        for side, result, trade_hour, *values in rows:
+            key = f"{side}|{result}|{int(trade_hour)}"
+            acc = groups.setdefault(key, dict.fromkeys(_GROUP_FIELDS, 0))
+            for name, value in zip(_GROUP_FIELDS, values):
+                acc[name] += int(value) if name in ("n", "low_volume") else float(value)
+            new_trades += int(values[0])
+
+        if series:
+            chunk = np.array(
+                [(np.datetime64(t, "ns").astype("int64"), p or 0.0) for t, p in series],
+                dtype=SERIES_DTYPE,
+            )
+            with open(self.series_file, 'ab') as f:
+                chunk.tofile(f)
+            self.state["series_rows"] += len(chunk)
+
+        self.state["watermark"] = cutoff.isoformat()
+        self._save_state()
+        return new_trades
+
+    def _archived_groups(self, since, until, exclude_ids=None):
+        """Mismas agregaciones que refresh() sobre el archivo Parquet (sin los ids de `exclude_ids`)"""
+        df = load_archived_trades(
+            columns=["side", "pnl", "rsi", "atr", "volume", "vol_mean", "trade_time", "exit_time"],
+            since=since, until=until, exclude_ids=exclude_ids,
+        )
+        if df.empty:
+            return [], []
+
+        pnl = df["pnl"].fillna(0.0)
+        df = df.assign(
+            outcome=np.where(pnl > 0, "win", np.where(pnl < 0, "loss", "flat")),
+            hour=pd.to_datetime(df["trade_time"]).dt.hour,
+            low_volume=(df["volume"] < pd.to_numeric(df["vol_mean"]).fillna(-np.inf) * 1.05).astype(int),
+            n=1,
+        )
+        grouped = df.groupby(["side", "outcome", "hour"])[["n", "pnl", "rsi", "atr", "low_volume"]].sum()
+        rows = [tuple(index) + tuple(values) for index, values in zip(grouped.index, grouped.itertuples(index=False))]
+
+        df = df.sort_values("exit_time")
+        series = list(zip(pd.to_datetime(df["exit_time"]), df["pnl"]))
+        return rows, series
+
+    def _total(self, field="n", side=None, outcome=None, hour=None):
+        """Suma un campo del estado sobre los grupos que cumplan el filtro"""
+        total = 0
+        for key, acc in self.state["groups"].items():
+            g_side, g_outcome, g_hour = key.split("|")
+            if side is not None and g_side != side:
+                continue
+            if outcome is not None and g_outcome != outcome:
+                continue
+            if hour is not None and int(g_hour) != hour:
+                continue
+            total += acc[field]
+        return total
+
+    def _by_hour(self, field="n", outcome=None):
+        """Totales de un campo por hora de entrada"""
+        hours = {}
+        for key, acc in self.state["groups"].items():
+            _, g_outcome, g_hour = key.split("|")
+            if outcome is None or g_outcome == outcome:
+                hours[int(g_hour)] = hours.get(int(g_hour), 0) + acc[field]
+        return hours
+
+    def _count_open(self):
+        return self.session.query(func.count(Trade.id)).filter(Trade.exit_price == None).scalar() or 0
+
+    def _losses_above_quantile(self, q):
+        """
+        Cuenta pérdidas con ATR por encima del cuantil `q` del ATR de las pérdidas.
+        En Postgres el cuantil se calcula con percentile_cont; en otros motores
+        con ORDER BY + OFFSET, sin traer la columna completa a Python.
+        Usa solo la tabla viva (trades recientes), no el archivo en frío.
+        """
+        losing = [Trade.exit_price != None, Trade.pnl < 0, Trade.atr != None]
+        if engine.dialect.name == "postgresql":
+            threshold = self.session.query(
+                func.percentile_cont(q).within_group(Trade.atr)
+            ).filter(*losing).scalar()
+        else:
+            n = self.session.query(func.count(Trade.id)).filter(*losing).scalar() or 0
+            if n == 0:
+                return 0
+            pos = q * (n - 1)
+            values = [v for (v,) in self.session.query(Trade.atr).filter(*losing)
+                      .order_by(Trade.atr).offset(int(math.floor(pos))).limit(2)]
+            threshold = values[0]
+            if len(values) > 1:
+                threshold += (values[1] - values[0]) * (pos - math.floor(pos))
+
+        if threshold is None:
+            return 0
+        return self.session.query(func.count(Trade.id)).filter(*losing, Trade.atr > threshold).scalar() or 0
+
+    def performance_by_group(self):
+        """
+        Rendimiento de los trades cerrados por (símbolo, régimen de la vela de
+        entrada). Los trades sin régimen registrado cuentan como "*".
+        Usa solo la tabla viva (trades recientes), no el archivo en frío.
+
+        Returns:
+            dict: (símbolo, régimen) -> (trades cerrados, win rate %, PnL medio %).
+        """
+        regime = func.coalesce(Decision.regime, "*")
+        rows = self.session.execute(
+            select(
+                Trade.symbol, regime,
+                func.count(),
+                func.sum(case((Trade.pnl > 0, 1), else_=0)),
+                func.coalesce(func.avg(Trade.pnl), 0.0),
+            )
+            .outerjoin(Decision, Decision.trade_id == Trade.id)
+            .where(Trade.exit_price != None)
+            .group_by(Trade.symbol, regime)
+        ).all()
+        return {
+            (symbol, group_regime): (int(n), int(wins or 0) / n * 100, float(avg_pnl))
+            for symbol, group_regime, n, wins, avg_pnl in rows
+            if n
+        }
+
     def get_trading_dataframe(self):
-        """Obtiene todos los trades como DataFrame de pandas"""
+        """Obtiene todos los trades (tabla viva + archivo en frío) como DataFrame de pandas"""
         try:
             query = self.session.query(Trade)
             df = pd.read_sql(query.statement, query.session.bind)
+            archived = load_archived_trades(columns=list(df.columns))
+            if not archived.empty:
+                # Un trade puede estar en ambos si el archivado se interrumpió: manda la tabla viva
+                df = pd.concat([archived, df], ignore_index=True).drop_duplicates("id", keep="last")
             
             if df.empty:
                 logger.warning("No hay datos en la base de datos")
@@ -45,9 +284,17 @@ class TradingAnalyzer:
             return None
     
     def analyze_performance(self):
-        """Analiza rendimiento general"""
-        df = self.get_trading_dataframe()
-        if df is None or df.empty:
+        """Analiza rendimiento general a partir del estado incremental"""
+        try:
+            self.refresh()
+            open_count = self._count_open()
+        except Exception as e:
+            logger.error(f"Error obteniendo datos: {e}")
+            return {"error": "No hay datos para analizar"}
+
+        closed_count = self._total("n")
+        if closed_count + open_count == 0:
+            logger.warning("No hay datos en la base de datos")
             return {"error": "No hay datos para analizar"}
         
         results = {
@@ -57,42 +304,40 @@ class TradingAnalyzer:
         }
         
         # 1. ANÁLISIS BÁSICO
-        total_trades = len(df)
-        closed_trades = df[df['exit_price'].notna()]
-        open_trades = df[df['exit_price'].isna()]
-        
-        results["summary"]["total_trades"] = total_trades
-        results["summary"]["closed_trades"] = len(closed_trades)
-        results["summary"]["open_trades"] = len(open_trades)
+        results["summary"]["total_trades"] = closed_count + open_count
+        results["summary"]["closed_trades"] = closed_count
+        results["summary"]["open_trades"] = open_count
         
         # 2. WIN RATE Y PNL
-        if len(closed_trades) > 0:
-            winning = closed_trades[closed_trades['pnl'] > 0]
-            losing = closed_trades[closed_trades['pnl'] < 0]
-            neutral = closed_trades[closed_trades['pnl'] == 0]
+        if closed_count > 0:
+            n_win = self._total("n", outcome="win")
+            n_loss = self._total("n", outcome="loss")
+            win_pnl = self._total("pnl", outcome="win")
+            loss_pnl = self._total("pnl", outcome="loss")
             
-            win_rate = (len(winning) / len(closed_trades)) * 100
-            avg_win = winning['pnl'].mean() if len(winning) > 0 else 0
-            avg_loss = losing['pnl'].mean() if len(losing) > 0 else 0
-            total_pnl = closed_trades['pnl'].sum()
+            win_rate = (n_win / closed_count) * 100
+            avg_win = win_pnl / n_win if n_win > 0 else 0
+            avg_loss = loss_pnl / n_loss if n_loss > 0 else 0
+            total_pnl = self._total("pnl")
             
             results["summary"]["win_rate"] = round(win_rate, 2)
             results["summary"]["avg_win"] = round(avg_win, 4)
             results["summary"]["avg_loss"] = round(avg_loss, 4)
             results["summary"]["total_pnl"] = round(total_pnl, 4)
-            results["summary"]["profit_factor"] = round(abs(winning['pnl'].sum() / losing['pnl'].sum()), 2) if len(losing) > 0 and losing['pnl'].sum() != 0 else 0
+            results["summary"]["profit_factor"] = round(abs(win_pnl / loss_pnl), 2) if n_loss > 0 and loss_pnl != 0 else 0
             
         # 3. ANÁLISIS POR CONDICIONES DE MERCADO
-        if len(closed_trades) >= 5:
+        if closed_count >= 5:
             # Patrones en trades perdedores
-            losing_trades = closed_trades[closed_trades['pnl'] < 0]
+            n_loss = self._total("n", outcome="loss")
+            loss_hours = self._by_hour("n", outcome="loss")
             
             patterns = {
-                "losing_trades_rsi_mean": round(losing_trades['rsi'].mean(), 1) if not losing_trades.empty else None,
-                "losing_trades_atr_mean": round(losing_trades['atr'].mean(), 2) if not losing_trades.empty else None,
-                "losing_trades_hour_mode": losing_trades['trade_time'].dt.hour.mode().iloc[0] if not losing_trades.empty and len(losing_trades['trade_time'].dt.hour.mode()) > 0 else None,
-                "volume_too_low": len(df[(df['volume'] < df['vol_mean'] * 1.05) & (df['side'] != 'NO_TRADE')]),
-                "high_volatility_losses": len(losing_trades[losing_trades['atr'] > losing_trades['atr'].quantile(0.75)]) if not losing_trades.empty else 0
+                "losing_trades_rsi_mean": round(self._total("rsi", outcome="loss") / n_loss, 1) if n_loss else None,
+                "losing_trades_atr_mean": round(self._total("atr", outcome="loss") / n_loss, 2) if n_loss else None,
+                "losing_trades_hour_mode": min(loss_hours, key=lambda h: (-loss_hours[h], h)) if loss_hours else None,
+                "volume_too_low": self._total("low_volume"),
+                "high_volatility_losses": self._losses_above_quantile(0.75) if n_loss else 0
             }
             
             results["patterns"] = patterns
@@ -111,24 +356,22 @@ class TradingAnalyzer:
                 hour = patterns["losing_trades_hour_mode"]
                 recommendations.append(f"Considerar desactivar trading entre {hour}:00-{(hour+1)%24}:00 UTC")
             
-            if patterns.get("volume_too_low", 0) > len(closed_trades) * 0.3:
+            if patterns.get("volume_too_low", 0) > closed_count * 0.3:
                 recommendations.append("Relajar filtro de volumen: cambiar de 10% a 5% sobre promedio")
             
-            if patterns.get("high_volatility_losses", 0) > len(losing_trades) * 0.5:
+            if patterns.get("high_volatility_losses", 0) > n_loss * 0.5:
                 recommendations.append("Reducir multiplicador ATR para SL de 1.5 a 1.2 en alta volatilidad")
             
             results["recommendations"] = recommendations
         
-        # 5. EVOLUCIÓN TEMPORAL
-        if len(closed_trades) >= 10:
-            closed_trades_sorted = closed_trades.sort_values('trade_time')
-            closed_trades_sorted['cumulative_pnl'] = closed_trades_sorted['pnl'].cumsum()
-            results["summary"]["pnl_trend"] = "positivo" if closed_trades_sorted['cumulative_pnl'].iloc[-1] > 0 else "negativo"
+        # 5. EVOLUCIÓN TEMPORAL (el PnL acumulado final es la suma total)
+        if closed_count >= 10:
+            results["summary"]["pnl_trend"] = "positivo" if self._total("pnl") > 0 else "negativo"
         
         return results
     
-    def generate_report(self, results, save_path="learning_report.json"):
-        """Genera reporte completo y lo guarda"""
+    def generate_report(self, results, save_path="learning_report.json", wait_charts=False):
+        """Genera reporte completo y lo guarda (los gráficos se dibujan en otro proceso)"""
         report = {
             "timestamp": datetime.utcnow().isoformat(),
             "analysis": results
@@ -138,64 +381,48 @@ class TradingAnalyzer:
         with open(save_path, 'w') as f:
             json.dump(report, f, indent=2, default=str)
         
-        # Generar visualización si hay suficientes datos
+        # Generar visualización si hay suficientes datos (en otro proceso)
         if results.get("summary", {}).get("closed_trades", 0) >= 5:
-            self.generate_visualizations(results)
+            self.generate_visualizations(results, wait=wait_charts)
         
         return report
+
+    def load_series(self):
+        """Serie (exit_time, pnl) de trades cerrados acumulada por refresh()"""
+        if not os.path.exists(self.series_file):
+            return np.empty(0, dtype=SERIES_DTYPE)
+        series = np.fromfile(self.series_file, dtype=SERIES_DTYPE, count=self.state["series_rows"])
+        # Los trades recuperados del archivo en frío pueden llegar desordenados
+        if len(series) > 1 and np.any(np.diff(series["time"]) < 0):
+            series = series[np.argsort(series["time"], kind="stable")]
+        return series
     
-    def generate_visualizations(self, results):
-        """Genera gráficos de análisis"""
+    def generate_visualizations(self, results, wait=False):
+        """
+        Resume la serie incremental en el caché de gráficos y dibuja los PNG en
+        un proceso aparte. Con wait=True espera a que terminen (scripts/CLI).
+        Retorna el proceso de dibujo, o None si no hay datos suficientes.
+        """
         try:
-            df = self.get_trading_dataframe()
-            if df is None:
-                return
-            
-            closed_trades = df[df['exit_price'].notna()]
-            
-            if len(closed_trades) >= 3:
-                # Gráfico 1: Evolución de PnL
-                plt.figure(figsize=(10, 6))
-                closed_sorted = closed_trades.sort_values('trade_time')
-                closed_sorted['cumulative_pnl'] = closed_sorted['pnl'].cumsum()
-                
-                plt.plot(closed_sorted['trade_time'], closed_sorted['cumulative_pnl'], 
-                        marker='o', linewidth=2, markersize=4)
-                plt.axhline(y=0, color='r', linestyle='--', alpha=0.5)
-                plt.xlabel('Fecha')
-                plt.ylabel('PnL Acumulado (%)')
-                plt.title('Evolución del Rendimiento')
-                plt.grid(True, alpha=0.3)
-                plt.tight_layout()
-                plt.savefig('performance_evolution.png', dpi=150)
-                plt.close()
-                
-                # Gráfico 2: Distribución de PnL
-                if len(closed_trades) >= 5:
-                    plt.figure(figsize=(8, 6))
-                    plt.hist(closed_trades['pnl'], bins=15, edgecolor='black', alpha=0.7)
-                    plt.axvline(x=0, color='r', linestyle='--', linewidth=2)
-                    plt.xlabel('PnL (%)')
-                    plt.ylabel('Frecuencia')
-                    plt.title('Distribución de Resultados')
-                    plt.grid(True, alpha=0.3)
-                    plt.tight_layout()
-                    plt.savefig('pnl_distribution.png', dpi=150)
-                    plt.close()
-                    
-                logger.info("Gráficos generados: performance_evolution.png, pnl_distribution.png")
-                
+            if not prepare_chart_cache(self.load_series()):
+                return None
+            process = render_in_background()
+            if wait:
+                process.join()
+                logger.info(f"Gráficos generados: {EQUITY_CHART}, {DISTRIBUTION_CHART}")
+            return process
         except Exception as e:
             logger.error(f"Error generando visualizaciones: {e}")
+            return None
     
     def optimize_parameters(self):
-        """Sugiere optimizaciones basadas en datos"""
-        df = self.get_trading_dataframe()
-        if df is None or len(df) < 20:
+        """Sugiere optimizaciones basadas en los agregados incrementales"""
+        self.refresh()
+        closed_count = self._total("n")
+        if closed_count + self._count_open() < 20:
             return {"status": "insufficient_data", "message": "Se necesitan al menos 20 trades para optimización"}
         
-        closed_trades = df[df['exit_price'].notna()]
-        if len(closed_trades) < 10:
+        if closed_count < 10:
             return {"status": "insufficient_closed_trades", "message": "Se necesitan al menos 10 trades cerrados"}
         
         optimizations = {
@@ -206,25 +433,25 @@ class TradingAnalyzer:
         }
         
         # Optimizar RSI thresholds
-        winning_long = closed_trades[(closed_trades['side'] == 'LONG') & (closed_trades['pnl'] > 0)]
-        losing_long = closed_trades[(closed_trades['side'] == 'LONG') & (closed_trades['pnl'] < 0)]
+        winning_long = self._total("n", side="LONG", outcome="win")
+        losing_long = self._total("n", side="LONG", outcome="loss")
         
-        if len(winning_long) > 2 and len(losing_long) > 2:
-            optimal_rsi_long = winning_long['rsi'].mean()
+        if winning_long > 2 and losing_long > 2:
+            optimal_rsi_long = self._total("rsi", side="LONG", outcome="win") / winning_long
             optimizations["rsi"]["long_threshold"] = round(max(50, optimal_rsi_long), 1)
         
-        winning_short = closed_trades[(closed_trades['side'] == 'SHORT') & (closed_trades['pnl'] > 0)]
-        losing_short = closed_trades[(closed_trades['side'] == 'SHORT') & (closed_trades['pnl'] < 0)]
+        winning_short = self._total("n", side="SHORT", outcome="win")
+        losing_short = self._total("n", side="SHORT", outcome="loss")
         
-        if len(winning_short) > 2 and len(losing_short) > 2:
-            optimal_rsi_short = winning_short['rsi'].mean()
+        if winning_short > 2 and losing_short > 2:
+            optimal_rsi_short = self._total("rsi", side="SHORT", outcome="win") / winning_short
             optimizations["rsi"]["short_threshold"] = round(min(50, optimal_rsi_short), 1)
         
         # Optimizar ATR multiplicadores
-        profitable_trades = closed_trades[closed_trades['pnl'] > 0]
-        if len(profitable_trades) > 5:
-            avg_profit = profitable_trades['pnl'].mean()
-            avg_atr_profit = profitable_trades['atr'].mean()
+        profitable = self._total("n", outcome="win")
+        if profitable > 5:
+            avg_profit = self._total("pnl", outcome="win") / profitable
+            avg_atr_profit = self._total("atr", outcome="win") / profitable
             
             # Calcular ratio óptimo
             if avg_atr_profit > 0:
@@ -232,14 +459,14 @@ class TradingAnalyzer:
                 optimizations["atr"]["tp_multiplier"] = round(max(2.0, min(4.0, optimal_ratio * 2)), 1)
                 optimizations["atr"]["sl_multiplier"] = round(max(1.0, min(2.0, optimizations["atr"]["tp_multiplier"] / 2)), 1)
         
-        # Horarios óptimos
-        df['hour'] = df['trade_time'].dt.hour
-        hour_performance = df.groupby('hour')['pnl'].mean()
-        if not hour_performance.empty:
-            best_hour = hour_performance.idxmax()
-            worst_hour = hour_performance.idxmin()
-            optimizations["time"]["best_hour"] = int(best_hour)
-            optimizations["time"]["worst_hour"] = int(worst_hour)
+        # Horarios óptimos (PnL medio de los trades cerrados por hora de entrada)
+        hour_counts = self._by_hour("n")
+        hour_pnl = self._by_hour("pnl")
+        hour_performance = {h: hour_pnl[h] / hour_counts[h] for h in hour_counts if hour_counts[h]}
+        if hour_performance:
+            hours = sorted(hour_performance)
+            optimizations["time"]["best_hour"] = int(max(hours, key=lambda h: hour_performance[h]))
+            optimizations["time"]["worst_hour"] = int(min(hours, key=lambda h: hour_performance[h]))
         
         return optimizations
     
@@ -248,9 +475,9 @@ class TradingAnalyzer:
         if self.session:
             self.session.close()
 
-def analyze_failure_patterns():
-    """Función principal para análisis de patrones"""
-    analyzer = TradingAnalyzer()
+def analyze_failure_patterns(state_file=CLI_STATE_FILE, series_file=CLI_SERIES_FILE):
+    """Función principal para análisis de patrones (con el estado de la línea de comandos)"""
+    analyzer = TradingAnalyzer(state_file, series_file)
     try:
         # 1. Analizar rendimiento
         results = analyzer.analyze_performance()
@@ -260,7 +487,7 @@ def analyze_failure_patterns():
         results["optimizations"] = optimizations
         
         # 3. Generar reporte
-        report = analyzer.generate_report(results)
+        report = analyzer.generate_report(results, wait_charts=True)
         
         # 4. Mostrar resumen en consola
         print("\n" + "="*70)
@@ -1,15 +1,15 @@
-from database.db import get_session
-from database.models import Trade
+from database.db import get_session, get_async_session, dispose_async_engine
+from database.models import Trade, Decision
+from brain.stats import record_open, record_close, record_decision
+from datetime import datetime
+import asyncio
+import threading
 import numpy as np
-import logging
+from config.logs import get_logger
+from brain.risk import ATR_MULTIPLIER_SL, ATR_MULTIPLIER_TP, initial_levels
 
-# Parámetros de gestión de riesgo (deben coincidir con runner.py)
-ATR_MULTIPLIER_SL = 1.5
-ATR_MULTIPLIER_TP = 3.0
-
-# Configuración básica de logs para el bot
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("BrainMemory")
+# Logs a través del pipeline en cola (sin I/O en el hilo que registra)
+logger = get_logger("BrainMemory")
 
 def _to_float(value):
     """
@@ -33,21 +33,80 @@ def _to_float(value):
 
 def _calculate_sl_tp(side, entry_price, atr):
     """
-    Calcula Stop Loss y Take Profit basados en ATR.
+    Calcula Stop Loss y Take Profit basados en ATR (motor de brain/risk.py).
     """
-    if atr is None or atr <= 0:
-        return None, None
-    
-    if side == 'LONG':
-        stop_loss = entry_price - (atr * ATR_MULTIPLIER_SL)
-        take_profit = entry_price + (atr * ATR_MULTIPLIER_TP)
-    elif side == 'SHORT':
-        stop_loss = entry_price + (atr * ATR_MULTIPLIER_SL)
-        take_profit = entry_price - (atr * ATR_MULTIPLIER_TP)
-    else:
+    if atr is None or atr <= 0 or side not in ('LONG', 'SHORT'):
         return None, None
-    
-    return stop_loss, take_profit
+    return initial_levels(_to_float(entry_price), _to_float(atr), side)
+
+def _build_trade(symbol, side, entry_price, exit_price, pnl, rsi, ema50, ema200, atr, volume,
+                 exit_reason=None, stop_loss=None, take_profit=None):
+    """Crea la instancia Trade con los datos limpios y convertidos (sin guardarla)"""
+    # Si no se proporcionan SL/TP y es una entrada nueva (exit_price=None), los calculamos
+    if exit_price is None and side in ['LONG', 'SHORT']:
+        calc_sl, calc_tp = _calculate_sl_tp(side, entry_price, atr)
+        stop_loss = stop_loss or calc_sl
+        take_profit = take_profit or calc_tp
+
+    return Trade(
+        symbol=str(symbol),
+        side=str(side),
+        entry_price=_to_float(entry_price),
+        exit_price=_to_float(exit_price),
+        exit_reason=exit_reason,
+        pnl=_to_float(pnl),
+        rsi=_to_float(rsi),
+        ema50=_to_float(ema50),
+        ema200=_to_float(ema200),
+        atr=_to_float(atr),
+        volume=_to_float(volume),
+        stop_loss=_to_float(stop_loss),
+        take_profit=_to_float(take_profit),
+        exit_time=datetime.utcnow() if exit_price is not None else None,
+    )
+
+def _add_trade(session, trade):
+    """Añade el trade a la sesión junto con la actualización de agregados"""
+    session.add(trade)
+    record_open(session, trade.symbol, trade.side)
+    if trade.exit_price is not None:
+        record_close(session, trade.symbol, trade.side, trade.pnl, trade.exit_reason)
+
+def _build_decision(symbol, side, price, rsi, ema50, ema200, atr, volume,
+                    vol_mean=None, mode=None, trade_id=None, regime=None):
+    return Decision(
+        symbol=str(symbol),
+        side=str(side),
+        mode=mode,
+        regime=regime,
+        price=_to_float(price),
+        rsi=_to_float(rsi),
+        ema50=_to_float(ema50),
+        ema200=_to_float(ema200),
+        atr=_to_float(atr),
+        volume=_to_float(volume),
+        vol_mean=_to_float(vol_mean),
+        trade_id=trade_id,
+    )
+
+def _add_decision(session, decision):
+    session.add(decision)
+    record_decision(session, decision.side)
+
+def mark_closed(session, trade_id, symbol, side, exit_price, pnl, reason):
+    """Cierra el trade si seguía abierto y acumula su resultado. Retorna si se actualizó"""
+    updated = session.query(Trade).filter(
+        Trade.id == trade_id,
+        Trade.exit_price == None
+    ).update({
+        Trade.exit_price: exit_price,
+        Trade.exit_reason: reason,
+        Trade.pnl: pnl,
+        Trade.exit_time: datetime.utcnow(),
+    }, synchronize_session=False)
+    if updated:
+        record_close(session, symbol, side, pnl, reason)
+    return bool(updated)
 
 def log_trade(
     symbol,
@@ -65,45 +124,188 @@ def log_trade(
     take_profit=None,
 ):
     """
-    Guarda una decisión del bot o un registro de trade en la base de datos.
+    Guarda una posición real (LONG/SHORT) en la tabla de trades.
+    Las señales sin posición (NO_TRADE) se redirigen al log de decisiones.
     Asegura que la sesión se cierre correctamente en cualquier escenario.
+    Retorna el id del trade creado, o None si no se pudo guardar.
     """
+    if side not in ['LONG', 'SHORT']:
+        log_decision(symbol, side, entry_price, rsi, ema50, ema200, atr, volume)
+        return None
+
     session = get_session()
+    trade_id = None
     try:
-        # Si no se proporcionan SL/TP y es una entrada nueva (exit_price=None), los calculamos
-        if exit_price is None and side in ['LONG', 'SHORT']:
-            calc_sl, calc_tp = _calculate_sl_tp(side, entry_price, atr)
-            stop_loss = stop_loss or calc_sl
-            take_profit = take_profit or calc_tp
-
-        # Creamos la instancia del modelo Trade con los datos limpios y convertidos
-        trade = Trade(
-            symbol=str(symbol),
-            side=str(side),
-            entry_price=_to_float(entry_price),
-            exit_price=_to_float(exit_price),
-            exit_reason=exit_reason,
-            pnl=_to_float(pnl),
-            rsi=_to_float(rsi),
-            ema50=_to_float(ema50),
-            ema200=_to_float(ema200),
-            atr=_to_float(atr),
-            volume=_to_float(volume),
-            stop_loss=_to_float(stop_loss),
-            take_profit=_to_float(take_profit),
-        )
+        trade = _build_trade(symbol, side, entry_price, exit_price, pnl, rsi, ema50, ema200,
+                             atr, volume, exit_reason, stop_loss, take_profit)
 
         # Agregamos la instancia a la sesión y confirmamos
-        session.add(trade)
+        _add_trade(session, trade)
         session.commit()
-        logger.info(f"💾 Registro guardado con éxito: {symbol} - {side}")
-        if stop_loss and take_profit:
-            logger.info(f"   SL: {stop_loss:.2f}, TP: {take_profit:.2f}")
+        trade_id = trade.id
+        levels = f" | SL: {trade.stop_loss:.2f}, TP: {trade.take_profit:.2f}" if trade.stop_loss and trade.take_profit else ""
+        logger.info(
+            f"💾 Registro guardado con éxito: {symbol} - {side}{levels}",
+            extra={"event": "trade_logged", "symbol": symbol, "side": side, "trade_id": trade_id},
+        )
         
     except Exception as e:
         # En caso de error, revertimos la transacción
         session.rollback()
-        logger.error(f"❌ Error crítico al guardar en la base de datos: {e}")
+        logger.error(f"❌ Error crítico al guardar en la base de datos: {e}", extra={"event": "trade_log_error", "symbol": symbol})
     finally:
         # Cerramos la sesión SIEMPRE para liberar recursos
-        session.close()
\ No newline at end of file
+        session.close()
+
+    return trade_id
+
+def log_decision(
+    symbol,
+    side,
+    price,
+    rsi,
+    ema50,
+    ema200,
+    atr,
+    volume,
+    vol_mean=None,
+    mode=None,
+    trade_id=None,
+    regime=None,
+):
+    """
+    Añade una decisión del bot (incluye NO_TRADE) al log append-only.
+    Retorna el id de la decisión, o None si no se pudo guardar.
+    """
+    session = get_session()
+    decision_id = None
+    try:
+        decision = _build_decision(symbol, side, price, rsi, ema50, ema200, atr, volume,
+                                   vol_mean, mode, trade_id, regime)
+        _add_decision(session, decision)
+        session.commit()
+        decision_id = decision.id
+    except Exception as e:
+        session.rollback()
+        logger.error(f"❌ Error al guardar la decisión: {e}", extra={"event": "decision_log_error", "symbol": symbol})
+    finally:
+        session.close()
+
+    return decision_id
+
+async def alog_trade(
+    symbol,
+    side,
+    entry_price,
+    exit_price,
+    pnl,
+    rsi,
+    ema50,
+    ema200,
+    atr,
+    volume,
+    exit_reason=None,
+    stop_loss=None,
+    take_profit=None,
+):
+    """
+    Versión asíncrona de log_trade() sobre el motor asíncrono (asyncpg/aiosqlite).
+    No bloquea el event loop mientras espera a la base de datos.
+    """
+    if side not in ['LONG', 'SHORT']:
+        await alog_decision(symbol, side, entry_price, rsi, ema50, ema200, atr, volume)
+        return None
+
+    async with get_async_session() as session:
+        try:
+            trade = _build_trade(symbol, side, entry_price, exit_price, pnl, rsi, ema50, ema200,
+                                 atr, volume, exit_reason, stop_loss, take_profit)
+            await session.run_sync(_add_trade, trade)
+            await session.commit()
+            logger.info(
+                f"💾 Registro guardado con éxito: {symbol} - {side}",
+                extra={"event": "trade_logged", "symbol": symbol, "side": side, "trade_id": trade.id},
+            )
+            return trade.id
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"❌ Error crítico al guardar en la base de datos: {e}", extra={"event": "trade_log_error", "symbol": symbol})
+            return None
+
+async def alog_decision(
+    symbol,
+    side,
+    price,
+    rsi,
+    ema50,
+    ema200,
+    atr,
+    volume,
+    vol_mean=None,
+    mode=None,
+    trade_id=None,
+    regime=None,
+):
+    """Versión asíncrona de log_decision()"""
+    async with get_async_session() as session:
+        try:
+            decision = _build_decision(symbol, side, price, rsi, ema50, ema200, atr, volume,
+                                       vol_mean, mode, trade_id, regime)
+            await session.run_sync(_add_decision, decision)
+            await session.commit()
+            return decision.id
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"❌ Error al guardar la decisión: {e}", extra={"event": "decision_log_error", "symbol": symbol})
+            return None
+
+async def aclose_trade(trade_id, symbol, side, exit_price, pnl, reason):
+    """
+    Versión asíncrona del cierre de PositionBook.close(). Retorna si el trade
+    seguía abierto; los errores se propagan (tras el rollback) al libro.
+    """
+    async with get_async_session() as session:
+        try:
+            updated = await session.run_sync(mark_closed, trade_id, symbol, side, exit_price, pnl, reason)
+            await session.commit()
+            return updated
+        except Exception:
+            await session.rollback()
+            raise
+
+class AsyncPersistence:
+    """
+    Event loop propio en un hilo daemon para usar alog_trade/alog_decision/
+    aclose_trade (motor asíncrono) desde código síncrono. Es un loop aparte
+    del de ejecución: los llenados que cierran trades se procesan en ese
+    loop y no pueden esperar a una corrutina programada en él mismo.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop.run_forever, name="persistence", daemon=True)
+        self._thread.start()
+        return self
+
+    def call(self, coroutine):
+        """Programa una corrutina en el loop de persistencia (retorna un Future)"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    async def _shutdown(self):
+        # Termina las escrituras pendientes antes de cerrar el pool
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        await asyncio.gather(*pending, return_exceptions=True)
+        await dispose_async_engine()
+
+    def stop(self, timeout=10.0):
+        if self._thread is None:
+            return
+        try:
+            self.call(self._shutdown()).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
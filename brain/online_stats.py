@@ -0,0 +1,432 @@
+# brain/online_stats.py
+"""
+Estadísticas de aprendizaje online: cada trade cerrado actualiza en O(1)
+acumuladores de Welford (media/varianza), sketches de cuantiles con buckets
+logarítmicos y contadores por lado/modo/hora. El estado se persiste en JSON
+tras cada cierre, así que el optimizador y las recomendaciones leen valores
+actuales sin volver a recorrer la tabla de trades.
+
+Los acumuladores se pueden combinar (`merge`): en el modo multi-símbolo cada
+shard acumula solo sus cierres y el coordinador los suma a su estado.
+"""
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from database.db import get_session
+from database.models import Trade, Decision
+from database.archive import load_archived_trades
+
+STATS_FILE = "online_stats.json"
+
+class Welford:
+    """Media y varianza en una pasada (algoritmo de Welford)"""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        """Combina otro acumulador (fórmula paralela de Chan et al.)"""
+        if not other.n:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data) if data else cls()
+
+class QuantileSketch:
+    """
+    Sketch de cuantiles con buckets logarítmicos (estilo DDSketch): cada valor
+    cae en el bucket ceil(log_gamma(|x|)), con error relativo acotado por
+    `relative_accuracy`. Memoria proporcional al rango de magnitudes, no a n.
+    """
+
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+
+    def _index(self, x):
+        return int(math.ceil(math.log(x) / self._log_gamma))
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, x):
+        self.count += 1
+        if x > self.MIN_VALUE:
+            k = self._index(x)
+            self.positive[k] = self.positive.get(k, 0) + 1
+        elif x < -self.MIN_VALUE:
+            k = self._index(-x)
+            self.negative[k] = self.negative.get(k, 0) + 1
+        else:
+            self.zero += 1
+
+    def _bins(self):
+        """(valor representativo, cuenta) en orden ascendente"""
+        for k in sorted(self.negative, reverse=True):
+            yield -self._value(k), self.negative[k]
+        if self.zero:
+            yield 0.0, self.zero
+        for k in sorted(self.positive):
+            yield self._value(k), self.positive[k]
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        running = 0
+        for value, n in self._bins():
+            running += n
+            if running > rank:
+                return value
+        return value
+
+    def merge(self, other):
+        """Suma los buckets de otro sketch con la misma precisión"""
+        for k, n in other.positive.items():
+            self.positive[k] = self.positive.get(k, 0) + n
+        for k, n in other.negative.items():
+            self.negative[k] = self.negative.get(k, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+
+    def count_above(self, threshold):
+        """Número (aproximado) de valores mayores que `threshold`"""
+        return sum(n for value, n in self._bins() if value > threshold)
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(k): v for k, v in self.positive.items()},
+            "negative": {str(k): v for k, v in self.negative.items()},
+            "zero": self.zero,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get("relative_accuracy", 0.01)) if data else cls()
+        if data:
+            sketch.positive = {int(k): v for k, v in data["positive"].items()}
+            sketch.negative = {int(k): v for k, v in data["negative"].items()}
+            sketch.zero = data["zero"]
+            sketch.count = data["count"]
+        return sketch
+
+class OnlineStats:
+    """
+    Acumuladores online de los trades cerrados.
+
+    - buckets["side|mode|hour"]: n, wins, losses y PnL (Welford).
+    - pnl / pnl_sketch: media, desviación y cuantiles del PnL.
+    - rsi["side|outcome"]: RSI de entrada (Welford) por lado y resultado.
+    - atr_sketch / atr_loss_sketch: cuantiles del ATR (todos / solo pérdidas).
+    - low_volume: trades abiertos con volumen < 1.05 x media.
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path  # None: solo en memoria (acumulador de un shard)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.closed = 0
+        self.buckets = {}
+        self.pnl = Welford()
+        self.pnl_sketch = QuantileSketch()
+        self.rsi = {}
+        self.atr_sketch = QuantileSketch()
+        self.atr_loss_sketch = QuantileSketch()
+        self.low_volume = 0
+
+    # --- Actualización ---
+
+    def record_close(self, side, pnl, rsi=None, atr=None, hour=None, mode=None, low_volume=False, save=True):
+        """Incorpora un trade cerrado (O(1)) y, por defecto, persiste el estado"""
+        pnl = float(pnl or 0.0)
+        outcome = "win" if pnl > 0 else "loss" if pnl < 0 else "flat"
+        with self._lock:
+            self.closed += 1
+            key = f"{side}|{mode or '?'}|{-1 if hour is None else int(hour)}"
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = {"n": 0, "wins": 0, "losses": 0, "pnl": Welford()}
+            bucket["n"] += 1
+            bucket["wins"] += outcome == "win"
+            bucket["losses"] += outcome == "loss"
+            bucket["pnl"].add(pnl)
+
+            self.pnl.add(pnl)
+            self.pnl_sketch.add(pnl)
+            if rsi is not None and not math.isnan(rsi):
+                self.rsi.setdefault(f"{side}|{outcome}", Welford()).add(float(rsi))
+            if atr is not None and not math.isnan(atr):
+                self.atr_sketch.add(float(atr))
+                if outcome == "loss":
+                    self.atr_loss_sketch.add(float(atr))
+            self.low_volume += bool(low_volume)
+        if save:
+            self.save()
+
+    # --- Persistencia ---
+
+    def _state(self):
+        return {
+            "closed": self.closed,
+            "buckets": {
+                k: {"n": b["n"], "wins": b["wins"], "losses": b["losses"], "pnl": b["pnl"].to_dict()}
+                for k, b in self.buckets.items()
+            },
+            "pnl": self.pnl.to_dict(),
+            "pnl_sketch": self.pnl_sketch.to_dict(),
+            "rsi": {k: w.to_dict() for k, w in self.rsi.items()},
+            "atr_sketch": self.atr_sketch.to_dict(),
+            "atr_loss_sketch": self.atr_loss_sketch.to_dict(),
+            "low_volume": self.low_volume,
+        }
+
+    def to_dict(self):
+        with self._lock:
+            return self._state()
+
+    def drain(self):
+        """Estado acumulado desde la última llamada (to_dict) y reinicio a cero"""
+        with self._lock:
+            data = self._state()
+            self._reset()
+        return data
+
+    def merge(self, data):
+        """Suma al estado otro estado serializado (to_dict/drain), p. ej. el de un shard"""
+        with self._lock:
+            self.closed += data["closed"]
+            for key, b in data["buckets"].items():
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    bucket = self.buckets[key] = {"n": 0, "wins": 0, "losses": 0, "pnl": Welford()}
+                bucket["n"] += b["n"]
+                bucket["wins"] += b["wins"]
+                bucket["losses"] += b["losses"]
+                bucket["pnl"].merge(Welford.from_dict(b["pnl"]))
+            self.pnl.merge(Welford.from_dict(data["pnl"]))
+            self.pnl_sketch.merge(QuantileSketch.from_dict(data["pnl_sketch"]))
+            for key, w in data["rsi"].items():
+                self.rsi.setdefault(key, Welford()).merge(Welford.from_dict(w))
+            self.atr_sketch.merge(QuantileSketch.from_dict(data["atr_sketch"]))
+            self.atr_loss_sketch.merge(QuantileSketch.from_dict(data["atr_loss_sketch"]))
+            self.low_volume += data["low_volume"]
+
+    def save(self):
+        """Escritura atómica del estado (nada si es solo en memoria)"""
+        if self.path is None:
+            return
+        data = self.to_dict()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Carga el estado persistido. Retorna False si no existe"""
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        with self._lock:
+            self.closed = data["closed"]
+            self.buckets = {
+                k: {"n": b["n"], "wins": b["wins"], "losses": b["losses"], "pnl": Welford.from_dict(b["pnl"])}
+                for k, b in data["buckets"].items()
+            }
+            self.pnl = Welford.from_dict(data["pnl"])
+            self.pnl_sketch = QuantileSketch.from_dict(data["pnl_sketch"])
+            self.rsi = {k: Welford.from_dict(w) for k, w in data["rsi"].items()}
+            self.atr_sketch = QuantileSketch.from_dict(data["atr_sketch"])
+            self.atr_loss_sketch = QuantileSketch.from_dict(data["atr_loss_sketch"])
+            self.low_volume = data["low_volume"]
+        return True
+
+    def rebuild(self):
+        """
+        Reconstruye el estado recorriendo una sola vez los trades cerrados
+        (tabla viva + archivo en frío). El modo sale de la decisión de
+        apertura; los trades sin ella y los archivados quedan con modo "?".
+        """
+        columns = ["id", "side", "pnl", "rsi", "atr", "volume", "vol_mean", "mode", "trade_time"]
+        session = get_session()
+        try:
+            rows = session.execute(
+                select(Trade.id, Trade.side, Trade.pnl, Trade.rsi, Trade.atr, Trade.volume,
+                       Decision.vol_mean, Decision.mode, Trade.trade_time)
+                .outerjoin(Decision, Decision.trade_id == Trade.id)
+                .where(Trade.exit_price != None)
+                .order_by(Trade.trade_time)
+            ).all()
+        finally:
+            session.close()
+
+        df = pd.DataFrame(rows, columns=columns)
+        archived = load_archived_trades(columns=[c for c in columns if c != "mode"])
+        if not archived.empty:
+            df = pd.concat([archived, df], ignore_index=True).drop_duplicates("id", keep="last")
+
+        with self._lock:
+            self._reset()
+        if not df.empty:
+            hours = pd.to_datetime(df["trade_time"]).dt.hour
+            vol_mean = pd.to_numeric(df["vol_mean"]).fillna(-np.inf)
+            low_volume = pd.to_numeric(df["volume"]) < vol_mean * 1.05
+            for row, hour, low in zip(df.itertuples(index=False), hours, low_volume):
+                self.record_close(
+                    row.side, row.pnl,
+                    rsi=None if pd.isna(row.rsi) else float(row.rsi),
+                    atr=None if pd.isna(row.atr) else float(row.atr),
+                    hour=None if pd.isna(hour) else int(hour),
+                    mode=None if pd.isna(row.mode) else row.mode,
+                    low_volume=bool(low), save=False,
+                )
+        self.save()
+        return self.closed
+
+    @classmethod
+    def open(cls, path=STATS_FILE):
+        """Carga el estado, o lo reconstruye desde la base de datos si no existe"""
+        stats = cls(path)
+        if not stats.load():
+            stats.rebuild()
+        return stats
+
+    # --- Consultas (O(buckets)) ---
+
+    def totals(self, side=None, mode=None, hour=None):
+        """n, wins, losses y suma de PnL de los buckets que cumplan el filtro"""
+        n = wins = losses = 0
+        pnl_sum = 0.0
+        with self._lock:
+            for key, bucket in self.buckets.items():
+                b_side, b_mode, b_hour = key.split("|")
+                if side is not None and b_side != side:
+                    continue
+                if mode is not None and b_mode != mode:
+                    continue
+                if hour is not None and int(b_hour) != hour:
+                    continue
+                n += bucket["n"]
+                wins += bucket["wins"]
+                losses += bucket["losses"]
+                pnl_sum += bucket["pnl"].mean * bucket["pnl"].n
+        return {"n": n, "wins": wins, "losses": losses, "pnl_sum": pnl_sum}
+
+    def by_hour(self, field="n"):
+        """{hora: valor} sumado sobre lados y modos"""
+        result = {}
+        with self._lock:
+            for key, bucket in self.buckets.items():
+                hour = int(key.rsplit("|", 1)[1])
+                if hour >= 0:
+                    result[hour] = result.get(hour, 0) + bucket[field]
+        return result
+
+    def rsi_mean(self, outcome, side=None):
+        """Media del RSI de entrada para un resultado (y lado opcional)"""
+        n = 0
+        total = 0.0
+        with self._lock:
+            for key, acc in self.rsi.items():
+                k_side, k_outcome = key.split("|")
+                if k_outcome == outcome and (side is None or k_side == side):
+                    n += acc.n
+                    total += acc.mean * acc.n
+        return total / n if n else None
+
+    def optimizer_inputs(self, mode=None):
+        """(total_trades, win_rate %, avg_pnl %) para StrategyOptimizer.propose"""
+        totals = self.totals(mode=mode)
+        if not totals["n"]:
+            return 0, 0.0, 0.0
+        return totals["n"], totals["wins"] / totals["n"] * 100, totals["pnl_sum"] / totals["n"]
+
+    def summary(self):
+        """Resumen instantáneo del rendimiento"""
+        totals = self.totals()
+        if not totals["n"]:
+            return {"closed_trades": 0}
+        return {
+            "closed_trades": totals["n"],
+            "win_rate": round(totals["wins"] / totals["n"] * 100, 2),
+            "total_pnl": round(totals["pnl_sum"], 4),
+            "avg_pnl": round(self.pnl.mean, 4),
+            "pnl_std": round(self.pnl.std, 4),
+            "pnl_p05": self.pnl_sketch.quantile(0.05),
+            "pnl_p50": self.pnl_sketch.quantile(0.50),
+            "pnl_p95": self.pnl_sketch.quantile(0.95),
+        }
+
+    def recommendations(self):
+        """Mismas reglas que TradingAnalyzer.analyze_performance, sobre el estado online"""
+        totals = self.totals()
+        if totals["n"] < 5:
+            return []
+
+        recommendations = []
+        rsi_mean = self.rsi_mean("loss")
+        if rsi_mean is not None:
+            if rsi_mean > 55:
+                recommendations.append(f"Ajustar RSI LONG a >{int(rsi_mean + 2)} (actual >52)")
+            elif rsi_mean < 45:
+                recommendations.append(f"Ajustar RSI SHORT a <{int(rsi_mean - 2)} (actual <48)")
+
+        loss_hours = self.by_hour("losses")
+        if any(loss_hours.values()):
+            hour = min(loss_hours, key=lambda h: (-loss_hours[h], h))
+            recommendations.append(f"Considerar desactivar trading entre {hour}:00-{(hour+1)%24}:00 UTC")
+
+        if self.low_volume > totals["n"] * 0.3:
+            recommendations.append("Relajar filtro de volumen: cambiar de 10% a 5% sobre promedio")
+
+        # Pérdidas con ATR por encima del percentil 75 del ATR de las propias pérdidas
+        atr_q75 = self.atr_loss_sketch.quantile(0.75)
+        if atr_q75 is not None and totals["losses"] and \
+                self.atr_loss_sketch.count_above(atr_q75) > totals["losses"] * 0.5:
+            recommendations.append("Reducir multiplicador ATR para SL de 1.5 a 1.2 en alta volatilidad")
+
+        return recommendations
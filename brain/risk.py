@@ -1,14 +1,178 @@
-def calculate_sl_tp(entry_price, atr, side):
-    sl_distance = atr * 1.2
-    tp_distance = sl_distance * 1.5
-
-    if side == "LONG":
-        stop_loss = entry_price - sl_distance
-        take_profit = entry_price + tp_distance
-    elif side == "SHORT":
-        stop_loss = entry_price + sl_distance
-        take_profit = entry_price - tp_distance
+# brain/risk.py
+"""
+Motor de riesgo único (NumPy) para el runner, el backtest y el etiquetador.
+
+Todas las funciones trabajan con arrays de posiciones a la vez:
+
+    initial_levels   -> Stop Loss y Take Profit iniciales a múltiplos del ATR
+    simulate_paths   -> recorrido de N posiciones por M velas (break-even,
+                        trailing y salida en una sola pasada vectorizada)
+    evaluate_exits   -> un paso (tick o vela) para N posiciones abiertas
+
+Reglas por vela, en este orden (mismas que tenía el backtest):
+
+1. Break-even: si el precio avanza `be_trigger` a favor, el stop pasa a la
+   entrada (nunca se afloja un stop que ya estuviera por encima).
+2. Trailing: mientras no haya break-even, el stop sigue al cierre a
+   `trail_dist` de distancia y solo se mueve a favor.
+3. Salida: si el mínimo (máximo en SHORT) toca el stop se sale en el stop;
+   si no, si el máximo (mínimo) toca el objetivo se sale en el objetivo.
+   Si ambos caen en la misma vela se asume el stop (conservador).
+
+Con `update_first=False` (monitor en vivo) el paso 3 va primero: la vela se
+compara con el stop que traía de la anterior y break-even/trailing solo
+mueven el stop para las velas siguientes. Sin conocer el orden intrabar es
+lo único que no inventa salidas: un stop subido por el máximo de la vela no
+puede tocarse con un mínimo que pudo ocurrir antes.
+
+Los SHORT se resuelven como LONG con los precios cambiados de signo, así que
+todo el cálculo es una única rama sin bucles por posición.
+"""
+import numpy as np
+
+# Multiplicadores ATR de la estrategia en vivo (Ratio 1:2)
+ATR_MULTIPLIER_SL = 1.5
+ATR_MULTIPLIER_TP = 3.0
+
+# Break-even al 50% del camino al objetivo (backtest)
+BE_TRIGGER_FRACTION = 0.5
+
+EXIT_NONE = 0
+EXIT_SL = 1
+EXIT_TP = 2
+EXIT_REASONS = {EXIT_NONE: None, EXIT_SL: "SL", EXIT_TP: "TP"}
+
+def side_sign(side):
+    """+1 para LONG, -1 para SHORT y 0 para cualquier otro valor (acepta arrays)"""
+    side = np.asarray(side)
+    if side.dtype.kind in "iuf":
+        return np.sign(side).astype(float)
+    return np.where(side == "LONG", 1.0, np.where(side == "SHORT", -1.0, 0.0))
+
+def _scalar(value):
+    return float(value) if np.ndim(value) == 0 else value
+
+def _column(value, n):
+    """Parámetro por posición (escalar o array) como columna (n, 1)"""
+    value = np.asarray(value, dtype=float)
+    return np.broadcast_to(value.reshape(-1, 1) if value.ndim else value, (n, 1))
+
+def initial_levels(entry, atr, side, sl_mult=ATR_MULTIPLIER_SL, tp_mult=ATR_MULTIPLIER_TP):
+    """
+    Stop Loss y Take Profit iniciales.
+    NaN donde el ATR no es válido o el lado no es LONG/SHORT.
+    Con entradas escalares retorna floats.
+    """
+    entry = np.asarray(entry, dtype=float)
+    atr = np.asarray(atr, dtype=float)
+    sign = side_sign(side)
+    with np.errstate(invalid="ignore"):
+        valid = (sign != 0) & (atr > 0)
+        stop = np.where(valid, entry - sign * atr * sl_mult, np.nan)
+        target = np.where(valid, entry + sign * atr * tp_mult, np.nan)
+    return _scalar(stop), _scalar(target)
+
+def simulate_paths(entry, stop, target, side, high, low, close=None, trail_dist=None, be_trigger=None,
+                   be_active=None, update_first=True):
+    """
+    Recorre N posiciones por M velas a la vez.
+
+    Args:
+        entry, stop, target (array): Precio de entrada y niveles actuales por posición.
+        side: "LONG"/"SHORT" (o +1/-1) común o por posición.
+        high, low, close (ndarray): Velas (N, M); con una sola posición vale (M,).
+            Las velas NaN (relleno) no disparan nada. `close` solo hace falta con trailing.
+        trail_dist (float|array): Distancia del trailing stop (None lo desactiva).
+        be_trigger (float|array): Avance que activa el break-even (None lo desactiva).
+        be_active (array): Break-even ya activo al empezar.
+        update_first (bool): True (backtest) aplica break-even/trailing de la vela
+            antes de comprobar la salida; False compara con el stop de la vela anterior.
+
+    Returns:
+        tuple: (motivo EXIT_*, índice de la vela de salida o -1, precio de salida,
+                stop y break-even con los que se salió o, sin salida, los
+                vigentes tras la última vela).
+    """
+    high = np.atleast_2d(np.asarray(high, dtype=float))
+    low = np.atleast_2d(np.asarray(low, dtype=float))
+    n, m = high.shape
+
+    sign = np.broadcast_to(side_sign(side).reshape(-1, 1) if np.ndim(side) else side_sign(side), (n, 1))
+    with np.errstate(invalid="ignore"):
+        valid = (sign != 0) & np.isfinite(_column(stop, n))
+    entry_l = _column(entry, n) * sign
+    stop_l = np.where(valid, _column(stop, n) * sign, np.nan)
+    target_l = np.where(valid, _column(target, n) * sign, np.nan)
+
+    # Velas en "espacio LONG": en SHORT el máximo es -mínimo y viceversa
+    if np.all(sign > 0):
+        hi, lo = high, low
+    elif np.all(sign < 0):
+        hi, lo = -low, -high
     else:
-        return None, None
+        hi, lo = np.where(sign < 0, -low, high), np.where(sign < 0, -high, low)
+
+    be_start = np.zeros((n, 1), dtype=bool) if be_active is None else np.asarray(be_active, dtype=bool).reshape(-1, 1)
+    be_start = np.broadcast_to(be_start, (n, 1))
+    be_on = np.broadcast_to(be_start, (n, m))
+    stop_path = np.broadcast_to(stop_l, (n, m))
+
+    with np.errstate(invalid="ignore"):
+        if be_trigger is not None:
+            reached = hi - entry_l >= _column(be_trigger, n)
+            be_on = be_on | np.logical_or.accumulate(reached, axis=1)
+            stop_path = np.where(be_on, np.fmax(stop_path, entry_l), stop_path)
 
+        if trail_dist is not None:
+            close = np.atleast_2d(np.asarray(close, dtype=float))
+            close_l = close * sign if not np.all(sign > 0) else close
+            candidate = np.where(be_on, -np.inf, close_l - _column(trail_dist, n))
+            stop_path = np.fmax(stop_path, np.fmax.accumulate(candidate, axis=1))
+
+        stop_path = np.where(valid, stop_path, np.nan)
+        if update_first:
+            test_stop, test_be = stop_path, be_on
+        else:
+            # Stop y break-even con los que empieza cada vela (los de la anterior)
+            test_stop = np.concatenate([np.broadcast_to(stop_l, (n, 1)), stop_path[:, :-1]], axis=1)
+            test_be = np.concatenate([be_start, be_on[:, :-1]], axis=1)
+        hit_sl = lo <= test_stop
+        hit = hit_sl | (hi >= target_l)
+
+    rows = np.arange(n)
+    any_hit = hit.any(axis=1)
+    index = np.where(any_hit, hit.argmax(axis=1), -1)
+    at = np.where(any_hit, index, m - 1)
+    at_sl = any_hit & hit_sl[rows, at]
+
+    reason = np.where(at_sl, EXIT_SL, np.where(any_hit, EXIT_TP, EXIT_NONE))
+    exit_l = np.where(at_sl, test_stop[rows, at], np.where(any_hit, target_l[:, 0], np.nan))
+    final_stop = np.where(any_hit, test_stop[rows, at], stop_path[rows, at])
+    final_be = np.where(any_hit, test_be[rows, at], be_on[rows, at])
+    return reason, index, exit_l * sign[:, 0], final_stop * sign[:, 0], final_be
+
+def evaluate_exits(entry, stop, target, side, high, low=None, close=None, trail_dist=None, be_trigger=None,
+                   be_active=None, update_first=True):
+    """
+    Un paso para N posiciones abiertas: la vela (o el tick, si solo se pasa
+    `high` como precio) de cada posición actualiza su break-even/trailing y
+    decide si sale. Una sola llamada vectorizada para todo el libro.
+    `update_first` como en simulate_paths.
+
+    Returns:
+        tuple: (motivo EXIT_*, precio de salida, stop de la salida o nuevo stop, break-even activo).
+    """
+    high = np.asarray(high, dtype=float).reshape(-1, 1)
+    low = high if low is None else np.asarray(low, dtype=float).reshape(-1, 1)
+    close = high if close is None else np.asarray(close, dtype=float).reshape(-1, 1)
+    reason, _, price, new_stop, be = simulate_paths(
+        entry, stop, target, side, high, low, close, trail_dist, be_trigger, be_active, update_first
+    )
+    return reason, price, new_stop, be
+
+def calculate_sl_tp(entry_price, atr, side, sl_mult=1.2, risk_reward=1.5):
+    """Niveles de una sola entrada redondeados a 2 decimales (None si el lado no opera)"""
+    stop_loss, take_profit = initial_levels(entry_price, atr, side, sl_mult, sl_mult * risk_reward)
+    if np.isnan(stop_loss):
+        return None, None
     return round(stop_loss, 2), round(take_profit, 2)
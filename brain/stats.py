@@ -1,83 +1,242 @@
-from sqlalchemy import func
-from database.db import get_session
-from database.models import Trade
+from datetime import datetime
+from sqlalchemy import func, select, update, insert, delete, case
+from sqlalchemy.exc import IntegrityError
+from database.db import get_session, engine
+from database.models import Trade, Decision, PerformanceAggregate
+from database.archive import load_archived_trades
+from config.logs import get_logger
+
+logger = get_logger("Stats")
+
+# Campos acumulables de PerformanceAggregate
+_COUNTERS = ("signals", "opened", "closed", "wins", "losses", "pnl_sum", "gross_profit", "gross_loss")
+
+def _bump(bind, scope, key, exit_reason="", **deltas):
+    """
+    Suma `deltas` a una fila de agregados con un UPDATE atómico en SQL.
+    Si la fila no existe aún, la crea. `bind` puede ser una sesión o una conexión.
+    """
+    table = PerformanceAggregate.__table__
+    where = (table.c.scope == scope) & (table.c.key == key) & (table.c.exit_reason == exit_reason)
+    values = {name: table.c[name] + delta for name, delta in deltas.items()}
+    values["updated_at"] = datetime.utcnow()
+
+    if bind.execute(update(table).where(where).values(**values)).rowcount:
+        return
+
+    row = {name: 0 for name in _COUNTERS}
+    row.update(deltas)
+    try:
+        with bind.begin_nested():
+            bind.execute(insert(table).values(
+                scope=scope, key=key, exit_reason=exit_reason, updated_at=datetime.utcnow(), **row
+            ))
+    except IntegrityError:
+        # Otro proceso creó la fila entre medias: aplicamos el incremento sobre ella
+        bind.execute(update(table).where(where).values(**values))
+
+def _scopes(symbol, side):
+    return [("ALL", "*"), ("SIDE", str(side)), ("SYMBOL", str(symbol))]
+
+def record_decision(bind, side):
+    """Cuenta una decisión registrada (incluye NO_TRADE)"""
+    _bump(bind, "SIDE", str(side), signals=1)
+
+def record_open(bind, symbol, side):
+    """Cuenta una posición abierta"""
+    for scope, key in _scopes(symbol, side):
+        _bump(bind, scope, key, opened=1)
+
+def record_close(bind, symbol, side, pnl, exit_reason):
+    """Acumula el resultado de un trade cerrado (totales e histograma de motivos)"""
+    pnl = float(pnl or 0.0)
+    deltas = {
+        "closed": 1,
+        "wins": 1 if pnl > 0 else 0,
+        "losses": 1 if pnl < 0 else 0,
+        "pnl_sum": pnl,
+        "gross_profit": pnl if pnl > 0 else 0.0,
+        "gross_loss": -pnl if pnl < 0 else 0.0,
+    }
+    for scope, key in _scopes(symbol, side):
+        _bump(bind, scope, key, **deltas)
+        if exit_reason:
+            _bump(bind, scope, key, exit_reason=str(exit_reason)[:50], **deltas)
+
+def rebuild_aggregates(bind=None, include_archive=True):
+    """
+    Recalcula todos los agregados desde las tablas 'trades' y 'decisions'
+    más los trades del archivo en frío (database/archive.py).
+    Sirve para el backfill inicial o para corregir desviaciones.
+    `include_archive=False` para bases de datos que no son la del bot (el
+    archivo local solo contiene trades de esta).
+    """
+    if bind is None:
+        with engine.begin() as conn:
+            return rebuild_aggregates(conn, include_archive)
+
+    closed = Trade.exit_price != None
+    rows = bind.execute(
+        select(
+            Trade.symbol,
+            Trade.side,
+            Trade.exit_reason,
+            func.count(),
+            func.sum(case((closed, 1), else_=0)),
+            func.sum(case((closed & (Trade.pnl > 0), 1), else_=0)),
+            func.sum(case((closed & (Trade.pnl < 0), 1), else_=0)),
+            func.sum(case((closed, Trade.pnl), else_=0.0)),
+            func.sum(case((closed & (Trade.pnl > 0), Trade.pnl), else_=0.0)),
+            func.sum(case((closed & (Trade.pnl < 0), -Trade.pnl), else_=0.0)),
+        ).group_by(Trade.symbol, Trade.side, Trade.exit_reason)
+    ).all()
+
+    totals = {}
+    def add(scope, key, exit_reason, values):
+        acc = totals.setdefault((scope, key, exit_reason), dict.fromkeys(_COUNTERS, 0))
+        for name, value in values.items():
+            acc[name] += value or 0
+
+    for symbol, side, reason, opened, n_closed, wins, losses, pnl_sum, profit, loss in rows:
+        values = {
+            "opened": opened, "closed": n_closed, "wins": wins, "losses": losses,
+            "pnl_sum": pnl_sum, "gross_profit": profit, "gross_loss": loss,
+        }
+        for scope, key in _scopes(symbol, side):
+            add(scope, key, "", values)
+            if reason and n_closed:
+                add(scope, key, str(reason)[:50], dict(values, opened=0))
+
+    # Trades ya movidos al archivo en frío (todos cerrados)
+    # (sin los que siguen en la tabla viva si un archivado se interrumpió)
+    archived = None
+    if include_archive:
+        live_ids = [i for (i,) in bind.execute(select(Trade.id).where(Trade.exit_price != None))]
+        archived = load_archived_trades(columns=["symbol", "side", "exit_reason", "pnl"], exclude_ids=live_ids)
+    if archived is not None and not archived.empty:
+        pnl = archived["pnl"].fillna(0.0)
+        archived = archived.assign(
+            exit_reason=archived["exit_reason"].fillna(""),
+            wins=(pnl > 0).astype(int),
+            losses=(pnl < 0).astype(int),
+            pnl_sum=pnl,
+            gross_profit=pnl.clip(lower=0),
+            gross_loss=(-pnl).clip(lower=0),
+        )
+        grouped = archived.groupby(["symbol", "side", "exit_reason"]).agg(
+            closed=("pnl_sum", "size"), wins=("wins", "sum"), losses=("losses", "sum"),
+            pnl_sum=("pnl_sum", "sum"), gross_profit=("gross_profit", "sum"), gross_loss=("gross_loss", "sum"),
+        )
+        for (symbol, side, reason), g in zip(grouped.index, grouped.itertuples(index=False)):
+            values = {
+                "opened": int(g.closed), "closed": int(g.closed), "wins": int(g.wins), "losses": int(g.losses),
+                "pnl_sum": float(g.pnl_sum), "gross_profit": float(g.gross_profit), "gross_loss": float(g.gross_loss),
+            }
+            for scope, key in _scopes(symbol, side):
+                add(scope, key, "", values)
+                if reason:
+                    add(scope, key, str(reason)[:50], dict(values, opened=0))
+
+    for side, count in bind.execute(select(Decision.side, func.count()).group_by(Decision.side)):
+        add("SIDE", str(side), "", {"signals": count})
+
+    bind.execute(delete(PerformanceAggregate.__table__))
+    now = datetime.utcnow()
+    if totals:
+        bind.execute(insert(PerformanceAggregate.__table__), [
+            dict(scope=scope, key=key, exit_reason=reason, updated_at=now, **values)
+            for (scope, key, reason), values in totals.items()
+        ])
+    return len(totals)
 
 def print_summary():
     """
-    Analiza la tabla de trades y genera un reporte detallado del rendimiento.
+    Genera un reporte detallado del rendimiento a partir de los agregados
+    materializados (O(1): no recorre el histórico de trades).
     Versión mejorada: muestra info incluso con pocos datos.
+    El reporte sale como un único registro event="summary" por el logger
+    encolado (texto legible + campos estructurados), sin bloquear el ciclo.
     """
     session = get_session()
     try:
+        rows = session.query(PerformanceAggregate).filter(
+            PerformanceAggregate.scope.in_(['ALL', 'SIDE'])
+        ).all()
+        totals = {(r.scope, r.key): r for r in rows if not r.exit_reason}
+        overall = totals.get(("ALL", "*"))
+
         # 1. Estadísticas generales
-        total_all = session.query(Trade).count()
-        closed_trades = session.query(Trade).filter(Trade.exit_price != None).all()
-        open_trades = session.query(Trade).filter(Trade.exit_price == None, 
-                                                 Trade.side.in_(['LONG', 'SHORT'])).count()
+        total_all = overall.opened if overall else 0
+        closed_count = overall.closed if overall else 0
+        open_trades = total_all - closed_count
         
         if total_all == 0:
-            print("\n📊 [STATS] No hay trades registrados aún.")
+            logger.info("📊 [STATS] No hay trades registrados aún.", extra={"event": "summary", "total_trades": 0})
             return
         
-        print("\n" + "="*60)
-        print(f"📈 REPORTE DE RENDIMIENTO - TRADER BOTIA")
-        print("-"*60)
-        print(f"🔹 Trades Totales: {total_all}")
-        print(f"🔹 Trades Cerrados: {len(closed_trades)}")
-        print(f"🔹 Trades Abiertos: {open_trades}")
+        lines = [
+            "=" * 60,
+            "📈 REPORTE DE RENDIMIENTO - TRADER BOTIA",
+            "-" * 60,
+            f"🔹 Trades Totales: {total_all}",
+            f"🔹 Trades Cerrados: {closed_count}",
+            f"🔹 Trades Abiertos: {open_trades}",
+        ]
         
         # 2. Distribución de señales
-        longs = session.query(Trade).filter(Trade.side == 'LONG').count()
-        shorts = session.query(Trade).filter(Trade.side == 'SHORT').count()
-        no_trades = session.query(Trade).filter(Trade.side == 'NO_TRADE').count()
+        longs = totals[("SIDE", "LONG")].opened if ("SIDE", "LONG") in totals else 0
+        shorts = totals[("SIDE", "SHORT")].opened if ("SIDE", "SHORT") in totals else 0
+        no_trades = totals[("SIDE", "NO_TRADE")].signals if ("SIDE", "NO_TRADE") in totals else 0
         
-        print(f"🔹 Distribución: {longs} LONG | {shorts} SHORT | {no_trades} NO_TRADE")
+        lines.append(f"🔹 Distribución: {longs} LONG | {shorts} SHORT | {no_trades} NO_TRADE")
+        fields = {
+            "event": "summary", "total_trades": total_all, "closed_trades": closed_count,
+            "open_trades": open_trades, "longs": longs, "shorts": shorts, "no_trades": no_trades,
+        }
         
         # 3. Solo si hay trades cerrados, mostrar análisis detallado
-        if len(closed_trades) >= 3:
-            winning_trades = [t for t in closed_trades if (t.pnl is not None and t.pnl > 0)]
-            losing_trades = [t for t in closed_trades if (t.pnl is not None and t.pnl < 0)]
-            
-            win_rate = (len(winning_trades) / len(closed_trades)) * 100
-            total_pnl = sum(t.pnl for t in closed_trades if t.pnl is not None)
+        if closed_count >= 3:
+            win_rate = (overall.wins / closed_count) * 100
+            total_pnl = overall.pnl_sum
             
-            avg_win = sum(t.pnl for t in winning_trades) / len(winning_trades) if winning_trades else 0
-            avg_loss = sum(t.pnl for t in losing_trades) / len(losing_trades) if losing_trades else 0
+            avg_win = overall.gross_profit / overall.wins if overall.wins else 0
+            avg_loss = -overall.gross_loss / overall.losses if overall.losses else 0
             
-            gross_profit = sum(t.pnl for t in winning_trades)
-            gross_loss = abs(sum(t.pnl for t in losing_trades))
-            profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
+            profit_factor = overall.gross_profit / overall.gross_loss if overall.gross_loss > 0 else float('inf')
             
-            print("-"*60)
-            print(f"💰 PnL Total: {total_pnl:.4f}%")
-            print(f"🎯 Win Rate: {win_rate:.2f}%")
-            print(f"📊 Profit Factor: {profit_factor:.2f}")
-            print(f"✅ Avg Win: {avg_win:.4f}% | ❌ Avg Loss: {avg_loss:.4f}%")
+            lines += [
+                "-" * 60,
+                f"💰 PnL Total: {total_pnl:.4f}%",
+                f"🎯 Win Rate: {win_rate:.2f}%",
+                f"📊 Profit Factor: {profit_factor:.2f}",
+                f"✅ Avg Win: {avg_win:.4f}% | ❌ Avg Loss: {avg_loss:.4f}%",
+            ]
             
             # Razones de cierre
-            if closed_trades:
-                reasons = {}
-                for t in closed_trades:
-                    if t.exit_reason:
-                        reasons[t.exit_reason] = reasons.get(t.exit_reason, 0) + 1
-                
-                if reasons:
-                    print(f"🔍 Cierres: {', '.join([f'{k}: {v}' for k, v in reasons.items()])}")
+            reasons = {r.exit_reason: r.closed for r in rows if r.scope == "ALL" and r.exit_reason}
+            if reasons:
+                lines.append(f"🔍 Cierres: {', '.join([f'{k}: {v}' for k, v in reasons.items()])}")
+            fields.update(
+                total_pnl=total_pnl, win_rate=win_rate, avg_win=avg_win, avg_loss=avg_loss,
+                profit_factor=profit_factor if profit_factor != float('inf') else None, exit_reasons=reasons,
+            )
         else:
-            print("-"*60)
-            print(f"⏳ Necesarios {3 - len(closed_trades)} trades más para análisis detallado")
+            lines += ["-" * 60, f"⏳ Necesarios {3 - closed_count} trades más para análisis detallado"]
             
             # Mostrar últimos trades
-            if closed_trades:
-                print("📝 Últimos trades cerrados:")
-                for t in closed_trades[-3:]:
+            if closed_count:
+                last_closed = session.query(Trade).filter(Trade.exit_price != None)\
+                    .order_by(Trade.id.desc()).limit(3).all()
+                lines.append("📝 Últimos trades cerrados:")
+                for t in reversed(last_closed):
                     pnl_str = f"+{t.pnl:.2f}%" if t.pnl > 0 else f"{t.pnl:.2f}%"
-                    print(f"   #{t.id}: {t.side} | PnL: {pnl_str} | Razón: {t.exit_reason}")
+                    lines.append(f"   #{t.id}: {t.side} | PnL: {pnl_str} | Razón: {t.exit_reason}")
         
-        print("="*60 + "\n")
+        lines.append("=" * 60)
+        logger.info("\n".join(lines), extra=fields)
 
     except Exception as e:
-        print(f"⚠️ Error en stats: {e}")
+        logger.warning(f"⚠️ Error en stats: {e}", extra={"event": "summary_error"})
     finally:
         session.close()
 
@@ -87,9 +246,13 @@ def get_total_pnl():
     """
     session = get_session()
     try:
-        total = session.query(func.sum(Trade.pnl)).filter(Trade.exit_price != None).scalar()
+        total = session.query(PerformanceAggregate.pnl_sum).filter(
+            PerformanceAggregate.scope == "ALL",
+            PerformanceAggregate.key == "*",
+            PerformanceAggregate.exit_reason == "",
+        ).scalar()
         return float(total) if total else 0.0
     except Exception:
         return 0.0
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
@@ -0,0 +1,138 @@
+# config/history.py
+"""
+Historial append-only de parámetros y optimizaciones (SQLite de la stdlib).
+
+Cada cambio de parámetros del optimizador, cada entrada por símbolo/régimen y
+cada optimización aplicada se inserta como una fila nueva en su propia
+transacción (nunca se reescribe nada). Con índices por timestamp y por
+modo, consultas como "parámetros vigentes en el instante T" son una búsqueda
+en el índice, y un backtest o un post-mortem puede reproducir exactamente lo
+que usaba el bot en vivo.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+HISTORY_DB = "param_history.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS param_history (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,          -- params | entry | optimization
+    mode TEXT,
+    symbol TEXT,
+    regime TEXT,
+    payload TEXT                 -- JSON (NULL = entrada eliminada)
+);
+CREATE INDEX IF NOT EXISTS ix_param_history_kind_ts ON param_history (kind, ts);
+CREATE INDEX IF NOT EXISTS ix_param_history_mode_ts ON param_history (mode, ts);
+CREATE INDEX IF NOT EXISTS ix_param_history_entry ON param_history (kind, symbol, regime, ts);
+"""
+
+def _timestamp(value):
+    """Acepta epoch (s), datetime (UTC naive o aware) o ISO 8601"""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    return value.timestamp()
+
+class ParamHistory:
+    """
+    Almacén append-only del historial de parámetros.
+
+    Args:
+        path (str): Fichero SQLite (se crea si no existe).
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def append(self, kind, payload, mode=None, symbol=None, regime=None, ts=None):
+        """Inserta un registro (transacción propia: o se escribe entero o nada)"""
+        data = None if payload is None else json.dumps(payload, default=str)
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO param_history (ts, kind, mode, symbol, regime, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                    (_timestamp(ts), kind, mode, symbol, regime, data),
+                )
+        return cursor.lastrowid
+
+    def record_params(self, params, ts=None):
+        return self.append("params", params, mode=params.get("mode"), ts=ts)
+
+    def record_entry(self, symbol, regime, params, ts=None):
+        return self.append("entry", params, symbol=symbol, regime=regime, ts=ts)
+
+    def record_optimization(self, optimizations, mode=None, ts=None):
+        return self.append("optimization", optimizations, mode=mode, ts=ts)
+
+    def params_at(self, ts=None):
+        """Snapshot global de parámetros vigente en `ts` (o None si no había)"""
+        row = self._conn.execute(
+            "SELECT payload FROM param_history WHERE kind = 'params' AND ts <= ? ORDER BY ts DESC, id DESC LIMIT 1",
+            (_timestamp(ts),),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def entries_at(self, ts=None):
+        """Entradas por (símbolo, régimen) vigentes en `ts`"""
+        rows = self._conn.execute(
+            """
+            SELECT symbol, regime, payload FROM param_history AS h
+            WHERE kind = 'entry' AND ts <= :ts AND id = (
+                SELECT id FROM param_history
+                WHERE kind = 'entry' AND symbol = h.symbol AND regime = h.regime AND ts <= :ts
+                ORDER BY ts DESC, id DESC LIMIT 1
+            )
+            """,
+            {"ts": _timestamp(ts)},
+        ).fetchall()
+        return {(symbol, regime): json.loads(payload) for symbol, regime, payload in rows if payload is not None}
+
+    def history(self, kind=None, since=None, until=None, mode=None, limit=None):
+        """Registros en orden cronológico, filtrados por tipo, intervalo y modo"""
+        sql = "SELECT id, ts, kind, mode, symbol, regime, payload FROM param_history WHERE ts >= ? AND ts <= ?"
+        args = [_timestamp(since) if since is not None else float("-inf"), _timestamp(until)]
+        if kind is not None:
+            sql += " AND kind = ?"
+            args.append(kind)
+        if mode is not None:
+            sql += " AND mode = ?"
+            args.append(mode)
+        sql += " ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [
+            {
+                "id": row[0],
+                "timestamp": datetime.utcfromtimestamp(row[1]).isoformat(),
+                "kind": row[2],
+                "mode": row[3],
+                "symbol": row[4],
+                "regime": row[5],
+                "payload": json.loads(row[6]) if row[6] is not None else None,
+            }
+            for row in self._conn.execute(sql, args)
+        ]
+
+    def count(self, kind=None):
+        if kind is None:
+            return self._conn.execute("SELECT COUNT(*) FROM param_history").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM param_history WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,189 @@
+# config/logs.py
+"""
+Pipeline de logging no bloqueante para el bucle en caliente.
+
+Los módulos solo encolan registros (`QueueHandler`, O(1) y sin I/O); un
+`QueueListener` en un hilo aparte los formatea y escribe en consola y en un
+fichero JSON rotativo. Un filtro por evento limita la frecuencia (ventana +
+ráfaga) y permite muestrear eventos ruidosos antes de encolarlos.
+
+Configuración por entorno:
+    LOG_LEVEL   Nivel mínimo (INFO por defecto).
+    LOG_FORMAT  "text" (mensaje legible) o "json" para la consola.
+    LOG_FILE    Fichero JSON Lines rotativo ("logs/bot.jsonl"; vacío lo desactiva).
+
+Campos estructurados: `logger.info("...", extra={"event": "cycle", "symbol": ..., ...})`.
+
+Los puntos de entrada (runner, shards, scripts) llaman a `setup_logging()` al
+arrancar. Si nadie lo hace, el primer `get_logger()` deja un handler de consola
+mínimo (sin cola ni fichero) para que los mensajes INFO no se pierdan.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_FILE = os.getenv("LOG_FILE", "logs/bot.jsonl")
+LOG_FILE_MAX_BYTES = 10_000_000
+LOG_FILE_BACKUPS = 5
+
+# Atributos estándar de LogRecord: el resto son campos estructurados (extra=...)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos extra del registro"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita cada clave de evento a `burst` registros por ventana de `window` segundos
+    y muestrea eventos concretos (`sample={"cycle": 10}` deja pasar 1 de cada 10).
+
+    La clave es `record.event` (o el logger + línea de código que emite) más
+    `record.symbol` si existe, para que varios símbolos no se limiten entre sí. El
+    primer registro que pasa tras una supresión lleva `suppressed=N`. Una vez por
+    ventana se descartan las claves con la ventana vencida y nada pendiente, así
+    que el estado no crece con mensajes formateados ni símbolos retirados.
+    """
+
+    def __init__(self, burst=30, window=60.0, sample=None):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample = dict(sample or {})
+        self._state = {}  # clave -> [inicio_ventana, emitidos, suprimidos, vistos]
+        self._next_sweep = time.monotonic() + self.window
+        self._lock = threading.Lock()
+
+    def _sweep(self, now):
+        """Elimina las claves con la ventana vencida y sin supresiones por reportar"""
+        expired = [key for key, state in self._state.items() if now - state[0] >= self.window and not state[2]]
+        for key in expired:
+            del self._state[key]
+        self._next_sweep = now + self.window
+
+    def filter(self, record):
+        event = getattr(record, "event", None)
+        key = (event or (record.name, record.pathname, record.lineno), getattr(record, "symbol", None))
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [now, 0, 0, 0]
+            state[3] += 1
+            every = self.sample.get(event)
+            if every and (state[3] - 1) % every:
+                return False
+            if now - state[0] >= self.window:
+                state[0], state[1] = now, 0
+            if state[1] >= self.burst:
+                state[2] += 1
+                return False
+            state[1] += 1
+            if state[2]:
+                record.suppressed = state[2]
+                state[2] = 0
+        return True
+
+def setup_logging(level=None, fmt=None, log_file=None, rate_limit=None):
+    """
+    Instala el pipeline en el logger raíz (idempotente).
+
+    Args:
+        level (str): Nivel mínimo; por defecto LOG_LEVEL.
+        fmt (str): "text" o "json" para la consola; por defecto LOG_FORMAT.
+        log_file (str): Fichero JSON rotativo; por defecto LOG_FILE ("" lo desactiva).
+        rate_limit (RateLimitFilter): Filtro de frecuencia; por defecto uno estándar.
+
+    Returns:
+        logging.handlers.QueueListener: El listener en marcha.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        console = logging.StreamHandler(sys.stdout)
+        if (fmt or LOG_FORMAT) == "json":
+            console.setFormatter(JsonFormatter())
+        else:
+            console.setFormatter(logging.Formatter("%(message)s"))
+        handlers = [console]
+
+        log_file = LOG_FILE if log_file is None else log_file
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(rate_limit or RateLimitFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level or LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+def shutdown_logging():
+    """Vacía la cola y detiene el hilo del listener"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def _install_default_handler():
+    """Consola a LOG_LEVEL en el logger raíz si no tiene handlers (setup_logging lo sustituye)"""
+    with _setup_lock:
+        root = logging.getLogger()
+        if root.handlers:
+            return
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(console)
+        root.setLevel(LOG_LEVEL)
+
+def get_logger(name):
+    """
+    Logger del módulo. El pipeline completo lo instala el punto de entrada con
+    setup_logging(); mientras tanto, los mensajes salen por una consola mínima.
+    """
+    if not logging.getLogger().handlers:
+        _install_default_handler()
+    return logging.getLogger(name)
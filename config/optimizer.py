@@ -1,10 +1,37 @@
 # config/optimizer.py
 import json
 import os
+import threading
+from config.history import ParamHistory
+from config.logs import get_logger
+
+logger = get_logger("StrategyOptimizer")
+
+# Regímenes de volatilidad: percentil del ATR actual dentro de la ventana de velas
+REGIMES = ("low", "normal", "high")
+REGIME_EDGES = (0.25, 0.75)  # < 0.25 -> low, > 0.75 -> high
+ANY = "*"  # Comodín de símbolo o régimen en las tablas de parámetros
+
+def classify_regime(atr_percentile):
+    """Régimen de volatilidad para un percentil de ATR (0-1); None -> comodín"""
+    if atr_percentile is None:
+        return ANY
+    if atr_percentile < REGIME_EDGES[0]:
+        return "low"
+    if atr_percentile > REGIME_EDGES[1]:
+        return "high"
+    return "normal"
+
+def _entry_filename(symbol, regime):
+    safe = str(symbol).replace("/", "_").replace(":", "_").replace("*", "ALL")
+    return f"{safe}__{str(regime).replace('*', 'ALL')}.json"
 
 class StrategyOptimizer:
     def __init__(self):
         self.params_file = 'strategy_params.json'
+        # Una entrada por (símbolo, régimen) con solo los parámetros que cambian
+        self.entries_dir = 'strategy_params.d'
+        self._history = None
         self.default_params = {
             # RELAJADO para aprendizaje (generar más señales)
             "learning_mode": {
@@ -39,9 +66,64 @@ class StrategyOptimizer:
         }
         
         # Cargar o crear parámetros
+        self._lock = threading.Lock()
         self.current_mode = "learning_mode"
         self.current_params = self.load_params()
+        self.current_mode = self.current_params.get("mode", self.current_mode)
+
+        # Tablas por símbolo/régimen e índice de parámetros ya resueltos
+        self.entries = self.load_entries()
+        self._index = {}
     
+    def load_entries(self):
+        """Carga las entradas por símbolo/régimen de `entries_dir`"""
+        entries = {}
+        if os.path.isdir(self.entries_dir):
+            for name in sorted(os.listdir(self.entries_dir)):
+                if name.endswith(".json"):
+                    with open(os.path.join(self.entries_dir, name), 'r') as f:
+                        entry = json.load(f)
+                    entries[(entry["symbol"], entry["regime"])] = entry["params"]
+        return entries
+
+    def set_entry(self, symbol, regime, params):
+        """
+        Fija (o sustituye) los parámetros de un símbolo y régimen ("*" = cualquiera).
+        Solo se reescribe el fichero de esa entrada.
+        """
+        key = (symbol or ANY, regime or ANY)
+        os.makedirs(self.entries_dir, exist_ok=True)
+        path = os.path.join(self.entries_dir, _entry_filename(*key))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"symbol": key[0], "regime": key[1], "params": params}, f, indent=2)
+        os.replace(tmp_path, path)
+        self.history.record_entry(key[0], key[1], params)
+        with self._lock:
+            entries = dict(self.entries)
+            entries[key] = dict(params)
+            self.entries = entries
+            self._index = {}
+
+    def update_entry(self, symbol, regime, **changes):
+        """Modifica parámetros sueltos de una entrada conservando el resto"""
+        params = dict(self.entries.get((symbol or ANY, regime or ANY), {}))
+        params.update(changes)
+        self.set_entry(symbol, regime, params)
+
+    def remove_entry(self, symbol, regime):
+        """Elimina una entrada (vuelve a aplicarse la más general)"""
+        key = (symbol or ANY, regime or ANY)
+        path = os.path.join(self.entries_dir, _entry_filename(*key))
+        if os.path.exists(path):
+            os.remove(path)
+        self.history.record_entry(key[0], key[1], None)
+        with self._lock:
+            entries = dict(self.entries)
+            entries.pop(key, None)
+            self.entries = entries
+            self._index = {}
+
     def load_params(self):
         """Carga parámetros desde archivo o usa defaults"""
         if os.path.exists(self.params_file):
@@ -54,46 +136,118 @@ class StrategyOptimizer:
             self.save_params(params)
             return params
     
+    @property
+    def history(self):
+        """Historial append-only de parámetros (se abre al primer uso)"""
+        if self._history is None:
+            self._history = ParamHistory()
+        return self._history
+
+    def record_baseline(self):
+        """
+        Registra una vez los parámetros y entradas cargados si el historial aún
+        no los tiene (instalaciones anteriores al historial), para que
+        get_strategy_params_at() cubra también el periodo previo al primer cambio.
+
+        Returns:
+            bool: True si se escribió algo.
+        """
+        recorded = False
+        if not self.history.count("params"):
+            self.history.record_params(self.current_params)
+            recorded = True
+        if self.entries and not self.history.count("entry"):
+            for (symbol, regime), params in self.entries.items():
+                self.history.record_entry(symbol, regime, params)
+            recorded = True
+        if recorded:
+            logger.info(f"🗂️ Parámetros iniciales registrados en el historial ({self.current_mode})",
+                        extra={"event": "params_baseline", "mode": self.current_mode, "entries": len(self.entries)})
+        return recorded
+
     def save_params(self, params):
-        """Guarda parámetros en archivo"""
-        with open(self.params_file, 'w') as f:
+        """Guarda parámetros en archivo (escritura atómica) y los añade al historial"""
+        tmp_path = self.params_file + ".tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(params, f, indent=2)
+        os.replace(tmp_path, self.params_file)
+        self.history.record_params(params)
     
     def get_param(self, key):
         """Obtiene un parámetro específico"""
         return self.current_params.get(key, self.default_params[self.current_mode].get(key))
     
-    def analyze_and_optimize(self, total_trades, win_rate, avg_pnl):
+    def propose(self, total_trades, win_rate, avg_pnl):
         """
-        Analiza rendimiento y ajusta modo automáticamente
+        Calcula el siguiente snapshot de parámetros sin modificar el estado.
+        Es seguro llamarlo desde un hilo en segundo plano.
+
+        Returns:
+            dict: Parámetros completos (incluye "mode"), o None si aún no hay que ajustar.
         """
-        if total_trades < self.get_param("min_trades_for_analysis"):
-            return False  # No ajustar aún
-        
+        current = self.current_params
+        mode = current.get("mode", self.current_mode)
+        if total_trades < current.get("min_trades_for_analysis", self.default_params[mode]["min_trades_for_analysis"]):
+            return None  # No ajustar aún
+
         # Lógica de transición entre modos
-        if self.current_mode == "learning_mode" and total_trades >= 30:
+        if mode == "learning_mode" and total_trades >= 30:
             if win_rate > 55 and avg_pnl > 0:
-                self.current_mode = "moderate_mode"
+                mode = "moderate_mode"
             else:
                 # Mantener en learning pero ajustar parámetros
-                self.adjust_learning_params(win_rate, avg_pnl)
-        
-        elif self.current_mode == "moderate_mode" and total_trades >= 100:
+                return self.adjust_learning_params(win_rate, avg_pnl, apply=False)
+
+        elif mode == "moderate_mode" and total_trades >= 100:
             if win_rate > 60 and avg_pnl > 0.5:
-                self.current_mode = "conservative_mode"
-        
-        # Actualizar parámetros actuales
-        self.current_params = self.default_params[self.current_mode].copy()
-        self.current_params["mode"] = self.current_mode
-        self.save_params(self.current_params)
-        
-        print(f"🔄 Cambiado a modo: {self.current_mode}")
+                mode = "conservative_mode"
+
+        snapshot = self.default_params[mode].copy()
+        snapshot["mode"] = mode
+        return snapshot
+
+    def apply_snapshot(self, snapshot, persist=True):
+        """
+        Sustituye los parámetros actuales por un snapshot completo en una sola
+        asignación (llamar entre ciclos) y lo persiste.
+
+        Args:
+            persist (bool): False si otro proceso ya lo guardó (shards del runner).
+
+        Returns:
+            bool: True si los parámetros cambiaron.
+        """
+        if not snapshot:
+            return False
+        with self._lock:
+            if snapshot == self.current_params:
+                return False
+            previous_mode = self.current_mode
+            self.current_params = dict(snapshot)
+            self.current_mode = snapshot.get("mode", previous_mode)
+            self._index = {}
+            if persist:
+                self.save_params(self.current_params)
+
+        if self.current_mode != previous_mode:
+            logger.info(f"🔄 Cambiado a modo: {self.current_mode}",
+                        extra={"event": "mode_changed", "mode": self.current_mode, "previous": previous_mode})
+        return True
+
+    def analyze_and_optimize(self, total_trades, win_rate, avg_pnl):
+        """
+        Analiza rendimiento y ajusta modo automáticamente
+        """
+        snapshot = self.propose(total_trades, win_rate, avg_pnl)
+        if snapshot is None:
+            return False  # No ajustar aún
+        self.apply_snapshot(snapshot)
         return True
     
-    def adjust_learning_params(self, win_rate, avg_pnl):
-        """Ajusta parámetros específicos basado en rendimiento"""
-        params = self.current_params.copy()
-        
+    @staticmethod
+    def _adjusted(params, win_rate, avg_pnl):
+        """Copia de `params` con los umbrales ajustados al rendimiento observado"""
+        params = dict(params)
         if win_rate < 40:
             # Si win rate bajo, hacer más conservador
             params["rsi_long_threshold"] = max(51, params.get("rsi_long_threshold", 50))
@@ -106,22 +260,124 @@ class StrategyOptimizer:
         if avg_pnl < -0.1:
             # Si pérdidas grandes, reducir riesgo
             params["volume_multiplier"] = min(1.15, params.get("volume_multiplier", 1.1) + 0.05)
-        
-        self.current_params = params
-        self.save_params(params)
-        print(f"📊 Parámetros ajustados: Win Rate={win_rate}%, PnL={avg_pnl}%")
+        return params
+
+    def adjust_learning_params(self, win_rate, avg_pnl, apply=True):
+        """
+        Ajusta parámetros específicos basado en rendimiento.
+        Con apply=False solo devuelve el snapshot propuesto.
+        """
+        params = self.current_params.copy()
+        params["mode"] = params.get("mode", self.current_mode)
+        params = self._adjusted(params, win_rate, avg_pnl)
+
+        if apply:
+            self.apply_snapshot(params)
+            logger.info(f"📊 Parámetros ajustados: Win Rate={win_rate}%, PnL={avg_pnl}%",
+                        extra={"event": "params_adjusted", "win_rate": win_rate, "avg_pnl": avg_pnl})
+        return params
     
-    def get_strategy_params(self):
-        """Devuelve todos los parámetros para la estrategia"""
+    def _merged(self, symbol, regime, base=None, entries=None):
+        """Parámetros crudos combinados: base < ("*", régimen) < (símbolo, "*") < (símbolo, régimen)"""
+        params = dict(self.current_params if base is None else base)
+        entries = self.entries if entries is None else entries
+        for key in ((ANY, ANY), (ANY, regime), (symbol, ANY), (symbol, regime)):
+            params.update(entries.get(key, {}))
+        return params
+
+    def _resolve(self, symbol, regime, base=None, entries=None):
+        """Combina base < ("*", régimen) < (símbolo, "*") < (símbolo, régimen)"""
+        params = self._merged(symbol, regime, base, entries)
+        mode = params.get("mode", self.current_mode)
+        defaults = self.default_params[mode]
+
+        def get(key):
+            return params.get(key, defaults.get(key))
+
         return {
-            "rsi_long": self.get_param("rsi_long_threshold"),
-            "rsi_short": self.get_param("rsi_short_threshold"),
-            "volume_multiplier": self.get_param("volume_multiplier"),
-            "atr_min_percentile": self.get_param("atr_min_percentile"),
-            "atr_max_percentile": self.get_param("atr_max_percentile"),
-            "trade_all_hours": self.get_param("trade_all_hours"),
-            "mode": self.current_mode
+            "rsi_long": get("rsi_long_threshold"),
+            "rsi_short": get("rsi_short_threshold"),
+            "volume_multiplier": get("volume_multiplier"),
+            "atr_min_percentile": get("atr_min_percentile"),
+            "atr_max_percentile": get("atr_max_percentile"),
+            "trade_all_hours": get("trade_all_hours"),
+            "mode": mode
         }
 
+    def propose_entries(self, groups):
+        """
+        Ajustes por (símbolo, régimen) con el rendimiento de cada grupo, sin
+        modificar el estado. Solo se ajustan los grupos con al menos
+        `min_trades_for_analysis` trades cerrados (el umbral del modo actual;
+        los trades cuentan sea cual sea el modo en que se abrieron).
+
+        Args:
+            groups (dict): (símbolo, régimen) -> (trades cerrados, win rate %, PnL medio %).
+
+        Returns:
+            dict: (símbolo, régimen) -> parámetros completos de la entrada, solo
+                  para las entradas que cambiarían.
+        """
+        minimum = self.get_param("min_trades_for_analysis")
+        proposals = {}
+        for (symbol, regime), (total, win_rate, avg_pnl) in groups.items():
+            if total < minimum:
+                continue
+            key = (symbol or ANY, regime or ANY)
+            merged = self._merged(*key)
+            changes = {k: v for k, v in self._adjusted(merged, win_rate, avg_pnl).items() if merged.get(k) != v}
+            if changes:
+                proposals[key] = dict(self.entries.get(key, {}), **changes)
+        return proposals
+
+    def apply_entries(self, entries, persist=True):
+        """
+        Aplica entradas propuestas con propose_entries (llamar entre ciclos).
+
+        Args:
+            persist (bool): False si otro proceso ya las guardó (shards del runner).
+
+        Returns:
+            list: Claves (símbolo, régimen) que cambiaron.
+        """
+        changed = [key for key, params in (entries or {}).items() if self.entries.get(key) != params]
+        if not changed:
+            return []
+        if persist:
+            for key in changed:
+                self.update_entry(*key, **entries[key])
+        else:
+            with self._lock:
+                current = dict(self.entries)
+                current.update((key, dict(entries[key])) for key in changed)
+                self.entries = current
+                self._index = {}
+        return changed
+
+    def get_strategy_params(self, symbol=None, regime=None):
+        """
+        Devuelve todos los parámetros para la estrategia, para un símbolo y
+        régimen de volatilidad concretos si se indican. Tras la primera
+        consulta de cada clave es una sola búsqueda en el índice (no modificar
+        el dict devuelto).
+        """
+        # Una sola lectura del índice: un cambio concurrente lo sustituye entero
+        index = self._index
+        key = (symbol or ANY, regime or ANY)
+        params = index.get(key)
+        if params is None:
+            params = index[key] = self._resolve(*key)
+        return params
+
+    def get_strategy_params_at(self, ts, symbol=None, regime=None):
+        """
+        Parámetros que estaban en vigor en el instante `ts` según el historial
+        (para reproducir en un backtest lo que usaba el bot en vivo).
+        """
+        base = self.history.params_at(ts)
+        if base is None:
+            return None
+        return self._resolve(symbol or ANY, regime or ANY, base=base, entries=self.history.entries_at(ts))
+
 # Instancia global
 optimizer = StrategyOptimizer()
\ No newline at end of file
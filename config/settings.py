@@ -4,3 +4,7 @@ from dotenv import load_dotenv
 load_dotenv("config/secrets.env")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Credenciales de BingX (solo necesarias para enviar órdenes reales)
+BINGX_API_KEY = os.getenv("BINGX_API_KEY")
+BINGX_SECRET = os.getenv("BINGX_SECRET")
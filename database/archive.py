@@ -0,0 +1,120 @@
+# database/archive.py
+"""
+Archivo en frío de trades cerrados.
+
+Los trades cerrados hace más de N días se mueven de la tabla 'trades' a
+ficheros Parquet particionados por mes de cierre y mercado:
+
+    archive/trades/month=2025-01/market=BTC_USDT_USDT/part-<id_min>-<id_max>.parquet
+
+Los agregados de rendimiento (performance_aggregates) se quedan en la base
+de datos, así que la tabla viva y sus índices solo contienen lo reciente.
+"""
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import select, delete
+from database.db import engine
+from database.models import Trade, Decision
+
+ARCHIVE_DIR = "archive/trades"
+ARCHIVE_COLUMNS = [c.name for c in Trade.__table__.columns] + ["vol_mean"]
+
+def _market_key(symbol):
+    """Nombre de partición seguro para el símbolo ('BTC/USDT:USDT' -> 'BTC_USDT_USDT')"""
+    return str(symbol).replace("/", "_").replace(":", "_")
+
+def _write_partitions(df, archive_dir):
+    """Escribe un lote de trades en sus particiones mes/mercado"""
+    df = df.copy()
+    df["_month"] = pd.to_datetime(df["exit_time"]).dt.strftime("%Y-%m")
+    df["_market"] = df["symbol"].map(_market_key)
+
+    for (month, market), part in df.groupby(["_month", "_market"]):
+        folder = os.path.join(archive_dir, f"month={month}", f"market={market}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{part['id'].min()}-{part['id'].max()}.parquet")
+        tmp_path = path + ".tmp"
+        part[ARCHIVE_COLUMNS].to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+def archive_closed_trades(days=30, archive_dir=ARCHIVE_DIR, batch_size=10000):
+    """
+    Mueve a Parquet los trades cerrados con exit_time anterior a `days` días.
+    Trabaja por lotes: cada lote se escribe en disco antes de borrarse de la
+    tabla, así que un fallo a mitad nunca pierde datos (como mucho duplica
+    filas, que load_archived_trades descarta por id).
+    Retorna el número de trades archivados.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    query = (
+        select(*Trade.__table__.columns, Decision.vol_mean)
+        .outerjoin(Decision, Decision.trade_id == Trade.id)
+        .where(Trade.exit_price != None, Trade.exit_time != None, Trade.exit_time < cutoff)
+        .order_by(Trade.id)
+        .limit(batch_size)
+    )
+
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            df = pd.read_sql(query, conn)
+            if df.empty:
+                break
+            df = df.drop_duplicates("id")
+            _write_partitions(df, archive_dir)
+            conn.execute(delete(Trade).where(Trade.id.in_(df["id"].tolist())))
+        archived += len(df)
+        print(f"📦 Archivados {archived} trades...")
+
+    return archived
+
+def load_archived_trades(columns=None, since=None, until=None, archive_dir=ARCHIVE_DIR, exclude_ids=None):
+    """
+    Lee los trades archivados como DataFrame (mismas columnas que 'trades').
+    `since`/`until` filtran por exit_time y podan meses completos sin leerlos.
+    Siempre lee `id` para descartar duplicados (un archivado interrumpido
+    puede escribir un lote dos veces) aunque no se pida en `columns`.
+    `exclude_ids` descarta trades que siguen en la tabla viva.
+    """
+    if not os.path.isdir(archive_dir):
+        return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+
+    read_columns = columns
+    if columns is not None:
+        extra = ["id"]
+        if since is not None or until is not None:
+            extra.append("exit_time")
+        read_columns = list(columns) + [c for c in extra if c not in columns]
+
+    frames = []
+    for month_dir in sorted(os.listdir(archive_dir)):
+        if not month_dir.startswith("month="):
+            continue
+        month = month_dir.split("=", 1)[1]
+        if since is not None and month < since.strftime("%Y-%m"):
+            continue
+        if until is not None and month > until.strftime("%Y-%m"):
+            continue
+        for root, _, files in os.walk(os.path.join(archive_dir, month_dir)):
+            for name in files:
+                if name.endswith(".parquet"):
+                    frames.append(pd.read_parquet(os.path.join(root, name), columns=read_columns))
+
+    if not frames:
+        return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+
+    df = pd.concat(frames, ignore_index=True).drop_duplicates("id")
+    if exclude_ids is not None:
+        df = df[~df["id"].isin(list(exclude_ids))]
+    if since is not None or until is not None:
+        exit_time = pd.to_datetime(df["exit_time"])
+        mask = pd.Series(True, index=df.index)
+        if since is not None:
+            mask &= exit_time > since
+        if until is not None:
+            mask &= exit_time <= until
+        df = df[mask]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
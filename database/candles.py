@@ -0,0 +1,111 @@
+# database/candles.py
+"""
+Archivo local de velas cerradas.
+
+El runner añade cada ciclo las velas de 1m ya cerradas que aún no había
+guardado; se acumulan en memoria y se vuelcan por lotes a Parquet:
+
+    archive/candles/market=BTC_USDT_USDT/date=2025-01-31/part-<ts_min>-<ts_max>.parquet
+
+Sirve para etiquetar decisiones a posteriori (brain/labeler.py) sin volver a
+descargar velas del exchange.
+"""
+import atexit
+import os
+import threading
+
+import pandas as pd
+
+from database.archive import _market_key
+
+CANDLES_DIR = "archive/candles"
+CANDLE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+class CandleArchive:
+    """
+    Buffer de velas cerradas por símbolo con volcado por lotes a Parquet.
+
+    Args:
+        base_dir (str): Directorio raíz del archivo.
+        flush_rows (int): Velas en memoria (todas las series) que disparan un volcado.
+    """
+
+    def __init__(self, base_dir=CANDLES_DIR, flush_rows=60):
+        self.base_dir = base_dir
+        self.flush_rows = flush_rows
+        self._buffers = {}   # símbolo -> lista de velas
+        self._last_ts = {}   # símbolo -> timestamp de la última vela guardada
+        self._pending = 0
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def append(self, symbol, ohlcv):
+        """Añade las velas (ya cerradas) posteriores a la última guardada del símbolo"""
+        if not ohlcv:
+            return 0
+        with self._lock:
+            last = self._last_ts.get(symbol)
+            new = [list(c[:6]) for c in ohlcv if last is None or c[0] > last]
+            if not new:
+                return 0
+            self._buffers.setdefault(symbol, []).extend(new)
+            self._last_ts[symbol] = new[-1][0]
+            self._pending += len(new)
+            due = self._pending >= self.flush_rows
+        if due:
+            self.flush()
+        return len(new)
+
+    def flush(self):
+        """Escribe las velas en memoria en sus particiones mercado/día"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            self._pending = 0
+
+        written = 0
+        for symbol, rows in buffers.items():
+            df = pd.DataFrame(rows, columns=CANDLE_COLUMNS)
+            df["timestamp"] = df["timestamp"].astype("int64")
+            days = pd.to_datetime(df["timestamp"], unit="ms").dt.strftime("%Y-%m-%d")
+            for day, part in df.groupby(days):
+                folder = os.path.join(self.base_dir, f"market={_market_key(symbol)}", f"date={day}")
+                os.makedirs(folder, exist_ok=True)
+                path = os.path.join(folder, f"part-{part['timestamp'].min()}-{part['timestamp'].max()}.parquet")
+                tmp_path = path + ".tmp"
+                part.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            written += len(df)
+        return written
+
+def load_candles(symbol, since=None, until=None, base_dir=CANDLES_DIR):
+    """
+    Velas archivadas de un símbolo, ordenadas y sin duplicados.
+    `since`/`until` (datetime UTC) podan días completos y filtran por apertura.
+    """
+    folder = os.path.join(base_dir, f"market={_market_key(symbol)}")
+    if not os.path.isdir(folder):
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+
+    frames = []
+    for day_dir in sorted(os.listdir(folder)):
+        if not day_dir.startswith("date="):
+            continue
+        day = day_dir.split("=", 1)[1]
+        if since is not None and day < since.strftime("%Y-%m-%d"):
+            continue
+        if until is not None and day > until.strftime("%Y-%m-%d"):
+            continue
+        for name in sorted(os.listdir(os.path.join(folder, day_dir))):
+            if name.endswith(".parquet"):
+                frames.append(pd.read_parquet(os.path.join(folder, day_dir, name)))
+
+    if not frames:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates("timestamp", keep="last").sort_values("timestamp")
+    if since is not None:
+        df = df[df["timestamp"] >= int(pd.Timestamp(since).value // 1_000_000)]
+    if until is not None:
+        df = df[df["timestamp"] <= int(pd.Timestamp(until).value // 1_000_000)]
+    return df.reset_index(drop=True)
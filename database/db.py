@@ -1,8 +1,15 @@
 # database/db.py
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
+# Pool de conexiones y caché de sentencias (ajustables por entorno)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+
 # Configuración flexible para diferentes entornos
 def get_database_url():
     """Obtiene la URL de conexión a la base de datos según el entorno"""
@@ -36,4 +43,61 @@ def get_session():
         return session
     except Exception as e:
         session.close()
-        raise e
\ No newline at end of file
+        raise e
+
+# Motor asíncrono (opcional): se crea solo al primer uso para que asyncpg /
+# aiosqlite no sean necesarios si el bot funciona solo en modo síncrono.
+_async_engine = None
+AsyncSessionLocal = None
+
+def get_async_database_url(url=None):
+    """Equivalente asíncrono de get_database_url(): asyncpg para Postgres, aiosqlite para SQLite"""
+    url = make_url(url or DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+def get_async_engine():
+    """Crea (una sola vez) el motor asíncrono con pool y caché de sentencias explícitos"""
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is not None:
+        return _async_engine
+
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    url = get_async_database_url()
+    options = {
+        "echo": False,
+        "pool_pre_ping": True,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "query_cache_size": DB_STATEMENT_CACHE_SIZE * 2,  # Caché de SQL compilado de SQLAlchemy
+    }
+    if url.get_backend_name() == "postgresql":
+        # Caché de sentencias preparadas: la del dialecto y la propia de asyncpg
+        url = url.update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+        options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    elif url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"cached_statements": DB_STATEMENT_CACHE_SIZE}
+
+    _async_engine = create_async_engine(url, **options)
+    # expire_on_commit=False: los objetos siguen legibles tras el commit sin otra consulta
+    AsyncSessionLocal = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+def get_async_session():
+    """Obtiene una nueva sesión asíncrona (usar con `async with`)"""
+    get_async_engine()
+    return AsyncSessionLocal()
+
+async def dispose_async_engine():
+    """Cierra las conexiones del pool asíncrono (al apagar el bot)"""
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        AsyncSessionLocal = None
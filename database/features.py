@@ -0,0 +1,166 @@
+# database/features.py
+"""
+Almacén columnar de características por decisión.
+
+Cada decisión del runner guarda el vector completo de indicadores de la vela
+y el contexto de las últimas N velas (normalizado respecto al cierre actual y
+al volumen medio), con el id de la decisión como clave. Las filas se acumulan
+en memoria y se vuelcan por lotes a Parquet particionado por día:
+
+    features/decisions/date=2025-01-31/part-<id_min>-<id_max>.parquet
+
+El aprendizaje y el análisis contrafactual leen matrices densas con
+`load_features` / `feature_matrix` sin pasar por el ORM ni volver a
+descargar velas.
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+FEATURES_DIR = "features/decisions"
+CONTEXT_BARS = 20
+INDICATOR_COLUMNS = ["open", "high", "low", "close", "volume", "ema50", "ema200", "rsi", "atr", "vol_mean"]
+
+def context_columns(context_bars=CONTEXT_BARS):
+    """Nombres de las columnas de contexto: ctx_<campo>_<k> para k = 1..N velas atrás"""
+    return [f"ctx_{field}_{k}" for field in ("close", "high", "low", "volume") for k in range(1, context_bars + 1)]
+
+class FeatureStore:
+    """
+    Buffer de características con volcado por lotes a Parquet.
+
+    Args:
+        base_dir (str): Directorio raíz del almacén.
+        context_bars (int): Velas previas que se guardan como contexto.
+        flush_rows (int): Filas en memoria que disparan un volcado.
+        flush_seconds (float): Antigüedad máxima del buffer antes de volcarlo.
+    """
+
+    def __init__(self, base_dir=FEATURES_DIR, context_bars=CONTEXT_BARS, flush_rows=240, flush_seconds=900):
+        self.base_dir = base_dir
+        self.context_bars = context_bars
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._rows = []
+        self._first_row_at = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def record(self, decision_id, symbol, side, mode, df, decision_time=None):
+        """
+        Añade al buffer las características de la última vela de `df`
+        (salida de calculate_indicators). Vuelca a disco si toca.
+        """
+        if decision_id is None or df is None or df.empty:
+            return
+        k = self.context_bars
+        tail = df[["close", "high", "low", "volume"]].to_numpy(dtype=float)[-(k + 1):]
+        last = df.iloc[-1]
+        close = float(last["close"]) or np.nan
+        vol_mean = float(last["vol_mean"]) or np.nan
+
+        # Contexto: velas 1..k atrás (la fila 0 es la más reciente del contexto)
+        previous = tail[:-1][::-1]
+        context = np.full((4, k), np.nan)
+        n = len(previous)
+        context[0, :n] = previous[:, 0] / close - 1
+        context[1, :n] = previous[:, 1] / close - 1
+        context[2, :n] = previous[:, 2] / close - 1
+        context[3, :n] = previous[:, 3] / vol_mean
+
+        row = {
+            "decision_id": int(decision_id),
+            "decision_time": decision_time or datetime.utcnow(),
+            "bar_time": int(last["timestamp"]) if "timestamp" in last.index else None,
+            "symbol": symbol,
+            "side": side,
+            "mode": mode,
+        }
+        for column in INDICATOR_COLUMNS:
+            row[column] = float(last[column]) if column in last.index else np.nan
+        row.update(zip(context_columns(k), context.ravel().tolist()))
+
+        with self._lock:
+            if not self._rows:
+                self._first_row_at = time.monotonic()
+            self._rows.append(row)
+            due = (
+                len(self._rows) >= self.flush_rows
+                or time.monotonic() - self._first_row_at >= self.flush_seconds
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Escribe el buffer en sus particiones diarias (escritura atómica)"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+
+        df = pd.DataFrame(rows)
+        df["decision_time"] = pd.to_datetime(df["decision_time"])
+        float_columns = INDICATOR_COLUMNS + context_columns(self.context_bars)
+        df[float_columns] = df[float_columns].astype("float32")
+
+        for day, part in df.groupby(df["decision_time"].dt.strftime("%Y-%m-%d")):
+            folder = os.path.join(self.base_dir, f"date={day}")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"part-{part['decision_id'].min()}-{part['decision_id'].max()}.parquet")
+            tmp_path = path + ".tmp"
+            part.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        return len(df)
+
+def load_features(columns=None, since=None, until=None, base_dir=FEATURES_DIR):
+    """
+    Lee el almacén como DataFrame (una fila por decision_id).
+    `since`/`until` filtran por decision_time y podan días completos sin leerlos.
+    """
+    if not os.path.isdir(base_dir):
+        return pd.DataFrame(columns=columns)
+
+    read_columns = columns
+    if columns is not None:
+        extra = [c for c in ("decision_id", "decision_time") if c not in columns]
+        read_columns = list(columns) + extra
+
+    frames = []
+    for day_dir in sorted(os.listdir(base_dir)):
+        if not day_dir.startswith("date="):
+            continue
+        day = day_dir.split("=", 1)[1]
+        if since is not None and day < since.strftime("%Y-%m-%d"):
+            continue
+        if until is not None and day > until.strftime("%Y-%m-%d"):
+            continue
+        folder = os.path.join(base_dir, day_dir)
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".parquet"):
+                frames.append(pd.read_parquet(os.path.join(folder, name), columns=read_columns))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates("decision_id", keep="last")
+    if since is not None:
+        df = df[df["decision_time"] >= pd.Timestamp(since)]
+    if until is not None:
+        df = df[df["decision_time"] <= pd.Timestamp(until)]
+    df = df.sort_values("decision_id").reset_index(drop=True)
+    return df[columns] if columns is not None else df
+
+def feature_matrix(columns=None, since=None, until=None, base_dir=FEATURES_DIR):
+    """
+    Matriz densa float32 (decisiones x características) y sus decision_id.
+    Por defecto: indicadores + contexto.
+    """
+    columns = columns or INDICATOR_COLUMNS + context_columns()
+    df = load_features(["decision_id"] + list(columns), since, until, base_dir)
+    return df["decision_id"].to_numpy(dtype=np.int64), df[list(columns)].to_numpy(dtype=np.float32)
@@ -0,0 +1,132 @@
+# database/migrations.py
+"""
+Migraciones de esquema versionadas. Funcionan igual sobre PostgreSQL
+y sobre el fallback SQLite.
+
+Para añadir una migración: escribir una función `_mNNN_descripcion(conn)`
+y registrarla al final de MIGRATIONS con el siguiente número de versión.
+Cada migración debe ser idempotente: en una base recién creada con
+`create_all` el cambio puede existir ya y solo se registra la versión.
+"""
+from datetime import datetime
+from sqlalchemy import inspect, select, text
+from database.db import engine
+from database.models import Trade, Decision, SchemaMigration
+
+# Clave arbitraria para serializar migraciones concurrentes en Postgres
+_PG_LOCK_KEY = 782631
+
+def _add_missing_columns(conn, table, column_names):
+    """Añade columnas del modelo que todavía no existen en la tabla física"""
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        col_type = table.c[name].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {col_type}"))
+
+def _m001_trade_exit_columns(conn):
+    _add_missing_columns(conn, Trade.__table__, ["exit_reason", "stop_loss", "take_profit"])
+
+def _m002_split_decisions(conn):
+    # 1. Mover señales sin posición (NO_TRADE) al log de decisiones
+    conn.execute(text("""
+        INSERT INTO decisions (decision_time, symbol, side, price, rsi, ema50, ema200, atr, volume)
+        SELECT trade_time, symbol, side, entry_price, rsi, ema50, ema200, atr, volume
+        FROM trades
+        WHERE side IS NULL OR side NOT IN ('LONG', 'SHORT')
+    """))
+    conn.execute(text("""
+        DELETE FROM trades
+        WHERE side IS NULL OR side NOT IN ('LONG', 'SHORT')
+    """))
+
+    # 2. Registrar las entradas reales como decisiones enlazadas
+    conn.execute(text("""
+        INSERT INTO decisions (decision_time, symbol, side, price, rsi, ema50, ema200, atr, volume, trade_id)
+        SELECT t.trade_time, t.symbol, t.side, t.entry_price, t.rsi, t.ema50, t.ema200, t.atr, t.volume, t.id
+        FROM trades t
+        WHERE NOT EXISTS (SELECT 1 FROM decisions d WHERE d.trade_id = t.id)
+    """))
+
+def _create_indexes(conn, table, names):
+    """Crea (si no existen) los índices del modelo con esos nombres"""
+    for index in table.indexes:
+        if index.name in names:
+            index.create(bind=conn, checkfirst=True)
+
+def _m003_trade_indexes(conn):
+    _create_indexes(conn, Trade.__table__, {"ix_trades_open", "ix_trades_closed", "ix_trades_trade_time"})
+
+def _m004_backfill_performance_aggregates(conn):
+    from brain.stats import rebuild_aggregates
+    rebuild_aggregates(conn)
+
+def _m005_trade_exit_time(conn):
+    _add_missing_columns(conn, Trade.__table__, ["exit_time"])
+    # Para el histórico sin hora de cierre usamos la de entrada como aproximación
+    conn.execute(text("""
+        UPDATE trades SET exit_time = trade_time
+        WHERE exit_price IS NOT NULL AND exit_time IS NULL
+    """))
+    _create_indexes(conn, Trade.__table__, {"ix_trades_exit_time"})
+
+def _m006_decision_regime(conn):
+    _add_missing_columns(conn, Decision.__table__, ["regime"])
+
+MIGRATIONS = [
+    (1, "Columnas exit_reason, stop_loss y take_profit en trades", _m001_trade_exit_columns),
+    (2, "Separar señales NO_TRADE de trades hacia decisions", _m002_split_decisions),
+    (3, "Índices parciales y de cobertura en trades", _m003_trade_indexes),
+    (4, "Backfill de agregados de rendimiento", _m004_backfill_performance_aggregates),
+    (5, "Columna exit_time e índice de cierres en trades", _m005_trade_exit_time),
+    (6, "Columna regime en decisions", _m006_decision_regime),
+]
+
+def get_applied_versions(conn):
+    """Devuelve el conjunto de versiones ya aplicadas"""
+    return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+def run_migrations(target=None):
+    """
+    Aplica en orden las migraciones pendientes (hasta `target` si se indica).
+    Cada migración corre en su propia transacción junto con su registro.
+    Retorna la lista de versiones aplicadas en esta llamada.
+    """
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        pending = get_applied_versions(conn)
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version in pending:
+            continue
+
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Otro proceso puede estar migrando: esperamos y revisamos de nuevo
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+                if version in get_applied_versions(conn):
+                    continue
+
+            migrate(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow(),
+            ))
+
+        applied.append(version)
+        print(f"✅ Migración {version:03d} aplicada: {description}")
+
+    return applied
+
+def migration_status():
+    """Lista (versión, descripción, aplicada) de todas las migraciones conocidas"""
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = get_applied_versions(conn)
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
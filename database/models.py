@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index, text
 from datetime import datetime
 from database.db import Base, engine
 
@@ -6,6 +6,7 @@ class Trade(Base):
     """
     Modelo que representa la tabla 'trades' en la base de datos.
     Esta clase define la estructura de la memoria del bot.
+    Solo guarda posiciones reales (LONG/SHORT); las señales van a 'decisions'.
     """
     __tablename__ = "trades"
 
@@ -24,9 +25,93 @@ class Trade(Base):
     stop_loss = Column(Float, nullable=True)   # Nueva columna: nivel de SL
     take_profit = Column(Float, nullable=True) # Nueva columna: nivel de TP
     trade_time = Column(DateTime, default=datetime.utcnow)
+    exit_time = Column(DateTime, nullable=True)  # Momento del cierre (marca de agua del análisis)
+
+    __table_args__ = (
+        # Posiciones abiertas (consulta del runner cada ciclo): índice parcial,
+        # su tamaño depende solo de las posiciones abiertas, no del histórico.
+        Index(
+            "ix_trades_open", "symbol", "side",
+            postgresql_where=text("exit_price IS NULL"),
+            sqlite_where=text("exit_price IS NULL"),
+        ),
+        # Trades cerrados (stats y aprendizaje): parcial y cubriendo en Postgres
+        Index(
+            "ix_trades_closed", "side", "trade_time",
+            postgresql_include=["pnl", "exit_reason"],
+            postgresql_where=text("exit_price IS NOT NULL"),
+            sqlite_where=text("exit_price IS NOT NULL"),
+        ),
+        Index("ix_trades_trade_time", "trade_time"),
+        # Lectura incremental de cierres recientes (brain/learning.py)
+        Index(
+            "ix_trades_exit_time", "exit_time",
+            postgresql_where=text("exit_time IS NOT NULL"),
+            sqlite_where=text("exit_time IS NOT NULL"),
+        ),
+    )
+
+class Decision(Base):
+    """
+    Registro append-only de cada decisión del bot (LONG, SHORT o NO_TRADE)
+    junto con la foto de indicadores del momento.
+    Nunca se actualiza: solo se insertan filas nuevas.
+    """
+    __tablename__ = "decisions"
+
+    id = Column(Integer, primary_key=True)
+    decision_time = Column(DateTime, default=datetime.utcnow, index=True)
+    symbol = Column(String(20))
+    side = Column(String(10))
+    mode = Column(String(20), nullable=True)   # ACTIVO / MONITOREO
+    price = Column(Float)
+    rsi = Column(Float)
+    ema50 = Column(Float)
+    ema200 = Column(Float)
+    atr = Column(Float)
+    volume = Column(Float)
+    vol_mean = Column(Float, nullable=True)
+    trade_id = Column(Integer, nullable=True)  # Trade abierto por esta decisión (si hubo)
+    regime = Column(String(10), nullable=True)  # Régimen de volatilidad (low/normal/high) de la vela
+
+class PerformanceAggregate(Base):
+    """
+    Agregados de rendimiento acumulados (ver brain/stats.py).
+    Se actualizan al abrir/cerrar cada trade para que el resumen sea O(1).
+    - scope: 'ALL', 'SIDE' o 'SYMBOL'; key: '*', 'LONG', 'BTC/USDT:USDT'...
+    - exit_reason: '' para la fila total; si no, histograma por motivo de cierre.
+    """
+    __tablename__ = "performance_aggregates"
+
+    scope = Column(String(10), primary_key=True)
+    key = Column(String(30), primary_key=True)
+    exit_reason = Column(String(50), primary_key=True, default="")
+    signals = Column(Integer, default=0)       # Decisiones registradas con este lado
+    opened = Column(Integer, default=0)
+    closed = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    losses = Column(Integer, default=0)
+    pnl_sum = Column(Float, default=0.0)
+    gross_profit = Column(Float, default=0.0)
+    gross_loss = Column(Float, default=0.0)    # Valor absoluto de las pérdidas
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaMigration(Base):
+    """
+    Versiones de esquema ya aplicadas (ver database/migrations.py).
+    """
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200))
+    applied_at = Column(DateTime, default=datetime.utcnow)
 
 def init_db():
     """
-    Crea todas las tablas definidas en los modelos si no existen.
+    Crea todas las tablas definidas en los modelos si no existen
+    y aplica las migraciones de esquema pendientes.
     """
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+
+    from database.migrations import run_migrations
+    run_migrations()
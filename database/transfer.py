@@ -0,0 +1,195 @@
+# database/transfer.py
+"""
+Exportación / importación masiva de tablas del bot en CSV.
+
+- PostgreSQL: COPY ... TO STDOUT / FROM STDIN (el servidor hace el trabajo).
+- SQLite: lectura en streaming con fetchmany y escritura con executemany.
+
+La memoria usada es constante (un bloque de `chunk_size` filas como máximo),
+así que mover millones de filas es cuestión de segundos. Los ficheros
+terminados en .gz se comprimen / descomprimen al vuelo.
+"""
+import csv
+import gzip
+import time
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.engine import make_url
+from database.db import DATABASE_URL, Base
+import database.models  # noqa: F401  (registra los modelos en Base)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+class _Progress:
+    """Informa por consola del avance como máximo una vez por segundo"""
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.started = time.monotonic()
+        self.last_report = self.started
+
+    def add(self, rows):
+        self.rows += rows
+        now = time.monotonic()
+        if now - self.last_report >= 1.0:
+            self.last_report = now
+            self._print(now)
+
+    def done(self):
+        self._print(time.monotonic())
+        return self.rows
+
+    def _print(self, now):
+        elapsed = max(now - self.started, 1e-9)
+        print(f"{self.label} {self.rows} filas ({self.rows / elapsed:,.0f} filas/s, {elapsed:.1f}s)")
+
+class _CountingWriter:
+    """Envuelve el fichero de salida de COPY y cuenta las filas escritas"""
+
+    def __init__(self, f, progress):
+        self.f = f
+        self.progress = progress
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        self.progress.add(data.count("\n"))
+        return self.f.write(data)
+
+class _CountingReader:
+    """Envuelve el fichero de entrada de COPY y cuenta las filas leídas"""
+
+    def __init__(self, f, progress):
+        self.f = f
+        self.progress = progress
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.progress.add(data.count("\n"))
+        return data
+
+    def readline(self, size=-1):
+        data = self.f.readline(size)
+        self.progress.add(data.count("\n"))
+        return data
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", newline="")
+    return open(path, mode, newline="")
+
+def _get_table(table_name):
+    table = Base.metadata.tables.get(table_name)
+    if table is None:
+        raise ValueError(f"Tabla desconocida: {table_name}")
+    return table
+
+def export_table(path, table_name="trades", url=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Vuelca la tabla completa a CSV (con cabecera). Retorna el número de filas"""
+    table = _get_table(table_name)
+    columns = [c.name for c in table.columns]
+    engine = create_engine(url or DATABASE_URL)
+    progress = _Progress("📤 Exportadas")
+
+    try:
+        with _open(path, "w") as f:
+            if engine.dialect.name == "postgresql":
+                raw = engine.raw_connection()
+                try:
+                    with raw.cursor() as cursor:
+                        cursor.copy_expert(
+                            f"COPY {table.name} ({', '.join(columns)}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                            _CountingWriter(f, progress),
+                        )
+                finally:
+                    raw.close()
+                progress.rows -= 1  # La cabecera no es una fila de datos
+            else:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                with engine.connect() as conn:
+                    result = conn.execution_options(stream_results=True).execute(
+                        select(*table.columns).order_by(*table.primary_key.columns)
+                    )
+                    while True:
+                        rows = result.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        writer.writerows(rows)
+                        progress.add(len(rows))
+    finally:
+        engine.dispose()
+
+    return progress.done()
+
+def import_table(path, table_name="trades", url=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Carga un CSV exportado con export_table(). Las filas cuyo id ya existe
+    en el destino se ignoran, así que la importación se puede repetir.
+    Al importar 'trades' se recalculan los agregados de rendimiento del destino
+    (con el archivo en frío local solo si el destino es la base de datos del bot).
+    Retorna el número de filas leídas del fichero.
+    """
+    table = _get_table(table_name)
+    engine = create_engine(url or DATABASE_URL)
+    Base.metadata.create_all(bind=engine, tables=[table])
+    progress = _Progress("📥 Importadas")
+
+    try:
+        with _open(path, "r") as f:
+            header = next(csv.reader([f.readline()]))
+            unknown = set(header) - set(table.columns.keys())
+            if unknown:
+                raise ValueError(f"Columnas desconocidas en {path}: {sorted(unknown)}")
+            column_list = ", ".join(header)
+
+            if engine.dialect.name == "postgresql":
+                staging = f"{table.name}_import"
+                with engine.begin() as conn:
+                    conn.execute(text(f"CREATE TEMP TABLE {staging} (LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP"))
+                    cursor = conn.connection.cursor()
+                    cursor.copy_expert(
+                        f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                        _CountingReader(f, progress),
+                    )
+                    conn.execute(text(
+                        f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {staging} "
+                        f"ON CONFLICT DO NOTHING"
+                    ))
+                    # Que los nuevos inserts no choquen con los ids importados
+                    if "id" in header:
+                        conn.execute(text(
+                            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                            f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+                        ))
+            else:
+                placeholders = ", ".join("?" for _ in header)
+                sql = f"INSERT OR IGNORE INTO {table.name} ({column_list}) VALUES ({placeholders})"
+                raw = engine.raw_connection()
+                try:
+                    cursor = raw.cursor()
+                    reader = csv.reader(f)
+                    while True:
+                        batch = []
+                        for row in reader:
+                            batch.append([value if value != "" else None for value in row])
+                            if len(batch) >= chunk_size:
+                                break
+                        if not batch:
+                            break
+                        cursor.executemany(sql, batch)
+                        progress.add(len(batch))
+                    raw.commit()
+                finally:
+                    raw.close()
+        # Los agregados materializados deben reflejar los trades importados;
+        # el archivo en frío local solo cuenta si el destino es la BD del bot
+        if table.name == "trades":
+            from brain.stats import rebuild_aggregates
+            Base.metadata.create_all(bind=engine)
+            with engine.begin() as conn:
+                rebuild_aggregates(conn, include_archive=engine.url == make_url(DATABASE_URL))
+    finally:
+        engine.dispose()
+
+    return progress.done()
@@ -1,31 +1,82 @@
+import asyncio
+import os
+import threading
+
 import ccxt
+import ccxt.async_support as ccxt_async
+
+# Clientes reutilizados: load_markets solo se paga una vez por proceso (o por event loop)
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+def _exchange_config():
+    config = {
+        "enableRateLimit": True,
+        "options": {
+            "defaultType": "swap",   # FUTUROS
+        }
+    }
+    # Credenciales opcionales: algunos config/settings.py (p. ej. el de CI) no las definen
+    try:
+        import config.settings as settings
+    except Exception:
+        settings = None
+    api_key = getattr(settings, "BINGX_API_KEY", None) or os.getenv("BINGX_API_KEY")
+    secret = getattr(settings, "BINGX_SECRET", None) or os.getenv("BINGX_SECRET")
+    if api_key and secret:
+        config["apiKey"] = api_key
+        config["secret"] = secret
+    return config
 
 def get_bingx(use_sandbox=False):
     """
-    Crea y configura la conexión con BingX.
+    Crea y configura la conexión con BingX (una por modo y proceso).
     
     Args:
         use_sandbox (bool): Si True, usa modo sandbox (para pruebas con cuenta demo).
                             Si False, usa mercado real (para datos reales y trading real).
     """
-    exchange = ccxt.bingx({
-        "enableRateLimit": True,
-        "options": {
-            "defaultType": "swap",   # FUTUROS
-        }
-    })
+    with _clients_lock:
+        exchange = _clients.get(use_sandbox)
+        if exchange is not None:
+            return exchange
+
+        exchange = ccxt.bingx(_exchange_config())
+
+        # IMPORTANTE: Solo activar sandbox para pruebas con cuenta demo
+        # Para recolección de datos, necesitamos el mercado REAL
+        if use_sandbox:
+            exchange.set_sandbox_mode(True)
+            print("⚠️ MODO SANDBOX ACTIVADO (datos de prueba)")
 
-    # IMPORTANTE: Solo activar sandbox para pruebas con cuenta demo
-    # Para recolección de datos, necesitamos el mercado REAL
-    if use_sandbox:
-        exchange.set_sandbox_mode(True)
-        print("⚠️ MODO SANDBOX ACTIVADO (datos de prueba)")
+        # cargar mercados (MUY IMPORTANTE en BingX)
+        exchange.load_markets()
 
-    # cargar mercados (MUY IMPORTANTE en BingX)
-    exchange.load_markets()
+        _clients[use_sandbox] = exchange
+        return exchange
 
+async def get_async_bingx(use_sandbox=False):
+    """
+    Cliente asíncrono (ccxt.async_support) compartido dentro del event loop actual.
+    Su sesión HTTP pertenece al loop: cada loop tiene su propio cliente.
+    """
+    key = (id(asyncio.get_running_loop()), use_sandbox)
+    exchange = _async_clients.get(key)
+    if exchange is None:
+        exchange = ccxt_async.bingx(_exchange_config())
+        if use_sandbox:
+            exchange.set_sandbox_mode(True)
+        _async_clients[key] = exchange
+        await exchange.load_markets()
     return exchange
 
+async def close_async_bingx():
+    """Cierra los clientes asíncronos del event loop actual"""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [k for k in _async_clients if k[0] == loop_id]:
+        await _async_clients.pop(key).close()
+
 
 def fetch_ohlcv(symbol="BTC/USDT:USDT", timeframe="5m", limit=200, use_sandbox=False):
     """
@@ -34,9 +85,8 @@ def fetch_ohlcv(symbol="BTC/USDT:USDT", timeframe="5m", limit=200, use_sandbox=F
     Args:
         use_sandbox (bool): False para datos reales, True para sandbox
     """
-    exchange = get_bingx(use_sandbox)
-    
     try:
+        exchange = get_bingx(use_sandbox)
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
         
         # Verificar que obtenemos datos reales
@@ -48,4 +98,4 @@ def fetch_ohlcv(symbol="BTC/USDT:USDT", timeframe="5m", limit=200, use_sandbox=F
         
     except Exception as e:
         print(f"❌ Error obteniendo datos: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,427 @@
+# exchange/execution.py
+"""
+Capa de ejecución de órdenes asíncrona (asyncio + ccxt.async_support).
+
+- Entradas a mercado o limitadas y protecciones reduce-only (Stop Loss y
+  Take Profit) del tamaño realmente llenado, enviadas en paralelo.
+- Client order ids deterministas por trade y propósito ("tb-<trade>-entry",
+  "-sl", "-tp", "-exit"): reenviar una orden nunca la duplica. Si la red
+  pierde la respuesta se busca la orden por su client id antes de reintentar.
+- Seguimiento de llenados: cada refresco calcula los tramos nuevos (cantidad
+  y precio) y avisa con `on_fill`.
+- Envío concurrente entre símbolos con un semáforo como límite.
+
+`ExecutionEngine` es la API asíncrona; `ExecutionService` la ejecuta en un
+event loop propio (hilo daemon) para que el runner, que es síncrono, envíe
+órdenes sin bloquear su ciclo. Con exchange/mock_exchange.py se prueba y se
+mide todo sin red.
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import ccxt
+
+from bot.metrics import metrics
+from config.logs import get_logger, setup_logging
+
+logger = get_logger("Execution")
+
+CLIENT_ID_PREFIX = "tb"
+FINAL_STATUSES = ("closed", "canceled", "rejected", "expired")
+MAX_CONCURRENCY = 8
+SUBMIT_RETRIES = 3
+RETRY_BACKOFF = 0.5  # Segundos (se duplica en cada reintento)
+POLL_INTERVAL = 0.5  # Segundos entre refrescos de órdenes abiertas
+FILL_TIMEOUT = 30.0  # Espera máxima del llenado de una entrada
+
+def client_order_id(trade_id, purpose):
+    """Client order id determinista: el mismo trade y propósito siempre dan el mismo id"""
+    return f"{CLIENT_ID_PREFIX}-{trade_id}-{purpose}"
+
+def order_side(position_side, closing=False):
+    """Lado de la orden ("buy"/"sell") para abrir o cerrar una posición LONG/SHORT"""
+    buy = position_side == "LONG"
+    return "buy" if buy != closing else "sell"
+
+class Order:
+    """Estado local de una orden enviada (o por enviar)"""
+
+    __slots__ = ("client_id", "trade_id", "purpose", "symbol", "side", "type", "amount", "price", "params",
+                 "id", "status", "filled", "average", "fills", "error", "submitted_at", "updated_at")
+
+    def __init__(self, client_id, symbol, side, type, amount, price=None, params=None, trade_id=None, purpose=None):
+        self.client_id = client_id
+        self.trade_id = trade_id
+        self.purpose = purpose
+        self.symbol = symbol
+        self.side = side
+        self.type = type
+        self.amount = float(amount)
+        self.price = price
+        self.params = dict(params or {})
+        self.id = None
+        self.status = "new"
+        self.filled = 0.0
+        self.average = None
+        self.fills = []  # (timestamp ms, cantidad, precio) por tramo
+        self.error = None
+        self.submitted_at = None
+        self.updated_at = None
+
+    @property
+    def remaining(self):
+        return max(self.amount - self.filled, 0.0)
+
+    @property
+    def is_final(self):
+        return self.status in FINAL_STATUSES
+
+    def apply(self, report):
+        """
+        Actualiza el estado con la respuesta del exchange (orden unificada de ccxt).
+        Retorna (cantidad, precio) del tramo nuevo, o None si no hubo llenado.
+        """
+        self.id = report.get("id") or self.id
+        self.status = report.get("status") or self.status
+        self.updated_at = time.time()
+        filled = float(report.get("filled") or 0.0)
+        average = report.get("average")
+        delta = filled - self.filled
+        if delta <= 1e-12 or average is None:
+            return None
+
+        # Precio del tramo nuevo a partir de la media acumulada
+        previous_cost = self.filled * (self.average or 0.0)
+        price = (filled * float(average) - previous_cost) / delta
+        self.filled = filled
+        self.average = float(average)
+        self.fills.append((report.get("lastTradeTimestamp") or int(self.updated_at * 1000), delta, price))
+        return delta, price
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class ExecutionEngine:
+    """
+    Envío y seguimiento de órdenes sobre un cliente ccxt asíncrono.
+
+    Args:
+        exchange: Instancia de ccxt.async_support (o MockExchange).
+        max_concurrency (int): Llamadas simultáneas al exchange.
+        on_fill (callable): (orden, cantidad, precio) en cada tramo llenado.
+    """
+
+    def __init__(self, exchange, max_concurrency=MAX_CONCURRENCY, on_fill=None):
+        self.exchange = exchange
+        self.on_fill = on_fill
+        self.orders = {}  # client id -> Order
+        self._opening = {}  # trade id -> Future que termina cuando la entrada y sus protecciones están enviadas
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _record_fill(self, order, fill):
+        if fill is None:
+            return
+        quantity, price = fill
+        metrics.inc("trader_order_fills_total", purpose=order.purpose or "manual")
+        if self.on_fill is not None:
+            try:
+                self.on_fill(order, quantity, price)
+            except Exception as e:
+                logger.warning(f"⚠️ Error en on_fill: {e}", extra={"event": "fill_callback_error"})
+
+    async def _lookup(self, order):
+        """
+        Busca en el exchange una orden por su client id (None si no existe).
+        Recorre las órdenes abiertas y, si no está, las cerradas del símbolo:
+        fetch_order por client id no es portable (BingX, por ejemplo, exige su
+        propio campo clientOrderID y ccxt enviaría orderId vacío).
+        """
+        for fetch in (self.exchange.fetch_open_orders, getattr(self.exchange, "fetch_closed_orders", None)):
+            if fetch is None:
+                continue
+            try:
+                async with self._semaphore:
+                    reports = await fetch(order.symbol)
+            except (ccxt.ExchangeError, ccxt.NetworkError):
+                continue
+            for report in reports:
+                if report.get("clientOrderId") == order.client_id:
+                    return report
+        return None
+
+    async def submit(self, order):
+        """
+        Envía la orden una sola vez por client id. Reintenta los errores de red
+        comprobando antes si la orden ya llegó. Retorna la Order local.
+        """
+        known = self.orders.get(order.client_id)
+        if known is not None and known.status != "rejected":
+            return known
+        self.orders[order.client_id] = order
+
+        params = dict(order.params, clientOrderId=order.client_id)
+        start = time.perf_counter()
+        backoff = RETRY_BACKOFF
+        for attempt in range(SUBMIT_RETRIES):
+            try:
+                async with self._semaphore:
+                    report = await self.exchange.create_order(order.symbol, order.type, order.side, order.amount,
+                                                              order.price, params)
+            except ccxt.DuplicateOrderId:
+                report = await self._lookup(order)
+            except ccxt.NetworkError as e:
+                # La orden pudo llegar aunque la respuesta se perdiera
+                report = await self._lookup(order)
+                if report is None:
+                    order.error = str(e)
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+            except ccxt.ExchangeError as e:
+                order.status = "rejected"
+                order.error = str(e)
+                break
+            if report is not None:
+                order.submitted_at = time.time()
+                self._record_fill(order, order.apply(report))
+                break
+        else:
+            order.status = "rejected"
+
+        metrics.observe("trader_order_submit_seconds", time.perf_counter() - start, type=order.type)
+        metrics.inc("trader_orders_total", purpose=order.purpose or "manual", status=order.status)
+        if order.status == "rejected":
+            logger.warning(f"⚠️ Orden {order.client_id} rechazada: {order.error}",
+                           extra={"event": "order_rejected", "symbol": order.symbol, "client_id": order.client_id})
+        return order
+
+    async def submit_many(self, orders):
+        """Envía varias órdenes a la vez (p. ej. de distintos símbolos)"""
+        return await asyncio.gather(*(self.submit(order) for order in orders))
+
+    async def refresh(self, order):
+        """Consulta el estado de la orden y registra los tramos nuevos"""
+        if order.id is None or order.is_final:
+            return order
+        try:
+            async with self._semaphore:
+                report = await self.exchange.fetch_order(order.id, order.symbol)
+        except ccxt.NetworkError:
+            return order
+        self._record_fill(order, order.apply(report))
+        return order
+
+    async def track(self):
+        """Refresca en paralelo todas las órdenes no finalizadas"""
+        pending = [o for o in self.orders.values() if o.id is not None and not o.is_final]
+        await asyncio.gather(*(self.refresh(o) for o in pending))
+        return len(pending)
+
+    async def wait_filled(self, order, timeout=FILL_TIMEOUT, interval=None):
+        """Refresca la orden hasta que termine o venza el plazo"""
+        interval = POLL_INTERVAL if interval is None else interval
+        deadline = time.monotonic() + timeout
+        while not order.is_final and order.id is not None and time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+            await self.refresh(order)
+        return order
+
+    async def cancel(self, order):
+        if order is None or order.id is None or order.is_final:
+            return order
+        try:
+            async with self._semaphore:
+                report = await self.exchange.cancel_order(order.id, order.symbol)
+            self._record_fill(order, order.apply(report))
+        except ccxt.OrderNotFound:
+            await self.refresh(order)
+        return order
+
+    async def open_position(self, trade_id, symbol, side, amount, price=None, stop_loss=None, take_profit=None,
+                            fill_timeout=FILL_TIMEOUT, interval=None):
+        """
+        Entrada (limitada si hay `price`, si no a mercado) y, con lo llenado,
+        Stop Loss y Take Profit reduce-only enviados en paralelo.
+        Retorna {"entry", "sl", "tp"} con las Order (None si no aplica).
+        """
+        opening = self._opening[trade_id] = asyncio.get_running_loop().create_future()
+        try:
+            return await self._open_position(trade_id, symbol, side, amount, price, stop_loss, take_profit,
+                                             fill_timeout, interval)
+        finally:
+            opening.set_result(None)
+
+    async def _open_position(self, trade_id, symbol, side, amount, price, stop_loss, take_profit, fill_timeout,
+                             interval):
+        entry = await self.submit(Order(
+            client_order_id(trade_id, "entry"), symbol, order_side(side), "limit" if price else "market",
+            amount, price, trade_id=trade_id, purpose="entry",
+        ))
+        await self.wait_filled(entry, fill_timeout, interval)
+        if entry.filled <= 0:
+            if not entry.is_final:
+                await self.cancel(entry)
+            return {"entry": entry, "sl": None, "tp": None}
+
+        exit_side = order_side(side, closing=True)
+        protections = []
+        if stop_loss is not None:
+            protections.append(Order(client_order_id(trade_id, "sl"), symbol, exit_side, "market", entry.filled,
+                                     params={"reduceOnly": True, "stopLossPrice": stop_loss},
+                                     trade_id=trade_id, purpose="sl"))
+        if take_profit is not None:
+            protections.append(Order(client_order_id(trade_id, "tp"), symbol, exit_side, "market", entry.filled,
+                                     params={"reduceOnly": True, "takeProfitPrice": take_profit},
+                                     trade_id=trade_id, purpose="tp"))
+        placed = {o.purpose: o for o in await self.submit_many(protections)}
+        return {"entry": entry, "sl": placed.get("sl"), "tp": placed.get("tp")}
+
+    async def close_position(self, trade_id, symbol, side, amount=None, fill_timeout=FILL_TIMEOUT, interval=None):
+        """
+        Cancela las protecciones del trade y cierra lo que quede con una orden
+        reduce-only a mercado. Retorna la Order de salida (None si no había nada abierto).
+        Si la entrada del trade aún se está enviando, espera a que termine.
+        """
+        opening = self._opening.pop(trade_id, None)
+        if opening is not None:
+            await opening
+        protections = [self.orders.get(client_order_id(trade_id, p)) for p in ("sl", "tp")]
+        await asyncio.gather(*(self.cancel(o) for o in protections if o is not None))
+
+        entry = self.orders.get(client_order_id(trade_id, "entry"))
+        if amount is None:
+            if entry is None:
+                return None
+            amount = entry.filled - sum(o.filled for o in protections if o is not None)
+        if amount <= 1e-12:
+            return None
+
+        exit_order = await self.submit(Order(
+            client_order_id(trade_id, "exit"), symbol, order_side(side, closing=True), "market", amount,
+            params={"reduceOnly": True}, trade_id=trade_id, purpose="exit",
+        ))
+        return await self.wait_filled(exit_order, fill_timeout, interval)
+
+class ExecutionService:
+    """
+    Event loop propio en un hilo daemon para usar el ExecutionEngine desde
+    código síncrono. Los métodos retornan concurrent.futures.Future al instante.
+
+    Args:
+        exchange_factory (callable): Corrutina o función que crea el exchange
+            dentro del loop (p. ej. get_async_bingx o lambda: MockExchange()).
+        poll_interval (float): Segundos entre refrescos de órdenes abiertas.
+    """
+
+    def __init__(self, exchange_factory, max_concurrency=MAX_CONCURRENCY, poll_interval=POLL_INTERVAL,
+                 on_fill=None):
+        self.exchange_factory = exchange_factory
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.on_fill = on_fill or self.log_fill
+        self.engine = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+        self._tracker = None
+
+    @staticmethod
+    def log_fill(order, quantity, price):
+        logger.info(
+            f"🧾 Fill {order.client_id}: {order.side} {quantity:g} {order.symbol} a {price:.2f} "
+            f"({order.filled:g}/{order.amount:g})",
+            extra={"event": "order_fill", "symbol": order.symbol, "client_id": order.client_id,
+                   "quantity": quantity, "price": price, "status": order.status},
+        )
+
+    async def _setup(self):
+        exchange = self.exchange_factory()
+        if asyncio.iscoroutine(exchange):
+            exchange = await exchange
+        self.engine = ExecutionEngine(exchange, self.max_concurrency, self.on_fill)
+        self._tracker = asyncio.ensure_future(self._track_forever())
+
+    async def _track_forever(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.engine.track()
+            except Exception as e:
+                metrics.inc("trader_errors_total", stage="order_tracking")
+                logger.warning(f"⚠️ Error siguiendo órdenes: {e}", extra={"event": "order_tracking_error"})
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop.run_forever, name="execution", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+        return self
+
+    def call(self, coroutine):
+        """Programa una corrutina en el loop de ejecución (retorna un Future)"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def call_soon(self, function, *args):
+        self._loop.call_soon_threadsafe(function, *args)
+
+    def open_position(self, trade_id, symbol, side, amount, **kwargs):
+        return self.call(self.engine.open_position(trade_id, symbol, side, amount, **kwargs))
+
+    def close_position(self, trade_id, symbol, side, amount=None, **kwargs):
+        return self.call(self.engine.close_position(trade_id, symbol, side, amount, **kwargs))
+
+    def mark_price(self, symbol, price):
+        """Reenvía el precio al exchange simulado (sin efecto con un exchange real)"""
+        if self.engine is not None and hasattr(self.engine.exchange, "set_price"):
+            self.call_soon(self.engine.exchange.set_price, symbol, float(price))
+
+    async def _shutdown(self):
+        if self._tracker is not None:
+            self._tracker.cancel()
+        if self.engine is not None:
+            await self.engine.exchange.close()
+
+    def stop(self, timeout=10.0):
+        if self._thread is None:
+            return
+        try:
+            self.call(self._shutdown()).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+
+async def _benchmark(args):
+    from exchange.mock_exchange import MockExchange
+
+    symbols = [f"SYM{i}/USDT:USDT" for i in range(args.symbols)]
+    exchange = MockExchange({s: 100.0 for s in symbols}, latency=args.latency, partial_fills=args.partial_fills,
+                            timeout_rate=args.timeout_rate, seed=1)
+    engine = ExecutionEngine(exchange, max_concurrency=args.concurrency)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        engine.open_position(i, symbols[i % len(symbols)], "LONG" if i % 2 == 0 else "SHORT", 1.0,
+                             stop_loss=95.0 if i % 2 == 0 else 105.0, take_profit=110.0 if i % 2 == 0 else 90.0,
+                             interval=args.latency)
+        for i in range(args.orders)
+    ))
+    elapsed = time.perf_counter() - start
+
+    filled = sum(r["entry"].filled >= 1.0 for r in results)
+    protected = sum(r["sl"] is not None and r["tp"] is not None for r in results)
+    print(f"✅ {args.orders} entradas ({filled} llenas, {protected} con SL/TP) en {elapsed:.3f}s "
+          f"| {len(engine.orders)} órdenes | {exchange.calls} llamadas al exchange")
+    print(f"   Secuencial estimado: {exchange.calls * args.latency:.1f}s "
+          f"(latencia {args.latency * 1000:.0f} ms por llamada)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de la capa de ejecución contra el exchange simulado')
+    parser.add_argument('--orders', type=int, default=200, help='Entradas a enviar')
+    parser.add_argument('--symbols', type=int, default=20, help='Símbolos distintos')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latencia simulada por llamada (s)')
+    parser.add_argument('--partial-fills', type=int, default=3, help='Tramos de llenado por orden')
+    parser.add_argument('--timeout-rate', type=float, default=0.1, help='Probabilidad de perder una respuesta')
+    parser.add_argument('--concurrency', type=int, default=64, help='Llamadas simultáneas al exchange')
+    setup_logging(log_file="")
+    asyncio.run(_benchmark(parser.parse_args()))
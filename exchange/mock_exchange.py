@@ -0,0 +1,207 @@
+# exchange/mock_exchange.py
+"""
+Exchange local para probar y medir la capa de ejecución sin red.
+
+Implementa el subconjunto de ccxt.async_support que usa exchange/execution.py
+(create_order, fetch_order, fetch_open_orders, fetch_closed_orders,
+cancel_order, close) con:
+
+    latency / jitter   -> retardo de cada llamada (asyncio.sleep)
+    partial_fills      -> cada orden activa se llena en N tramos, uno por
+                          `fill_interval` segundos
+    timeout_rate       -> la orden se crea pero la respuesta se pierde
+                          (RequestTimeout): prueba la idempotencia por client id
+    reject_rate        -> la orden se rechaza (InvalidOrder)
+
+Los precios se mueven con `set_price`. Las órdenes a mercado se activan al
+crearse; las limitadas cuando el precio cruza el límite; las stop-loss y
+take-profit (params stopLossPrice / takeProfitPrice) cuando se toca el
+disparo. Las reduce-only se cancelan en cuanto no hay posición que reducir.
+"""
+import asyncio
+import itertools
+import random
+import time
+
+import ccxt
+
+class MockExchange:
+    """
+    Args:
+        prices (dict): Precio inicial por símbolo.
+        latency (float): Segundos de retardo por llamada.
+        jitter (float): Retardo extra aleatorio máximo (segundos).
+        partial_fills (int): Tramos en que se llena cada orden.
+        fill_interval (float): Segundos entre tramos (por defecto, `latency`).
+        timeout_rate (float): Probabilidad de perder la respuesta de create_order.
+        reject_rate (float): Probabilidad de rechazar una orden.
+        seed (int): Semilla de los eventos aleatorios.
+    """
+
+    id = "mock"
+
+    def __init__(self, prices=None, latency=0.05, jitter=0.0, partial_fills=1, fill_interval=None,
+                 timeout_rate=0.0, reject_rate=0.0, seed=None):
+        self.prices = dict(prices or {})
+        self.latency = latency
+        self.jitter = jitter
+        self.partial_fills = max(int(partial_fills), 1)
+        self.fill_interval = latency if fill_interval is None else fill_interval
+        self.timeout_rate = timeout_rate
+        self.reject_rate = reject_rate
+        self.positions = {}  # símbolo -> posición neta (positiva = larga)
+        self.calls = 0
+        self._orders = {}
+        self._by_client_id = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+
+    async def _delay(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0))
+
+    def set_price(self, symbol, price):
+        self.prices[symbol] = float(price)
+        for order in self._orders.values():
+            if order["symbol"] == symbol:
+                self._advance(order)
+
+    async def load_markets(self, reload=False):
+        return {}
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        params = dict(params or {})
+        await self._delay()
+        client_id = params.get("clientOrderId")
+        if client_id is not None and client_id in self._by_client_id:
+            raise ccxt.DuplicateOrderId(f"mock clientOrderId duplicado: {client_id}")
+        if self.reject_rate and self._random.random() < self.reject_rate:
+            raise ccxt.InvalidOrder("mock orden rechazada (simulado)")
+
+        order = {
+            "id": str(next(self._ids)),
+            "clientOrderId": client_id,
+            "symbol": symbol,
+            "type": type,
+            "side": side,
+            "amount": float(amount),
+            "price": None if price is None else float(price),
+            "stopLossPrice": params.get("stopLossPrice"),
+            "takeProfitPrice": params.get("takeProfitPrice"),
+            "reduceOnly": bool(params.get("reduceOnly", False)),
+            "status": "open",
+            "filled": 0.0,
+            "remaining": float(amount),
+            "average": None,
+            "cost": 0.0,
+            "lastTradeTimestamp": None,
+            "timestamp": int(time.time() * 1000),
+            "activated_at": None,
+            "trades": [],
+        }
+        self._orders[order["id"]] = order
+        if client_id is not None:
+            self._by_client_id[client_id] = order["id"]
+        self._advance(order)
+
+        if self.timeout_rate and self._random.random() < self.timeout_rate:
+            raise ccxt.RequestTimeout("mock respuesta perdida (simulado)")
+        return self._report(order)
+
+    def _find(self, id=None, params=None):
+        client_id = (params or {}).get("clientOrderId")
+        if id is None and client_id is not None:
+            id = self._by_client_id.get(client_id)
+        order = self._orders.get(id)
+        if order is None:
+            raise ccxt.OrderNotFound(f"mock orden no encontrada: {id or client_id}")
+        return order
+
+    async def fetch_order(self, id, symbol=None, params=None):
+        await self._delay()
+        order = self._find(id, params)
+        self._advance(order)
+        return self._report(order)
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        await self._delay()
+        orders = [o for o in self._orders.values() if symbol is None or o["symbol"] == symbol]
+        for order in orders:
+            self._advance(order)
+        return [self._report(o) for o in orders if o["status"] == "open"]
+
+    async def fetch_closed_orders(self, symbol=None, since=None, limit=None, params=None):
+        await self._delay()
+        orders = [o for o in self._orders.values() if symbol is None or o["symbol"] == symbol]
+        for order in orders:
+            self._advance(order)
+        return [self._report(o) for o in orders if o["status"] != "open"]
+
+    async def cancel_order(self, id, symbol=None, params=None):
+        await self._delay()
+        order = self._find(id, params)
+        self._advance(order)
+        if order["status"] != "open":
+            raise ccxt.OrderNotFound(f"mock orden {order['id']} ya {order['status']}")
+        order["status"] = "canceled"
+        return self._report(order)
+
+    async def close(self):
+        return None
+
+    def _triggered(self, order, price):
+        """La orden está activa (puede llenarse) al precio actual"""
+        buy = order["side"] == "buy"
+        if order["stopLossPrice"] is not None:
+            stop = float(order["stopLossPrice"])
+            return price >= stop if buy else price <= stop
+        if order["takeProfitPrice"] is not None:
+            target = float(order["takeProfitPrice"])
+            return price <= target if buy else price >= target
+        if order["type"] == "limit":
+            return price <= order["price"] if buy else price >= order["price"]
+        return True
+
+    def _advance(self, order):
+        """Aplica los tramos de llenado que correspondan al tiempo transcurrido"""
+        if order["status"] != "open":
+            return
+        price = self.prices.get(order["symbol"])
+        now = time.monotonic()
+        sign = 1.0 if order["side"] == "buy" else -1.0
+        position = self.positions.get(order["symbol"], 0.0)
+        if order["reduceOnly"] and -sign * position <= 1e-12:
+            # Sin posición que reducir (p. ej. el SL ya cerró y este es el TP)
+            order["status"] = "canceled"
+            return
+        if order["activated_at"] is None:
+            if price is None or not self._triggered(order, price):
+                return
+            order["activated_at"] = now
+
+        chunks = min(int((now - order["activated_at"]) / self.fill_interval) + 1, self.partial_fills) \
+            if self.fill_interval > 0 else self.partial_fills
+        target_filled = order["amount"] * chunks / self.partial_fills
+        quantity = target_filled - order["filled"]
+
+        if order["reduceOnly"]:
+            # Solo reduce: nunca más de la posición contraria abierta
+            quantity = min(quantity, -sign * position)
+        if quantity <= 1e-12:
+            return
+
+        fill_price = order["price"] if order["type"] == "limit" and order["price"] is not None else price
+        order["filled"] += quantity
+        order["remaining"] = max(order["amount"] - order["filled"], 0.0)
+        order["cost"] += quantity * fill_price
+        order["average"] = order["cost"] / order["filled"]
+        order["lastTradeTimestamp"] = int(time.time() * 1000)
+        order["trades"].append({"timestamp": order["lastTradeTimestamp"], "amount": quantity, "price": fill_price})
+        self.positions[order["symbol"]] = position + sign * quantity
+        if order["remaining"] <= 1e-12:
+            order["status"] = "closed"
+
+    def _report(self, order):
+        report = {k: v for k, v in order.items() if k != "activated_at"}
+        report["trades"] = list(order["trades"])
+        return report
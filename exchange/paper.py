@@ -0,0 +1,449 @@
+# exchange/paper.py
+"""
+Motor de emparejamiento local para paper trading (muchas cuentas a la vez).
+
+Libros compactos en arrays NumPy (estructura de arrays, sin un objeto por
+orden): órdenes a mercado, limitadas y stop, con reduce-only; posiciones,
+precio medio, PnL realizado y comisiones por (cuenta, símbolo).
+
+Modelo de llenado:
+    mercado  -> siguiente precio recibido (o apertura de la siguiente vela),
+                con deslizamiento y comisión taker
+    stop     -> primer precio que toca el disparo (si hay hueco, ese precio),
+                con deslizamiento y comisión taker
+    limitada -> su precio límite en cuanto el mercado lo cruza, comisión maker
+    reduce-only -> nunca aumenta la posición; se cancela al quedar plana
+
+Rendimiento: `update` descarta en O(1) los precios que no tocan ningún
+disparo (umbrales cacheados por símbolo). `update_batch` / `update_bars`
+resuelven M precios contra O órdenes con mínimos/máximos acumulados y
+searchsorted, en O(M + O log M): la primera vela o tick que dispara cada
+orden sin recorrer la serie por orden.
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+TAKER_FEE = 0.0005   # 0.05% (futuros BingX)
+MAKER_FEE = 0.0002   # 0.02%
+SLIPPAGE_BPS = 1.0   # Deslizamiento de las órdenes taker (puntos básicos)
+
+MARKET, LIMIT, STOP = 0, 1, 2
+ORDER_KINDS = {"market": MARKET, "limit": LIMIT, "stop": STOP}
+FILL_DTYPE = np.dtype([
+    ("ts", "i8"), ("order_id", "i8"), ("account", "i4"), ("symbol", "i4"),
+    ("side", "i1"), ("qty", "f8"), ("price", "f8"), ("fee", "f8"),
+])
+_EPS = 1e-12
+
+def _side(side):
+    if side in ("buy", "LONG", 1):
+        return 1
+    if side in ("sell", "SHORT", -1):
+        return -1
+    raise ValueError(f"Lado desconocido: {side}")
+
+class PaperEngine:
+    """
+    Args:
+        taker_fee, maker_fee (float): Comisiones sobre el nominal.
+        slippage_bps (float): Deslizamiento de mercado/stop en puntos básicos.
+        capacity (int): Órdenes reservadas inicialmente (crece al doble).
+    """
+
+    def __init__(self, taker_fee=TAKER_FEE, maker_fee=MAKER_FEE, slippage_bps=SLIPPAGE_BPS, capacity=1024):
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.slippage = slippage_bps / 10_000
+        self.symbols = {}   # símbolo -> índice
+        self.accounts = {}  # nombre -> índice
+        self.updates = 0
+        self._lock = threading.RLock()
+
+        # Por símbolo y por cuenta x símbolo
+        self.last_price = np.full(0, np.nan)
+        self.position = np.zeros((0, 0))
+        self.avg_price = np.zeros((0, 0))
+        self.balance = np.zeros(0)
+        self.realized = np.zeros(0)
+        self.fees = np.zeros(0)
+
+        # Libro de órdenes (estructura de arrays)
+        self._n = 0
+        self._next_id = 1
+        self._alloc_orders(capacity)
+        self._thresholds = {}  # símbolo -> (máx. disparo "por debajo", mín. disparo "por encima", hay mercado)
+
+        self._fills = np.empty(1024, dtype=FILL_DTYPE)
+        self._n_fills = 0
+
+    # ------------------------------------------------------------------ estructura
+
+    def _alloc_orders(self, capacity):
+        def grow(name, dtype, fill=0):
+            new = np.full(capacity, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+        grow("_order_id", np.int64)
+        grow("_account", np.int32)
+        grow("_symbol", np.int32)
+        grow("_side", np.int8)
+        grow("_kind", np.int8)
+        grow("_direction", np.int8)  # -1: dispara con precio <= nivel, +1: con precio >= nivel, 0: mercado
+        grow("_level", np.float64, np.nan)
+        grow("_qty", np.float64)
+        grow("_reduce_only", np.bool_, False)
+        grow("_active", np.bool_, False)
+
+    def _compact(self):
+        """Descarta las órdenes inactivas (o duplica la capacidad si casi todas siguen vivas)"""
+        keep = np.flatnonzero(self._active[:self._n])
+        if len(keep) > len(self._active) // 2:
+            self._alloc_orders(len(self._active) * 2)
+            return
+        for name in ("_order_id", "_account", "_symbol", "_side", "_kind", "_direction", "_level", "_qty",
+                     "_reduce_only", "_active"):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self._n = len(keep)
+
+    def _symbol_index(self, symbol):
+        index = self.symbols.get(symbol)
+        if index is None:
+            index = self.symbols[symbol] = len(self.symbols)
+            self.last_price = np.append(self.last_price, np.nan)
+            self.position = np.pad(self.position, ((0, 0), (0, 1)))
+            self.avg_price = np.pad(self.avg_price, ((0, 0), (0, 1)))
+        return index
+
+    def add_account(self, name, balance=0.0):
+        """Registra una cuenta de paper trading (idempotente). Retorna su índice"""
+        with self._lock:
+            index = self.accounts.get(name)
+            if index is None:
+                index = self.accounts[name] = len(self.accounts)
+                self.position = np.pad(self.position, ((0, 1), (0, 0)))
+                self.avg_price = np.pad(self.avg_price, ((0, 1), (0, 0)))
+                self.balance = np.append(self.balance, float(balance))
+                self.realized = np.append(self.realized, 0.0)
+                self.fees = np.append(self.fees, 0.0)
+            return index
+
+    # ------------------------------------------------------------------ órdenes
+
+    def submit(self, account, symbol, side, qty, kind="market", price=None, reduce_only=False):
+        """
+        Añade una orden. `price` es el límite (limit) o el disparo (stop).
+        Retorna el id de la orden.
+        """
+        kind = ORDER_KINDS[kind]
+        side = _side(side)
+        if kind != MARKET and price is None:
+            raise ValueError("Las órdenes limit/stop necesitan precio")
+        with self._lock:
+            a = self.add_account(account)
+            s = self._symbol_index(symbol)
+            if self._n == len(self._active):
+                self._compact()
+            i = self._n
+            self._n += 1
+            order_id = self._next_id
+            self._next_id += 1
+
+            self._order_id[i] = order_id
+            self._account[i] = a
+            self._symbol[i] = s
+            self._side[i] = side
+            self._kind[i] = kind
+            # Limit de compra y stop de venta disparan por debajo; el resto por encima
+            self._direction[i] = 0 if kind == MARKET else (-side if kind == LIMIT else side)
+            self._level[i] = np.nan if price is None else float(price)
+            self._qty[i] = float(qty)
+            self._reduce_only[i] = reduce_only
+            self._active[i] = True
+            self._thresholds.pop(s, None)
+            return order_id
+
+    def submit_bracket(self, account, symbol, side, qty, stop_loss=None, take_profit=None):
+        """Entrada a mercado con Stop Loss (stop) y Take Profit (limit) reduce-only. Retorna los ids"""
+        side = _side(side)
+        with self._lock:
+            entry = self.submit(account, symbol, side, qty)
+            stop = None if stop_loss is None else self.submit(account, symbol, -side, qty, "stop", stop_loss, True)
+            target = None if take_profit is None else self.submit(account, symbol, -side, qty, "limit", take_profit,
+                                                                  True)
+            return entry, stop, target
+
+    def cancel(self, order_id):
+        with self._lock:
+            found = np.flatnonzero((self._order_id[:self._n] == order_id) & self._active[:self._n])
+            if not len(found):
+                return False
+            self._active[found[0]] = False
+            self._thresholds.pop(int(self._symbol[found[0]]), None)
+            return True
+
+    def cancel_all(self, account, symbol=None):
+        with self._lock:
+            mask = self._active[:self._n] & (self._account[:self._n] == self.accounts.get(account, -1))
+            if symbol is not None:
+                mask &= self._symbol[:self._n] == self.symbols.get(symbol, -1)
+            for s in np.unique(self._symbol[:self._n][mask]):
+                self._thresholds.pop(int(s), None)
+            self._active[:self._n][mask] = False
+            return int(mask.sum())
+
+    def close_position(self, account, symbol):
+        """Cancela las órdenes de la cuenta en el símbolo y cierra a mercado lo que quede"""
+        with self._lock:
+            self.cancel_all(account, symbol)
+            a, s = self.accounts.get(account), self.symbols.get(symbol)
+            if a is None or s is None or abs(self.position[a, s]) < _EPS:
+                return None
+            position = self.position[a, s]
+            return self.submit(account, symbol, -int(np.sign(position)), abs(position), reduce_only=True)
+
+    def open_orders(self, account=None):
+        """Órdenes vivas como DataFrame"""
+        with self._lock:
+            mask = self._active[:self._n].copy()
+            if account is not None:
+                mask &= self._account[:self._n] == self.accounts.get(account, -1)
+            names = {v: k for k, v in self.symbols.items()}
+            accounts = {v: k for k, v in self.accounts.items()}
+            kinds = {v: k for k, v in ORDER_KINDS.items()}
+            return pd.DataFrame({
+                "order_id": self._order_id[:self._n][mask],
+                "account": [accounts[a] for a in self._account[:self._n][mask]],
+                "symbol": [names[s] for s in self._symbol[:self._n][mask]],
+                "side": np.where(self._side[:self._n][mask] > 0, "buy", "sell"),
+                "kind": [kinds[k] for k in self._kind[:self._n][mask]],
+                "price": self._level[:self._n][mask],
+                "qty": self._qty[:self._n][mask],
+                "reduce_only": self._reduce_only[:self._n][mask],
+            })
+
+    # ------------------------------------------------------------------ precios
+
+    def _threshold(self, s):
+        cached = self._thresholds.get(s)
+        if cached is None:
+            live = self._active[:self._n] & (self._symbol[:self._n] == s)
+            direction = self._direction[:self._n][live]
+            level = self._level[:self._n][live]
+            below = level[direction < 0]
+            above = level[direction > 0]
+            cached = self._thresholds[s] = (
+                below.max() if len(below) else -np.inf,
+                above.min() if len(above) else np.inf,
+                bool((direction == 0).any()),
+            )
+        return cached
+
+    def update(self, symbol, price, ts=None):
+        """
+        Un precio (tick o cierre). Si no toca ningún disparo ni hay órdenes a
+        mercado, solo se guarda. Retorna el número de llenados.
+        """
+        with self._lock:
+            s = self._symbol_index(symbol)
+            below, above, market = self._threshold(s)
+            if not market and below < price < above:
+                self.last_price[s] = price
+                self.updates += 1
+                return 0
+            return self._match(s, np.array([float(price)]), None, None, None, ts)
+
+    def update_batch(self, symbol, prices, ts=None):
+        """Serie de ticks de un símbolo en orden. `ts` (array opcional) marca cada tick"""
+        with self._lock:
+            s = self._symbol_index(symbol)
+            return self._match(s, np.asarray(prices, dtype=float), None, None, None, ts)
+
+    def update_bars(self, symbol, high, low, close, open=None, ts=None):
+        """
+        Serie de velas: los disparos se evalúan con máximo/mínimo; las órdenes
+        a mercado se llenan a la apertura de la primera vela (o a su cierre si
+        no se da `open`).
+        """
+        with self._lock:
+            s = self._symbol_index(symbol)
+            close = np.asarray(close, dtype=float)
+            return self._match(s, close, np.asarray(high, dtype=float), np.asarray(low, dtype=float),
+                               None if open is None else np.asarray(open, dtype=float), ts)
+
+    def _match(self, s, prices, highs, lows, opens, ts):
+        m = len(prices)
+        if m == 0:
+            return 0
+        self.updates += m
+        self._thresholds.pop(s, None)
+        index = np.flatnonzero(self._active[:self._n] & (self._symbol[:self._n] == s))
+        if not len(index):
+            self.last_price[s] = prices[-1]
+            return 0
+
+        low_path = prices if lows is None else lows
+        high_path = prices if highs is None else highs
+        base = prices if opens is None else opens  # Precio ejecutable al llegar cada tick/vela
+
+        # Primer tick/vela que dispara cada orden: mínimos (máximos) acumulados
+        # son monótonos, así que basta una búsqueda binaria por orden
+        direction = self._direction[index]
+        level = self._level[index]
+        first = np.zeros(len(index), dtype=np.int64)
+        down = direction < 0
+        up = direction > 0
+        if down.any():
+            first[down] = np.searchsorted(-np.minimum.accumulate(low_path), -level[down], side="left")
+        if up.any():
+            first[up] = np.searchsorted(np.maximum.accumulate(high_path), level[up], side="left")
+
+        hit = np.flatnonzero(first < m)
+        if not len(hit):
+            self.last_price[s] = prices[-1]
+            return 0
+
+        # En orden temporal (y de llegada dentro del mismo tick)
+        hit = hit[np.lexsort((self._order_id[index[hit]], first[hit]))]
+        filled = 0
+        for k in hit:
+            i = index[k]
+            if not self._active[i]:
+                continue  # Cancelada por un llenado anterior de esta misma serie
+            j = first[k]
+            side = int(self._side[i])
+            kind = self._kind[i]
+            if kind == LIMIT:
+                price, fee_rate = self._level[i], self.maker_fee
+            else:
+                if kind == STOP:
+                    # Con ticks: el precio que disparó; con velas: el disparo o la apertura si hubo hueco
+                    reference = prices[j] if highs is None else (
+                        self._level[i] if opens is None else
+                        (max(self._level[i], base[j]) if side > 0 else min(self._level[i], base[j]))
+                    )
+                else:
+                    reference = base[j]
+                price, fee_rate = reference * (1 + side * self.slippage), self.taker_fee
+
+            a = int(self._account[i])
+            qty = self._qty[i]
+            if self._reduce_only[i]:
+                qty = min(qty, max(-side * self.position[a, s], 0.0))
+            self._active[i] = False
+            if qty <= _EPS:
+                continue
+            fee = qty * price * fee_rate
+            self._apply_fill(a, s, side, qty, price, fee)
+            self._log_fill(None if ts is None else (ts if np.ndim(ts) == 0 else ts[j]),
+                           self._order_id[i], a, s, side, qty, price, fee)
+            filled += 1
+
+            if abs(self.position[a, s]) < _EPS:
+                # Posición plana: sus reduce-only ya no tienen nada que reducir
+                self._active[:self._n] &= ~(
+                    self._reduce_only[:self._n] & (self._account[:self._n] == a) & (self._symbol[:self._n] == s)
+                )
+
+        self.last_price[s] = prices[-1]
+        return filled
+
+    def _apply_fill(self, a, s, side, qty, price, fee):
+        position = self.position[a, s]
+        average = self.avg_price[a, s]
+        new_position = position + side * qty
+        realized = 0.0
+        if position == 0 or np.sign(position) == side:
+            average = (abs(position) * average + qty * price) / abs(new_position)
+        else:
+            closing = min(qty, abs(position))
+            realized = closing * (price - average) * np.sign(position)
+            if abs(new_position) < _EPS:
+                new_position, average = 0.0, 0.0
+            elif np.sign(new_position) != np.sign(position):
+                average = price  # Se dio la vuelta: el resto abre al precio del llenado
+        self.position[a, s] = new_position
+        self.avg_price[a, s] = average
+        self.realized[a] += realized
+        self.fees[a] += fee
+        self.balance[a] += realized - fee
+
+    def _log_fill(self, ts, order_id, a, s, side, qty, price, fee):
+        if self._n_fills == len(self._fills):
+            self._fills = np.resize(self._fills, len(self._fills) * 2)
+        self._fills[self._n_fills] = (int(time.time() * 1000) if ts is None else int(ts), order_id, a, s, side,
+                                      qty, price, fee)
+        self._n_fills += 1
+
+    # ------------------------------------------------------------------ consultas
+
+    def drain_fills(self):
+        """Llenados desde la última llamada (array estructurado FILL_DTYPE)"""
+        with self._lock:
+            fills = self._fills[:self._n_fills].copy()
+            self._n_fills = 0
+            return fills
+
+    def equity(self):
+        """Saldo + PnL no realizado a los últimos precios, por cuenta"""
+        with self._lock:
+            last = np.nan_to_num(self.last_price)
+            unrealized = (self.position * (last[None, :] - self.avg_price)).sum(axis=1)
+            return self.balance + unrealized
+
+    def summary(self):
+        """Resumen por cuenta (DataFrame)"""
+        with self._lock:
+            names = sorted(self.accounts, key=self.accounts.get)
+            return pd.DataFrame({
+                "account": names,
+                "equity": self.equity(),
+                "realized": self.realized,
+                "fees": self.fees,
+                "open_positions": (np.abs(self.position) > _EPS).sum(axis=1),
+                "open_orders": np.bincount(self._account[:self._n][self._active[:self._n]],
+                                           minlength=len(names))[:len(names)],
+            })
+
+def _benchmark(args):
+    rng = np.random.default_rng(0)
+    engine = PaperEngine()
+    symbols = [f"SYM{i}/USDT:USDT" for i in range(args.symbols)]
+    for a in range(args.accounts):
+        for symbol in symbols:
+            side = "buy" if rng.random() < 0.5 else "sell"
+            engine.submit_bracket(f"acct{a}", symbol, side, 1.0, stop_loss=100 - (5 if side == "buy" else -5),
+                                  take_profit=100 + (10 if side == "buy" else -10))
+    orders = args.accounts * args.symbols * 3
+
+    prices = {s: 100 + np.cumsum(rng.normal(0, 0.05, args.ticks)) for s in symbols}
+    start = time.perf_counter()
+    for symbol in symbols:
+        engine.update_batch(symbol, prices[symbol])
+    batch = time.perf_counter() - start
+    print(f"✅ Lote: {args.ticks * len(symbols):,} precios contra {orders:,} órdenes en {batch:.3f}s "
+          f"({args.ticks * len(symbols) / batch:,.0f} precios/s) | {engine.drain_fills().size} llenados")
+
+    ticks = min(args.ticks, 200_000)
+    start = time.perf_counter()
+    symbol = symbols[0]
+    series = prices[symbol][:ticks].tolist()
+    for price in series:
+        engine.update(symbol, price)
+    single = time.perf_counter() - start
+    print(f"✅ Uno a uno: {ticks:,} precios en {single:.3f}s ({ticks / single:,.0f} precios/s)")
+    print(engine.summary().describe().loc[["mean", "min", "max"], ["equity", "fees"]].to_string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark del motor de paper trading')
+    parser.add_argument('--accounts', type=int, default=50, help='Cuentas de paper trading')
+    parser.add_argument('--symbols', type=int, default=20, help='Símbolos')
+    parser.add_argument('--ticks', type=int, default=100_000, help='Precios por símbolo')
+    _benchmark(parser.parse_args())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Etiqueta las decisiones registradas (incluidas NO_TRADE) con el resultado
+que habrían tenido un LONG y un SHORT según las velas archivadas.
+Ejecutar periódicamente, por ejemplo cada hora.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+from database.models import init_db
+from brain.labeler import label_decisions, HORIZON_BARS, LABELS_DIR
+from brain.risk import ATR_MULTIPLIER_SL, ATR_MULTIPLIER_TP
+
+def main():
+    parser = argparse.ArgumentParser(description='Etiquetado contrafactual de decisiones')
+    parser.add_argument('--days', type=int, default=None, help='Solo decisiones de los últimos N días (default: todas)')
+    parser.add_argument('--horizon', type=int, default=HORIZON_BARS, help=f'Velas hacia delante (default: {HORIZON_BARS})')
+    parser.add_argument('--sl-mult', type=float, default=ATR_MULTIPLIER_SL, help='Multiplicador ATR del Stop Loss')
+    parser.add_argument('--tp-mult', type=float, default=ATR_MULTIPLIER_TP, help='Multiplicador ATR del Take Profit')
+    parser.add_argument('--relabel', action='store_true', help='Reetiquetar también las decisiones ya etiquetadas')
+    args = parser.parse_args()
+
+    init_db()
+    labels = label_decisions(days=args.days, horizon=args.horizon, sl_mult=args.sl_mult,
+                             tp_mult=args.tp_mult, relabel=args.relabel)
+    if labels.empty:
+        print("✅ No hay decisiones nuevas que etiquetar")
+        return
+
+    print(f"✅ {len(labels)} decisiones etiquetadas en '{LABELS_DIR}'")
+    for side in ("long", "short"):
+        counts = labels[f"{side}_outcome"].value_counts().to_dict()
+        print(f"   • {side.upper()}: {counts} | PnL medio {labels[f'{side}_pnl'].mean():.4f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Reproduce un fichero de ticks (CSV o Parquet: timestamp en ms, price y,
+opcionalmente, symbol) contra las posiciones abiertas y muestra qué salidas
+habría ejecutado el monitor intrabar (SL/TP, break-even y trailing).
+Por defecto no escribe nada en la base de datos.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from database.models import init_db
+from bot.positions import PositionBook
+from bot.exit_monitor import ExitMonitor
+from config.logs import setup_logging
+
+def main():
+    parser = argparse.ArgumentParser(description='Reproducción de ticks contra el monitor de salidas')
+    parser.add_argument('ticks', help='Fichero de ticks (.csv o .parquet)')
+    parser.add_argument('--symbol', default='BTC/USDT:USDT', help='Símbolo si el fichero no trae columna symbol')
+    parser.add_argument('--no-trailing', action='store_true', help='Desactivar el trailing stop')
+    parser.add_argument('--no-break-even', action='store_true', help='Desactivar el break-even')
+    parser.add_argument('--commit', action='store_true', help='Cerrar de verdad las posiciones en la base de datos')
+    args = parser.parse_args()
+
+    setup_logging()
+    init_db()
+    book = PositionBook()
+    print(f"📒 Posiciones abiertas: {book.load()}")
+
+    def dry_close(position, price, reason):
+        """Cierre simulado: solo retira la posición del libro en memoria"""
+        sign = 1 if position.side == 'LONG' else -1
+        book.forget(position.id)
+        return sign * (price - position.entry_price) / position.entry_price * 100
+
+    monitor = ExitMonitor(book, trailing=not args.no_trailing, break_even=not args.no_break_even,
+                          closer=None if args.commit else dry_close)
+    start = time.perf_counter()
+    exits = monitor.replay(args.ticks, symbol=args.symbol)
+    elapsed = time.perf_counter() - start
+
+    for e in exits:
+        print(f"   • {e['timestamp']} | Trade {e['trade_id']} {e['side']} | {e['reason']} a {e['price']:.2f} | "
+              f"PnL {e['pnl']:.4f}%")
+    print(f"✅ {len(exits)} salidas en {elapsed:.3f}s | Abiertas al final: {len(book.positions)}"
+          + ("" if args.commit else " (simulación, sin escribir en la base de datos)"))
+
+if __name__ == "__main__":
+    main()
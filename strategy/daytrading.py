@@ -1,12 +1,12 @@
 import pandas as pd
-from config.optimizer import optimizer
+from config.optimizer import optimizer, classify_regime
 
-def is_liquid_hour(hour):
+def is_liquid_hour(hour, symbol=None):
     """
     Determina si la hora actual (UTC) corresponde a periodos de alta liquidez.
-    Usa parámetros del optimizador.
+    Usa parámetros del optimizador (los del símbolo, si se indica).
     """
-    params = optimizer.get_strategy_params()
+    params = optimizer.get_strategy_params(symbol)
     
     if params["trade_all_hours"]:
         return True  # Modo aprendizaje: opera 24/7
@@ -14,9 +14,17 @@ def is_liquid_hour(hour):
     # Horario líquido normal: 12:00-20:00 UTC
     return 12 <= hour <= 20
 
-def generate_signal(df):
+def current_regime(df):
+    """Régimen de volatilidad de la última vela (percentil de su ATR en la ventana)"""
+    if df is None or len(df) < 30:
+        return classify_regime(None)
+    atr = df["atr"].to_numpy()
+    return classify_regime(float((atr <= atr[-1]).mean()))
+
+def generate_signal(df, symbol=None):
     """
-    Analiza el DataFrame con indicadores usando parámetros optimizados.
+    Analiza el DataFrame con indicadores usando parámetros optimizados
+    para el símbolo y el régimen de volatilidad actual.
     """
     if df is None or len(df) < 2:
         return "NO_TRADE"
@@ -31,8 +39,8 @@ def generate_signal(df):
     if last[required_columns].isna().any():
         return "NO_TRADE"
 
-    # Obtener parámetros actuales
-    params = optimizer.get_strategy_params()
+    # Obtener parámetros actuales (una búsqueda por símbolo y régimen)
+    params = optimizer.get_strategy_params(symbol, current_regime(df))
     
     # Extracción de valores
     ema50 = last["ema50"]
@@ -0,0 +1,74 @@
+"""
+Pruebas del archivo en frío de trades (database/archive.py) sin base de
+datos: escribir particiones Parquet en un directorio temporal y leerlas,
+incluidos lotes duplicados de un archivado interrumpido.
+
+Ejecutar con `python test_archive.py` (o con pytest).
+"""
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from database.archive import ARCHIVE_COLUMNS, _write_partitions, load_archived_trades
+
+def _trades(ids, start=datetime(2025, 1, 30)):
+    """Trades cerrados de prueba, uno por hora a partir de `start` (cruzan de mes)"""
+    rows = []
+    for i in ids:
+        row = dict.fromkeys(ARCHIVE_COLUMNS)
+        row.update(id=i, symbol="BTC/USDT:USDT" if i % 2 else "ETH/USDT:USDT", side="LONG" if i % 3 else "SHORT",
+                   entry_price=100.0, exit_price=101.0, pnl=float(i % 5 - 2), exit_reason="TAKE PROFIT (ATR)",
+                   trade_time=start + timedelta(hours=i), exit_time=start + timedelta(hours=i, minutes=30),
+                   vol_mean=10.0)
+        rows.append(row)
+    df = pd.DataFrame(rows, columns=ARCHIVE_COLUMNS)
+    for column in ("trade_time", "exit_time"):
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+def test_round_trip():
+    with tempfile.TemporaryDirectory() as folder:
+        trades = _trades(range(1, 101))
+        _write_partitions(trades, folder)
+        loaded = load_archived_trades(archive_dir=folder).sort_values("id").reset_index(drop=True)
+        assert list(loaded.columns) == ARCHIVE_COLUMNS
+        assert loaded["id"].tolist() == list(range(1, 101))
+        assert loaded["pnl"].sum() == trades["pnl"].sum()
+
+def test_duplicate_batches_are_dropped():
+    with tempfile.TemporaryDirectory() as folder:
+        # El mismo lote escrito dos veces con límites distintos (otro nombre de fichero)
+        _write_partitions(_trades(range(1, 61)), folder)
+        _write_partitions(_trades(range(41, 101)), folder)
+
+        loaded = load_archived_trades(archive_dir=folder)
+        assert sorted(loaded["id"]) == list(range(1, 101))
+
+        # Sin pedir `id` también se descartan (se lee internamente y se proyecta después)
+        pnl = load_archived_trades(columns=["symbol", "pnl"], archive_dir=folder)
+        assert list(pnl.columns) == ["symbol", "pnl"]
+        assert len(pnl) == 100
+        assert pnl["pnl"].sum() == _trades(range(1, 101))["pnl"].sum()
+
+def test_filters_and_live_ids():
+    with tempfile.TemporaryDirectory() as folder:
+        _write_partitions(_trades(range(1, 101)), folder)
+        _write_partitions(_trades(range(1, 21)), folder)
+        since = datetime(2025, 1, 31)
+        until = datetime(2025, 2, 2)
+        window = load_archived_trades(columns=["pnl"], since=since, until=until, archive_dir=folder)
+        expected = _trades(range(1, 101))
+        expected = expected[(expected["exit_time"] > since) & (expected["exit_time"] <= until)]
+        assert list(window.columns) == ["pnl"]
+        assert len(window) == len(expected)
+
+        # Trades que siguen en la tabla viva (archivado interrumpido antes de borrar)
+        rest = load_archived_trades(columns=["side"], archive_dir=folder, exclude_ids=range(1, 11))
+        assert len(rest) == 90
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -2,7 +2,7 @@ from exchange.bingx_client import fetch_ohlcv
 from strategy.indicators import add_indicators
 from strategy.daytrading import generate_signal
 from brain.risk import calculate_sl_tp
-from brain.memory import log_trade
+from brain.memory import log_decision
 import pandas as pd
 
 symbol = "BTC/USDT:USDT"
@@ -30,21 +30,19 @@ if signal != "NO_TRADE":
 
     print(f"Entrada: {price}")
     print(f"SL: {sl} | TP: {tp}")
-
-    # Guardamos decisión (exit y pnl aún no existen)
-    log_trade(
-        symbol=symbol,
-        side=signal,
-        entry_price=price,
-        exit_price=None,
-        pnl=0,
-        rsi=last["rsi"],
-        ema50=last["ema50"],
-        ema200=last["ema200"],
-        atr=last["atr"],
-        volume=last["volume"]
-    )
-
-    print("🧠 Trade registrado en memoria")
 else:
     print("🛑 No se opera")
+
+# Guardamos la decisión en el log (no abre ninguna posición)
+log_decision(
+    symbol=symbol,
+    side=signal,
+    price=price,
+    rsi=last["rsi"],
+    ema50=last["ema50"],
+    ema200=last["ema200"],
+    atr=last["atr"],
+    volume=last["volume"]
+)
+
+print("🧠 Decisión registrada en memoria")
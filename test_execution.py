@@ -0,0 +1,74 @@
+"""
+Pruebas de la capa de ejecución (exchange/execution.py) contra el exchange
+simulado (exchange/mock_exchange.py), sin red: respuestas perdidas
+(timeout_rate) y reenvíos idempotentes por client order id.
+
+Ejecutar con `python test_execution.py` (o con pytest).
+"""
+import asyncio
+
+from exchange.execution import ExecutionEngine, Order, client_order_id
+from exchange.mock_exchange import MockExchange
+
+SYMBOL = "BTC/USDT:USDT"
+
+def _orders(n):
+    return [Order(client_order_id(i, "entry"), SYMBOL, "buy", "market", 1.0, trade_id=i, purpose="entry")
+            for i in range(n)]
+
+def test_lost_acks_create_one_order_each():
+    async def run():
+        exchange = MockExchange({SYMBOL: 100.0}, latency=0.0, timeout_rate=0.5, seed=3)
+        engine = ExecutionEngine(exchange)
+        orders = await engine.submit_many(_orders(50))
+        return exchange, orders
+
+    exchange, orders = asyncio.run(run())
+    assert len(exchange._orders) == 50
+    assert exchange.calls > 50  # Hubo respuestas perdidas y búsquedas por client id
+    assert len({o.id for o in orders}) == 50
+    assert all(o.status == "closed" and o.filled == 1.0 for o in orders)
+
+def test_resubmit_is_idempotent():
+    async def run():
+        exchange = MockExchange({SYMBOL: 100.0}, latency=0.0, timeout_rate=0.5, seed=5)
+        engine = ExecutionEngine(exchange)
+        first = await engine.submit_many(_orders(20))
+        calls = exchange.calls
+        # Mismo motor: la orden conocida no se reenvía (ni se consulta)
+        again = await engine.submit_many(_orders(20))
+        assert exchange.calls == calls
+        # Motor nuevo (estado local perdido): el exchange responde DuplicateOrderId y se recupera la orden
+        restarted = await ExecutionEngine(exchange).submit_many(_orders(20))
+        return exchange, first, again, restarted
+
+    exchange, first, again, restarted = asyncio.run(run())
+    assert len(exchange._orders) == 20
+    assert [o.id for o in first] == [o.id for o in again] == [o.id for o in restarted]
+    assert all(o.status == "closed" for o in restarted)
+
+def test_protections_under_lost_acks():
+    fills = []
+
+    async def run():
+        exchange = MockExchange({SYMBOL: 100.0}, latency=0.0, timeout_rate=0.5, seed=11)
+        engine = ExecutionEngine(exchange, on_fill=lambda order, qty, price: fills.append((order.purpose, qty, price)))
+        result = await engine.open_position(1, SYMBOL, "LONG", 2.0, stop_loss=98.0, take_profit=104.0, interval=0.0)
+        exchange.set_price(SYMBOL, 97.5)  # Toca el SL: el TP reduce-only queda sin posición
+        await engine.track()
+        return exchange, result
+
+    exchange, result = asyncio.run(run())
+    purposes = sorted(o["clientOrderId"].rsplit("-", 1)[1] for o in exchange._orders.values())
+    assert purposes == ["entry", "sl", "tp"]
+    assert result["sl"].status == "closed" and result["sl"].filled == 2.0
+    assert result["tp"].status == "canceled"
+    assert exchange.positions[SYMBOL] == 0.0
+    assert [purpose for purpose, _, _ in fills] == ["entry", "sl"]
+    assert fills[1][2] == 97.5
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,108 @@
+"""
+Pruebas del monitor de salidas intrabar (bot/exit_monitor.py) sin red ni
+base de datos: un libro en memoria y ficheros de ticks temporales.
+
+Ejecutar con `python test_exit_monitor.py` (o con pytest).
+"""
+import os
+import tempfile
+
+import pandas as pd
+
+from bot.exit_monitor import ExitMonitor
+from bot.positions import Position
+
+SYMBOL = "BTC/USDT:USDT"
+T0 = 1_700_000_040_000  # Inicio de una vela de 1m (ms)
+
+class MemoryBook:
+    """Libro mínimo con la interfaz que usa ExitMonitor (sin base de datos)"""
+
+    def __init__(self, *positions):
+        self.positions = {p.id: p for p in positions}
+        self.version = 1
+        self.closed = []
+
+    def open_positions(self, symbol=None):
+        return [p for p in list(self.positions.values()) if symbol is None or p.symbol == symbol]
+
+    def close(self, position, price, reason):
+        self.positions.pop(position.id)
+        self.version += 1
+        self.closed.append((position.id, reason, price))
+        sign = 1 if position.side == "LONG" else -1
+        return sign * (price - position.entry_price) / position.entry_price * 100
+
+def _long(id=1, entry=100.0, atr=1.0):
+    # SL 98.5 y TP 103 (1.5 y 3 ATR); el break-even se activa a 101.5
+    return Position(id, SYMBOL, "LONG", entry, atr)
+
+def _replay(monitor, prices, step_ms=1000):
+    """Graba `prices` como ticks (uno por `step_ms`) y los reproduce"""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "ticks.csv")
+        pd.DataFrame({"timestamp": [T0 + i * step_ms for i in range(len(prices))], "price": prices}).to_csv(path)
+        return monitor.replay(path, symbol=SYMBOL)
+
+def test_stop_loss():
+    book = MemoryBook(_long())
+    exits = _replay(ExitMonitor(book), [100.0, 99.5, 98.4, 97.0])
+    assert [(e["reason"], e["price"]) for e in exits] == [("STOP LOSS (ATR)", 98.4)]
+    assert not book.positions
+
+def test_take_profit():
+    book = MemoryBook(_long())
+    exits = _replay(ExitMonitor(book, break_even=False), [100.0, 101.0, 103.2])
+    assert [(e["reason"], e["price"]) for e in exits] == [("TAKE PROFIT (ATR)", 103.2)]
+
+def test_break_even_on_ticks():
+    book = MemoryBook(_long())
+    monitor = ExitMonitor(book, trailing=False)
+    exits = _replay(monitor, [100.0, 101.6, 100.5, 99.9])
+    assert [(e["reason"], e["price"]) for e in exits] == [("BREAK EVEN", 99.9)]
+
+def test_trailing_follows_bar_closes():
+    book = MemoryBook(_long())
+    monitor = ExitMonitor(book, break_even=False)
+    # Vela 1 cierra en 102 (stop -> 100.5); los ticks de la vela 2 tocan 100.4
+    exits = _replay(monitor, [100.0, 101.0, 102.0, 101.0, 100.4], step_ms=20_000)
+    assert [(e["reason"], e["price"]) for e in exits] == [("TRAILING STOP", 100.4)]
+
+def test_trailing_ignores_ticks():
+    book = MemoryBook(_long())
+    monitor = ExitMonitor(book, break_even=False)
+    # Todo dentro de la misma vela: el trailing no sube a 101.4 con el tick de 102.9
+    # y la vela cierra en 99 (candidato 97.5), así que el stop sigue en 98.5
+    assert _replay(monitor, [100.0, 102.9, 99.0], step_ms=1000) == []
+    assert monitor.levels(1)[0] == 98.5
+
+def test_bar_checks_stop_carried_in():
+    # Vela con máximo 102, mínimo 99 y cierre 101: el mínimo no toca el stop
+    # con el que empezó (98.5), aunque break-even/trailing lo suban después
+    book = MemoryBook(_long())
+    monitor = ExitMonitor(book)
+    assert monitor.on_bar(SYMBOL, 102.0, 99.0, 101.0) == []
+    assert monitor.levels(1) == (100.0, 103.0, True)
+
+    book = MemoryBook(_long())
+    monitor = ExitMonitor(book, break_even=False)
+    assert monitor.on_bar(SYMBOL, 102.0, 99.0, 101.0) == []
+    assert monitor.levels(1)[0] == 99.5
+
+    # La vela siguiente sí se compara con el stop nuevo
+    exits = monitor.on_bar(SYMBOL, 100.0, 99.4, 99.6)
+    assert [(e["reason"], e["price"]) for e in exits] == [("TRAILING STOP", 99.5)]
+
+def test_short_and_other_symbols():
+    short = Position(2, SYMBOL, "SHORT", 100.0, 1.0)  # SL 101.5, TP 97
+    other = Position(3, "ETH/USDT:USDT", "LONG", 100.0, 1.0)
+    book = MemoryBook(short, other)
+    exits = _replay(ExitMonitor(book), [100.0, 101.6])
+    assert [(e["trade_id"], e["reason"]) for e in exits] == [(2, "STOP LOSS (ATR)")]
+    assert list(book.positions) == [3]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
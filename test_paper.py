@@ -0,0 +1,84 @@
+"""
+Pruebas del motor de paper trading (exchange/paper.py): `update_batch`
+debe dar los mismos llenados, posiciones y saldos que `update` precio a
+precio, con brackets, limitadas, stops y reduce-only en varias cuentas.
+
+Ejecutar con `python test_paper.py` (o con pytest).
+"""
+import numpy as np
+
+from exchange.paper import PaperEngine
+
+SYMBOLS = ["BTC/USDT:USDT", "ETH/USDT:USDT", "SOL/USDT:USDT"]
+
+def _engine(seed=0, accounts=20):
+    """Motor con el mismo libro de órdenes para una semilla dada"""
+    rng = np.random.default_rng(seed)
+    engine = PaperEngine()
+    for a in range(accounts):
+        for symbol in SYMBOLS:
+            side = "buy" if rng.random() < 0.5 else "sell"
+            sign = 1 if side == "buy" else -1
+            engine.submit_bracket(f"acct{a}", symbol, side, 1.0,
+                                  stop_loss=100 - sign * rng.uniform(0.5, 3), take_profit=100 + sign * rng.uniform(0.5, 3))
+            # Entradas pendientes: una limitada y un stop, más un reduce-only que puede quedarse sin posición
+            engine.submit(f"acct{a}", symbol, "buy", 0.5, "limit", 100 - rng.uniform(0, 2))
+            engine.submit(f"acct{a}", symbol, "sell", 0.5, "stop", 100 - rng.uniform(0, 2))
+            engine.submit(f"acct{a}", symbol, "sell", 2.0, "limit", 100 + rng.uniform(0, 2), reduce_only=True)
+    return engine
+
+def _series(seed=1, n=2000):
+    rng = np.random.default_rng(seed)
+    return {symbol: 100 + np.cumsum(rng.normal(0, 0.05, n)) for symbol in SYMBOLS}
+
+def _state(engine):
+    fills = engine.drain_fills()
+    return fills, engine.summary(), engine.open_orders()
+
+def test_batch_matches_one_at_a_time():
+    prices = _series()
+    ts = np.arange(len(prices[SYMBOLS[0]]), dtype=np.int64) * 1000
+
+    batch = _engine()
+    for symbol in SYMBOLS:
+        batch.update_batch(symbol, prices[symbol], ts=ts)
+
+    single = _engine()
+    for symbol in SYMBOLS:
+        for t, price in zip(ts, prices[symbol]):
+            single.update(symbol, float(price), ts=int(t))
+
+    batch_fills, batch_summary, batch_open = _state(batch)
+    single_fills, single_summary, single_open = _state(single)
+
+    assert len(batch_fills) > 0
+    order = ["ts", "order_id"]
+    batch_fills, single_fills = np.sort(batch_fills, order=order), np.sort(single_fills, order=order)
+    for field in ("ts", "order_id", "account", "symbol", "side"):
+        assert np.array_equal(batch_fills[field], single_fills[field]), field
+    for field in ("qty", "price", "fee"):
+        assert np.allclose(batch_fills[field], single_fills[field], rtol=1e-12), field
+
+    assert np.allclose(batch.position, single.position)
+    assert np.allclose(batch.avg_price, single.avg_price)
+    for column in ("equity", "realized", "fees", "open_positions", "open_orders"):
+        assert np.allclose(batch_summary[column], single_summary[column]), column
+    assert sorted(batch_open["order_id"]) == sorted(single_open["order_id"])
+
+def test_batch_in_chunks_matches_whole_series():
+    prices = _series(seed=2)
+    whole = _engine(seed=3)
+    chunked = _engine(seed=3)
+    for symbol in SYMBOLS:
+        whole.update_batch(symbol, prices[symbol])
+        for chunk in np.array_split(prices[symbol], 7):
+            chunked.update_batch(symbol, chunk)
+    assert np.allclose(whole.position, chunked.position)
+    assert np.allclose(whole.realized, chunked.realized)
+    assert np.allclose(whole.fees, chunked.fees)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
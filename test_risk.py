@@ -0,0 +1,88 @@
+"""
+Pruebas del motor de riesgo vectorizado (brain/risk.py): simulate_paths
+contra un recorrido secuencial vela a vela con las mismas reglas.
+
+Ejecutar con `python test_risk.py` (o con pytest).
+"""
+import math
+
+import numpy as np
+
+from brain.risk import EXIT_NONE, EXIT_SL, EXIT_TP, initial_levels, simulate_paths
+
+def sequential_path(entry, stop, target, side, high, low, close, trail_dist=None, be_trigger=None,
+                    update_first=True):
+    """Referencia: una posición, una vela tras otra (como el backtest original)"""
+    sign = 1.0 if side == "LONG" else -1.0
+    entry_l, stop_l, target_l = entry * sign, stop * sign, target * sign
+    be = False
+    for j in range(len(high)):
+        hi, lo = (high[j], low[j]) if sign > 0 else (-low[j], -high[j])
+        carried = stop_l
+        if be_trigger is not None and hi - entry_l >= be_trigger:
+            be = True
+        if be:
+            stop_l = max(stop_l, entry_l)
+        elif trail_dist is not None:
+            stop_l = max(stop_l, close[j] * sign - trail_dist)
+        test = stop_l if update_first else carried
+        if lo <= test:
+            return EXIT_SL, j, test * sign
+        if hi >= target_l:
+            return EXIT_TP, j, target_l * sign
+    return EXIT_NONE, -1, math.nan
+
+def _paths(n=300, m=60, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.4, (n, m)), axis=1)
+    high = close + rng.uniform(0, 0.6, (n, m))
+    low = close - rng.uniform(0, 0.6, (n, m))
+    sides = np.where(rng.random(n) < 0.5, "LONG", "SHORT")
+    atr = rng.uniform(0.5, 2.0, n)
+    return sides, atr, high, low, close
+
+def _check(update_first, trailing, break_even):
+    sides, atr, high, low, close = _paths()
+    entry = np.full(len(sides), 100.0)
+    stop, target = initial_levels(entry, atr, sides)
+    trail = atr * 1.5 if trailing else None
+    trigger = np.abs(target - entry) * 0.5 if break_even else None
+
+    reason, index, price, _, _ = simulate_paths(entry, stop, target, sides, high, low, close,
+                                                trail_dist=trail, be_trigger=trigger, update_first=update_first)
+    for i in range(len(sides)):
+        expected = sequential_path(entry[i], stop[i], target[i], sides[i], high[i], low[i], close[i],
+                                   None if trail is None else trail[i], None if trigger is None else trigger[i],
+                                   update_first)
+        assert (reason[i], index[i]) == expected[:2], (i, reason[i], index[i], expected)
+        if expected[0] != EXIT_NONE:
+            assert math.isclose(price[i], expected[2], rel_tol=1e-12), (i, price[i], expected)
+    return reason
+
+def test_plain_levels():
+    reason = _check(True, False, False)
+    assert (reason == EXIT_SL).any() and (reason == EXIT_TP).any()
+
+def test_break_even_and_trailing():
+    for update_first in (True, False):
+        _check(update_first, True, True)
+
+def test_trailing_only():
+    for update_first in (True, False):
+        _check(update_first, True, False)
+
+def test_break_even_only():
+    for update_first in (True, False):
+        _check(update_first, False, True)
+
+def test_nan_padding_never_exits():
+    high = np.array([[101.0, np.nan, np.nan]])
+    low = np.array([[99.0, np.nan, np.nan]])
+    reason, index, _, _, _ = simulate_paths([100.0], [98.5], [103.0], "LONG", high, low)
+    assert reason[0] == EXIT_NONE and index[0] == -1
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Mueve el histórico de trades entre PostgreSQL y SQLite (o a/desde CSV).
+
+Ejemplos:
+    python transfer_trades.py export trades.csv.gz
+    python transfer_trades.py import trades.csv.gz --url sqlite:///analisis.db
+    python transfer_trades.py copy --url sqlite:///analisis.db
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import tempfile
+from database.db import DATABASE_URL
+from database.transfer import export_table, import_table, DEFAULT_CHUNK_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportación / importación masiva de trades')
+    parser.add_argument('action', choices=['export', 'import', 'copy'],
+                        help='export: BD -> CSV, import: CSV -> BD, copy: BD origen -> BD destino')
+    parser.add_argument('path', nargs='?', help='Fichero CSV (.csv o .csv.gz); no se usa con copy')
+    parser.add_argument('--url', default=None, help='URL de la BD (destino en copy). Por defecto la del bot')
+    parser.add_argument('--source-url', default=None, help='URL de la BD origen para copy (por defecto la del bot)')
+    parser.add_argument('--table', default='trades', choices=['trades', 'decisions'], help='Tabla a transferir')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Filas por bloque')
+    args = parser.parse_args()
+
+    try:
+        if args.action == 'export':
+            if not args.path:
+                parser.error("export necesita la ruta del fichero")
+            rows = export_table(args.path, args.table, args.url, args.chunk_size)
+            print(f"✅ {rows} filas exportadas a '{args.path}'")
+        elif args.action == 'import':
+            if not args.path:
+                parser.error("import necesita la ruta del fichero")
+            rows = import_table(args.path, args.table, args.url, args.chunk_size)
+            print(f"✅ {rows} filas leídas de '{args.path}'")
+        else:
+            if not args.url:
+                parser.error("copy necesita --url con la BD destino")
+            source = args.source_url or DATABASE_URL
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, f"{args.table}.csv.gz")
+                export_table(path, args.table, source, args.chunk_size)
+                rows = import_table(path, args.table, args.url, args.chunk_size)
+            print(f"✅ {rows} filas copiadas de {source} a {args.url}")
+    except Exception as e:
+        print(f"❌ Error en la transferencia: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,33 @@
 # update_database.py
-from database.db import engine
-from sqlalchemy import text
+import argparse
+from database.db import Base, engine
+import database.models  # noqa: F401  (registra los modelos en Base)
+from database.migrations import run_migrations, migration_status
 
-def update_trades_table():
-    conn = engine.connect()
-    trans = conn.begin()
+def update_trades_table(target=None):
+    """Crea las tablas que falten y aplica las migraciones pendientes"""
     try:
-        # Agregar columnas si no existen
-        conn.execute(text("""
-            ALTER TABLE trades 
-            ADD COLUMN IF NOT EXISTS exit_reason TEXT,
-            ADD COLUMN IF NOT EXISTS stop_loss DOUBLE PRECISION,
-            ADD COLUMN IF NOT EXISTS take_profit DOUBLE PRECISION;
-        """))
-        trans.commit()
-        print("✅ Tabla 'trades' actualizada con éxito.")
+        Base.metadata.create_all(bind=engine)
+        applied = run_migrations(target)
+        if applied:
+            print(f"✅ Esquema actualizado ({len(applied)} migraciones aplicadas).")
+        else:
+            print("✅ El esquema ya estaba al día.")
     except Exception as e:
-        trans.rollback()
-        print(f"❌ Error al actualizar la tabla: {e}")
-    finally:
-        conn.close()
+        print(f"❌ Error al actualizar el esquema: {e}")
+
+def show_status():
+    for version, description, done in migration_status():
+        mark = "✅" if done else "⏳"
+        print(f"{mark} {version:03d} {description}")
 
 if __name__ == "__main__":
-    update_trades_table()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Migraciones de esquema del Trader BotIA')
+    parser.add_argument('--status', action='store_true', help='Mostrar migraciones aplicadas y pendientes')
+    parser.add_argument('--target', type=int, default=None, help='Migrar solo hasta esta versión')
+    args = parser.parse_args()
+
+    if args.status:
+        show_status()
+    else:
+        update_trades_table(args.target)